@@ -4,10 +4,12 @@ Travel Agent Dependencies - Configuration and API keys for Pydantic-AI agent.
 
 import os
 from dataclasses import dataclass, field
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 
+from tools.http_client import UpstreamPools
+
 load_dotenv()
 
 
@@ -34,12 +36,19 @@ class TravelDependencies:
     message_history: List[Dict[str, Any]] = field(default_factory=list)
     itinerary_progress: Dict[str, Any] = field(default_factory=dict)
 
+    # App-scoped upstream connection pools (None falls back to module defaults)
+    upstream: Optional[UpstreamPools] = None
+
+    # Tokens of tool results returned so far this turn (see tool_budget.py)
+    tool_tokens_used: int = 0
+
     @classmethod
     def from_env(
         cls,
         session_id: str = "",
         message_history: List[Dict[str, Any]] = None,
         itinerary_progress: Dict[str, Any] = None,
+        upstream: Optional[UpstreamPools] = None,
     ) -> "TravelDependencies":
         """Create dependencies from environment variables."""
         return cls(
@@ -54,4 +63,5 @@ class TravelDependencies:
             session_id=session_id,
             message_history=message_history or [],
             itinerary_progress=itinerary_progress or {},
+            upstream=upstream,
         )
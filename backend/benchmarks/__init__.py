@@ -0,0 +1,8 @@
+"""
+Offline performance benchmarks for the Travel-Bot backend.
+
+`load_test` drives the real FastAPI app over HTTP with the upstream APIs
+replayed from generated cassettes and the LLM replaced by a scripted
+pydantic-ai model, so results depend on our code rather than on network
+or model variance.
+"""
@@ -0,0 +1,328 @@
+"""
+Load test for /chat and /chat/stream, fully offline.
+
+The FastAPI app runs under uvicorn on a local port. Upstream APIs are
+replayed from stub cassettes with a fixed latency and the LLM is the
+scripted model from benchmarks/stubs.py. Requests are sent at rising
+concurrency; for each level the run reports requests/sec and p50/p95/p99
+latency, plus time to first byte for the stream endpoint.
+
+Every run is saved to benchmarks/results/ as JSON and compared with the
+previous run of the same configuration, so regressions show up between
+commits:
+
+    cd backend && python -m benchmarks.load_test --levels 1,8,32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import HOTELS_HOST, MESSAGES, scripted_model, write_stub_cassettes
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# A p95 latency or throughput change beyond this is flagged as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def offline_env(cassette_dir: str, upstream_latency_ms: float) -> Dict[str, str]:
+    """Environment that points the backend at the stub cassettes."""
+    return {
+        "UPSTREAM_MODE": "replay",
+        "UPSTREAM_CASSETTE_DIR": cassette_dir,
+        "UPSTREAM_REPLAY_MATCH": "path",
+        "UPSTREAM_REPLAY_LATENCY_MS": str(upstream_latency_ms),
+        "UPSTREAM_WARMUP": "0",
+        "TRAVELPAYOUTS_TOKEN": "offline",
+        "HOTELS_RAPIDAPI_KEY": "offline",
+        "HOTELS_RAPIDAPI_HOST": HOTELS_HOST,
+        "YELP_API_KEY": "offline",
+        "TICKETMASTER_API_KEY": "offline",
+        "SESSION_STORE_PATH": ":none:",
+        "LOCATION_CACHE_PATH": ":none:",
+        "RESPONSE_CACHE_ENABLED": "0",
+        "PYDANTIC_AI_NO_BANNER": "1",
+        # The agent module needs a key to build its default model; the
+        # scripted model replaces it for the whole run
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "offline"),
+    }
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0-100) of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of latencies in seconds, reported in ms."""
+    ms = [v * 1000 for v in values]
+    return {
+        "p50": round(percentile(ms, 50), 2),
+        "p95": round(percentile(ms, 95), 2),
+        "p99": round(percentile(ms, 99), 2),
+        "mean": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+async def _chat(client: httpx.AsyncClient, message: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    response = await client.post(
+        "/chat", json={"message": message, "session_id": uuid.uuid4().hex}
+    )
+    response.raise_for_status()
+    return {"latency": time.perf_counter() - started}
+
+
+async def _chat_stream(client: httpx.AsyncClient, message: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    ttfb = None
+    payload = {
+        "message": message,
+        "session_id": uuid.uuid4().hex,
+        "stream_mode": "delta",
+    }
+    async with client.stream("POST", "/chat/stream", json=payload) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            if ttfb is None and chunk:
+                ttfb = time.perf_counter() - started
+            if b'"error"' in chunk:
+                raise RuntimeError(chunk.decode("utf-8", errors="replace"))
+    latency = time.perf_counter() - started
+    return {"latency": latency, "ttfb": ttfb if ttfb is not None else latency}
+
+
+async def run_level(
+    client: httpx.AsyncClient, endpoint: str, concurrency: int, requests: int
+) -> Dict[str, Any]:
+    """Send `requests` requests with `concurrency` workers and summarize."""
+    send = _chat_stream if endpoint == "chat_stream" else _chat
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(MESSAGES[i % len(MESSAGES)])
+    samples: List[Dict[str, float]] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            message = queue.get_nowait()
+            try:
+                samples.append(await send(client, message))
+            except Exception as e:
+                errors += 1
+                print(f"{endpoint} request failed: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    level = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": round(len(samples) / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": summarize([s["latency"] for s in samples]),
+    }
+    if endpoint == "chat_stream":
+        level["ttfb_ms"] = summarize([s["ttfb"] for s in samples])
+    return level
+
+
+async def run_benchmark(
+    levels: Sequence[int] = (1, 4, 16),
+    requests_per_level: int = 40,
+    token_latency: float = 0.005,
+    endpoints: Sequence[str] = ("chat", "chat_stream"),
+) -> Dict[str, Any]:
+    """
+    Serve the app on a local port and load it at each concurrency level.
+    The offline environment (see `offline_env`) must already be applied.
+    """
+    import uvicorn
+
+    from server import app
+    from travel_agent import travel_agent
+
+    results = []
+    with travel_agent.override(model=scripted_model(token_latency)):
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+        server = uvicorn.Server(config)
+        # Same event loop (and context) as the override above
+        serving = asyncio.create_task(server.serve())
+        try:
+            while not server.started:
+                if serving.done():
+                    serving.result()
+                await asyncio.sleep(0.01)
+            port = server.servers[0].sockets[0].getsockname()[1]
+            limits = httpx.Limits(max_connections=max(levels) * 2)
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120
+            ) as client:
+                for endpoint in endpoints:
+                    # An untimed pass over the messages warms imports and caches
+                    await run_level(client, endpoint, 1, len(MESSAGES))
+                    for concurrency in levels:
+                        results.append(
+                            await run_level(
+                                client,
+                                endpoint,
+                                concurrency,
+                                max(requests_per_level, concurrency),
+                            )
+                        )
+        finally:
+            server.should_exit = True
+            await serving
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "levels": list(levels),
+            "requests_per_level": requests_per_level,
+            "token_latency_ms": token_latency * 1000,
+            "upstream_latency_ms": float(os.getenv("UPSTREAM_REPLAY_LATENCY_MS", "0")),
+        },
+        "results": results,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(run: Dict[str, Any], directory: str = RESULTS_DIR) -> str:
+    """Write a run to `<directory>/<timestamp>-<commit>.json`; return the path."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = run["timestamp"].replace(":", "").replace("-", "")
+    path = os.path.join(directory, f"{stamp}-{run['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    return path
+
+
+def previous_run(
+    config: Dict[str, Any], directory: str = RESULTS_DIR, exclude: str = ""
+) -> Optional[Dict[str, Any]]:
+    """Most recent saved run with the same configuration, if any."""
+    if not os.path.isdir(directory):
+        return None
+    for name in sorted(os.listdir(directory), reverse=True):
+        path = os.path.join(directory, name)
+        if not name.endswith(".json") or path == exclude:
+            continue
+        with open(path) as f:
+            run = json.load(f)
+        if run.get("config") == config:
+            return run
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Describe p95 latency and throughput regressions against a baseline run."""
+    before = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for level in current["results"]:
+        old = before.get((level["endpoint"], level["concurrency"]))
+        if old is None:
+            continue
+        where = f"{level['endpoint']} @ {level['concurrency']}"
+        p95, old_p95 = level["latency_ms"]["p95"], old["latency_ms"]["p95"]
+        if old_p95 and p95 > old_p95 * (1 + REGRESSION_THRESHOLD):
+            regressions.append(f"{where}: p95 {old_p95} -> {p95} ms")
+        if old["rps"] and level["rps"] < old["rps"] * (1 - REGRESSION_THRESHOLD):
+            regressions.append(f"{where}: {old['rps']} -> {level['rps']} req/s")
+    return regressions
+
+
+def format_report(run: Dict[str, Any]) -> str:
+    """Plain-text table of one run."""
+    lines = [
+        f"commit {run['commit']}  {run['timestamp']}  {run['config']}",
+        "endpoint     conc  req/s    p50     p95     p99   ttfb p50  ttfb p95  errors",
+    ]
+    for r in run["results"]:
+        ttfb = r.get("ttfb_ms", {})
+        latency = r["latency_ms"]
+        lines.append(
+            f"{r['endpoint']:<12} {r['concurrency']:>4} {r['rps']:>6} "
+            f"{latency['p50']:>7} {latency['p95']:>7} {latency['p99']:>7} "
+            f"{ttfb.get('p50', '-'):>9} {ttfb.get('p95', '-'):>9} {r['errors']:>7}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--levels", default="1,4,16", help="comma-separated concurrency"
+    )
+    parser.add_argument("--requests", type=int, default=40, help="requests per level")
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="exit 1 if p95 or req/s regressed against the previous run",
+    )
+    args = parser.parse_args(argv)
+
+    cassette_dir = tempfile.mkdtemp(prefix="travelbot-cassettes-")
+    write_stub_cassettes(cassette_dir, latency_ms=args.upstream_latency_ms)
+    os.environ.update(offline_env(cassette_dir, args.upstream_latency_ms))
+
+    run = asyncio.run(
+        run_benchmark(
+            levels=[int(c) for c in args.levels.split(",")],
+            requests_per_level=args.requests,
+            token_latency=args.token_latency_ms / 1000,
+        )
+    )
+    path = save_results(run, args.results_dir)
+    print(format_report(run))
+    print(f"\nSaved {path}")
+
+    baseline = previous_run(run["config"], args.results_dir, exclude=path)
+    if baseline is None:
+        print("No previous run with this configuration to compare against.")
+        return 0
+    regressions = compare(run, baseline)
+    print(f"Compared with {baseline['commit']} ({baseline['timestamp']}):")
+    for line in regressions or ["no regressions"]:
+        print(f"  {line}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
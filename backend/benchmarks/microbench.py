@@ -0,0 +1,435 @@
+"""
+Microbenchmarks for the tool parsing and summarization hot paths.
+
+Every tool call runs one of these on an upstream payload: flight and hotel
+summaries, booking URLs, date validation, and the Yelp/Ticketmaster
+cleaning loops. Each function is timed on synthetic payloads of 10 to 100k
+records, in every response shape it handles, and its peak memory is
+traced separately (tracemalloc slows the code it watches).
+
+Runs are saved to benchmarks/results/micro/ and compared with the previous
+run of the same configuration:
+
+    cd backend && python -m benchmarks.microbench --sizes 10,1000,100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import RESULTS_DIR, _git_commit, previous_run, save_results
+from tools.flight_scraper import build_booking_url, summarize_flights
+from tools.hotel_scraper import parse_hotels, summarize_hotels, validate_dates
+from tools.web_scraper import clean_events, clean_restaurants
+
+MICRO_RESULTS_DIR = os.path.join(RESULTS_DIR, "micro")
+
+SIZES = (10, 100, 1000, 10000, 100000)
+
+# A per-call time or peak memory change beyond this is flagged
+REGRESSION_THRESHOLD = 0.10
+
+# Each timing repeat runs the function for at least this long
+MIN_REPEAT_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class Case:
+    """One function on one response shape; `make(n)` builds its input."""
+
+    function: str
+    shape: str
+    make: Callable[[int], Any]
+    run: Callable[[Any], Any]
+
+
+# Synthetic payloads, one builder per response shape
+
+
+def _fare(i: int, round_trip: bool) -> Dict[str, Any]:
+    fare = {
+        "origin": "SFO",
+        "destination": "JFK",
+        "origin_airport": "SFO",
+        "destination_airport": "JFK",
+        "price": 180 + i % 400,
+        "airline": ("UA", "AA", "DL", "B6")[i % 4],
+        "flight_number": str(100 + i % 900),
+        "departure_at": "2025-12-10T08:00:00-08:00",
+        "duration": 330 + 20 * (i % 7),
+        "duration_to": 330 + 20 * (i % 7),
+        "transfers": i % 3,
+        "link": f"/search/SFO1012JFK1?t={i}",
+    }
+    if round_trip:
+        fare["return_at"] = "2025-12-14T18:00:00-05:00"
+        fare["duration_back"] = 310 + 20 * (i % 5)
+        fare["return_transfers"] = i % 2
+    return fare
+
+
+def flight_payload(n: int, shape: str = "one_way") -> Dict[str, Any]:
+    if shape == "sparse":
+        # Fares without duration, airline or transfers still summarize
+        data = [
+            {"origin": "SFO", "destination": "JFK", "price": 200 + i % 300}
+            for i in range(n)
+        ]
+    else:
+        data = [_fare(i, shape == "round_trip") for i in range(n)]
+    return {"success": True, "data": data, "currency": "usd"}
+
+
+def _stay(i: int) -> Dict[str, Any]:
+    return {
+        "name": f"Hotel {i}",
+        "price": {"value": 90 + i % 500, "currency": "USD"},
+        "rating": 6.5 + (i % 7) / 2,
+        "address": {
+            "street": f"{i} Rue de Rivoli",
+            "city": "Paris",
+            "country": "France",
+        },
+        "distance": f"{0.5 + i % 9} km",
+        "url": f"https://www.booking.com/hotel/fr/{i}.html",
+        "photoUrls": [f"https://cf.bstatic.com/{i}/{k}.jpg" for k in range(3)],
+    }
+
+
+def _legacy_hotel(i: int) -> Dict[str, Any]:
+    return {
+        "hotelName": f"Hotel {i}",
+        "priceBreakdown": {
+            "grossPrice": {"value": 90.5 + i % 500},
+            "currencyCode": "EUR",
+        },
+        "reviewScore": 6.5 + (i % 7) / 2,
+        "location": f"{i} Rue de Rivoli, Paris",
+        "bookingUrl": f"https://www.booking.com/hotel/fr/{i}.html",
+        "distanceFromCenter": 0.5 + i % 9,
+    }
+
+
+def hotel_payload(n: int, shape: str = "stays") -> Any:
+    if shape == "stays":
+        return {"data": {"stays": [_stay(i) for i in range(n)]}}
+    if shape == "legacy":
+        return {"data": {"hotels": [_legacy_hotel(i) for i in range(n)]}}
+    if shape == "results":
+        return {"results": [_stay(i) for i in range(n)]}
+    return [_stay(i) for i in range(n)]
+
+
+def booking_links(n: int, shape: str = "relative") -> List[str]:
+    if shape == "relative":
+        return [f"search/SFO1012JFK1?t={i}" for i in range(n)]
+    if shape == "with_marker":
+        return [f"/search/SFO1012JFK1?t={i}&marker=123" for i in range(n)]
+    if shape == "empty":
+        return [""] * n
+    return [f"/search/SFO1012JFK{i % 9 + 1}" for i in range(n)]
+
+
+def date_pairs(n: int, shape: str = "valid") -> List[tuple]:
+    start = date.today() + timedelta(days=30)
+    pairs = []
+    for i in range(n):
+        checkin = start + timedelta(days=i % 300)
+        if shape == "past":
+            checkin = date.today() - timedelta(days=1 + i % 300)
+        checkout = checkin + timedelta(days=1 + i % 14)
+        pairs.append((checkin.isoformat(), checkout.isoformat()))
+    if shape == "bad_format":
+        pairs = [(f"{a[8:]}/{a[5:7]}/{a[:4]}", b) for a, b in pairs]
+    return pairs
+
+
+def yelp_payload(n: int, shape: str = "full") -> Dict[str, Any]:
+    if shape == "sparse":
+        # Businesses without location or categories
+        businesses = [{"name": f"Bistro {i}", "rating": 4.5} for i in range(n)]
+    else:
+        businesses = [
+            {
+                "id": f"bistro-{i}",
+                "name": f"Bistro {i}",
+                "price": "$$",
+                "rating": 4.0 + (i % 3) / 2,
+                "review_count": 100 + i,
+                "location": {
+                    "address1": f"{i} Broadway",
+                    "city": "New York",
+                    "display_address": [f"{i} Broadway", "New York, NY 10012"],
+                },
+                "categories": [
+                    {"alias": "french", "title": "French"},
+                    {"alias": "wine_bars", "title": "Wine Bars"},
+                ],
+                "coordinates": {"latitude": 40.72, "longitude": -73.99},
+                "image_url": f"https://s3-media.example/bphoto/{i}/o.jpg",
+                "url": f"https://www.yelp.com/biz/bistro-{i}",
+            }
+            for i in range(n)
+        ]
+    return {"businesses": businesses, "total": n}
+
+
+def ticketmaster_payload(n: int, shape: str = "full") -> Dict[str, Any]:
+    events = []
+    for i in range(n):
+        event = {
+            "name": f"Concert {i}",
+            "url": f"https://www.ticketmaster.com/event/{i}",
+            "dates": {"start": {"localDate": "2025-12-11", "localTime": "19:30:00"}},
+        }
+        if shape == "full":
+            event["classifications"] = [{"segment": {"name": "Music"}, "name": "Music"}]
+            event["_embedded"] = {
+                "venues": [
+                    {"name": "Madison Square Garden", "city": {"name": "New York"}}
+                ]
+            }
+        events.append(event)
+    return {"_embedded": {"events": events}, "page": {"totalElements": n}}
+
+
+def _validate_all(pairs: List[tuple]) -> int:
+    valid = 0
+    for checkin, checkout in pairs:
+        try:
+            valid += validate_dates(checkin, checkout)
+        except ValueError:
+            pass
+    return valid
+
+
+def _cases() -> List[Case]:
+    cases = []
+    for shape in ("one_way", "round_trip", "sparse"):
+        cases.append(
+            Case(
+                "summarize_flights",
+                shape,
+                lambda n, s=shape: flight_payload(n, s),
+                lambda raw: summarize_flights(raw, limit=len(raw["data"])),
+            )
+        )
+    for shape in ("stays", "legacy", "results", "list"):
+        cases.append(
+            Case(
+                "summarize_hotels",
+                shape,
+                lambda n, s=shape: hotel_payload(n, s),
+                lambda raw: summarize_hotels(raw, limit=None),
+            )
+        )
+    # Raw response bytes to summaries: every record, as hotel_search_tool and
+    # trip_bundle_search read them
+    for shape in ("stays", "legacy"):
+        cases.append(
+            Case(
+                "parse_hotels",
+                shape,
+                lambda n, s=shape: json.dumps(hotel_payload(n, s)).encode(),
+                # One host per shape, so the learned extractor never drifts
+                lambda body, s=shape: parse_hotels(
+                    body, limit=None, host=f"microbench-{s}"
+                ),
+            )
+        )
+    for shape in ("relative", "absolute", "with_marker", "empty"):
+        cases.append(
+            Case(
+                "build_booking_url",
+                shape,
+                lambda n, s=shape: booking_links(n, s),
+                lambda links: [build_booking_url(link, "123") for link in links],
+            )
+        )
+    for shape in ("valid", "past", "bad_format"):
+        cases.append(
+            Case(
+                "validate_dates",
+                shape,
+                lambda n, s=shape: date_pairs(n, s),
+                _validate_all,
+            )
+        )
+    for shape in ("full", "sparse"):
+        cases.append(
+            Case(
+                "clean_restaurants",
+                shape,
+                lambda n, s=shape: yelp_payload(n, s),
+                clean_restaurants,
+            )
+        )
+        cases.append(
+            Case(
+                "clean_events",
+                shape,
+                lambda n, s=shape: ticketmaster_payload(n, s),
+                clean_events,
+            )
+        )
+    return cases
+
+
+CASES = _cases()
+
+
+def time_call(run: Callable[[Any], Any], arg: Any, repeats: int = 3) -> float:
+    """Best-of-`repeats` seconds per call, looping short calls for resolution."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            run(arg)
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_REPEAT_SECONDS or loops >= 1 << 20:
+            break
+        loops *= 2
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            run(arg)
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best
+
+
+def peak_memory(run: Callable[[Any], Any], arg: Any) -> int:
+    """Peak bytes allocated during one call, not counting the input."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_microbench(
+    sizes: Sequence[int] = SIZES,
+    functions: Optional[Sequence[str]] = None,
+    repeats: int = 3,
+) -> Dict[str, Any]:
+    """Time and trace every case at every size."""
+    results = []
+    for case in CASES:
+        if functions and case.function not in functions:
+            continue
+        for n in sizes:
+            arg = case.make(n)
+            seconds = time_call(case.run, arg, repeats)
+            results.append(
+                {
+                    "function": case.function,
+                    "shape": case.shape,
+                    "records": n,
+                    "us_per_call": round(seconds * 1e6, 2),
+                    "ns_per_record": round(seconds * 1e9 / n, 1),
+                    "peak_kib": round(peak_memory(case.run, arg) / 1024, 1),
+                }
+            )
+            del arg
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "sizes": list(sizes),
+            "functions": sorted(functions) if functions else "all",
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Describe per-call time and peak memory regressions against a baseline."""
+    before = {(r["function"], r["shape"], r["records"]): r for r in baseline["results"]}
+    limit = 1 + REGRESSION_THRESHOLD
+    regressions = []
+    for r in current["results"]:
+        old = before.get((r["function"], r["shape"], r["records"]))
+        if old is None:
+            continue
+        where = f"{r['function']}[{r['shape']}] n={r['records']}"
+        if old["us_per_call"] and r["us_per_call"] > old["us_per_call"] * limit:
+            regressions.append(
+                f"{where}: {old['us_per_call']} -> {r['us_per_call']} us"
+            )
+        if old["peak_kib"] and r["peak_kib"] > old["peak_kib"] * limit:
+            regressions.append(
+                f"{where}: peak {old['peak_kib']} -> {r['peak_kib']} KiB"
+            )
+    return regressions
+
+
+def format_report(run: Dict[str, Any]) -> str:
+    """Plain-text table of one run."""
+    lines = [
+        f"commit {run['commit']}  {run['timestamp']}  {run['config']}",
+        f"{'function':<18} {'shape':<12} {'records':>8} {'us/call':>12} "
+        f"{'ns/record':>10} {'peak KiB':>10}",
+    ]
+    for r in run["results"]:
+        lines.append(
+            f"{r['function']:<18} {r['shape']:<12} {r['records']:>8} "
+            f"{r['us_per_call']:>12} {r['ns_per_record']:>10} {r['peak_kib']:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, SIZES)), help="comma-separated"
+    )
+    parser.add_argument(
+        "--functions",
+        default="",
+        help="comma-separated subset, e.g. summarize_hotels,parse_hotels",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--results-dir", default=MICRO_RESULTS_DIR)
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="exit 1 if time or peak memory regressed against the previous run",
+    )
+    args = parser.parse_args(argv)
+
+    run = run_microbench(
+        sizes=[int(n) for n in args.sizes.split(",")],
+        functions=[f for f in args.functions.split(",") if f],
+        repeats=args.repeats,
+    )
+    path = save_results(run, args.results_dir)
+    print(format_report(run))
+    print(f"\nSaved {path}")
+
+    baseline = previous_run(run["config"], args.results_dir, exclude=path)
+    if baseline is None:
+        print("No previous run with this configuration to compare against.")
+        return 0
+    regressions = compare(run, baseline)
+    print(f"Compared with {baseline['commit']} ({baseline['timestamp']}):")
+    for line in regressions or ["no regressions"]:
+        print(f"  {line}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+Offline stand-ins for the upstream APIs and the LLM.
+
+`write_stub_cassettes` writes replay cassettes (see tools/cassette.py) for
+Travelpayouts, Booking.com, Yelp and Ticketmaster with realistic response
+sizes. `scripted_model` is a pydantic-ai FunctionModel that, depending on
+the user's message, calls one tool and then streams a fixed answer with a
+configurable per-token latency.
+"""
+
+import asyncio
+import json
+import os
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import (
+    AgentInfo,
+    DeltaToolCall,
+    DeltaToolCalls,
+    FunctionModel,
+)
+
+HOTELS_HOST = "booking-com18.p.rapidapi.com"
+
+ANSWER = (
+    "Here are your best options. **Value**: the cheapest pick with one stop. "
+    "**Comfort**: a good balance of price and travel time. **Premium**: the "
+    "fastest nonstop choice. Want me to hold one of these or look at hotels "
+    "next? I can also check nearby airports or flexible dates."
+)
+
+# Benchmark messages, one per scenario; requests cycle through them
+MESSAGES = [
+    "Find flights from SFO to JFK",
+    "Find hotels in Paris",
+    "Plan my whole trip to New York",
+    "Hello! Can you help me plan a trip?",
+]
+
+
+def _scenario_calls() -> List[Tuple[str, str, Dict[str, Any]]]:
+    # (keyword in message, tool, arguments); dates are kept in the future
+    # so the tools' date validation passes on any day
+    checkin = date.today() + timedelta(days=30)
+    checkout = checkin + timedelta(days=4)
+    return [
+        (
+            "flights",
+            "flight_search_tool",
+            {
+                "origin": "SFO",
+                "destination": "JFK",
+                "departure_date": checkin.isoformat(),
+            },
+        ),
+        (
+            "hotels",
+            "hotel_search_tool",
+            {
+                "city": "Paris",
+                "checkin_date": checkin.isoformat(),
+                "checkout_date": checkout.isoformat(),
+            },
+        ),
+        (
+            "whole trip",
+            "trip_bundle_search",
+            {
+                "origin": "SFO",
+                "destination": "JFK",
+                "destination_city": "New York",
+                "departure_date": checkin.isoformat(),
+                "return_date": checkout.isoformat(),
+            },
+        ),
+    ]
+
+
+def _interaction(host: str, path: str, body: Any, latency_ms: float) -> Dict[str, Any]:
+    return {
+        "request": {"method": "GET", "host": host, "path": path, "query": ""},
+        "response": {
+            "status": 200,
+            "headers": {"content-type": "application/json"},
+            "body": json.dumps(body),
+            "elapsed_ms": latency_ms,
+        },
+    }
+
+
+def write_stub_cassettes(
+    directory: str, latency_ms: float = 50.0, results: int = 30
+) -> None:
+    """Write replay cassettes for every upstream API into `directory`."""
+    fares = [
+        {
+            "origin": "SFO",
+            "destination": "JFK",
+            "price": 180 + 9 * i,
+            "airline": ("UA", "AA", "DL", "B6")[i % 4],
+            "departure_at": "2025-12-10T08:00:00-08:00",
+            "duration": 330 + 20 * (i % 7),
+            "transfers": i % 3,
+            "link": f"/search/SFO1012JFK1?t={i}",
+        }
+        for i in range(results)
+    ]
+    stays = [
+        {
+            "name": f"Hotel {i}",
+            "price": {"value": 90 + 13 * i, "currency": "USD"},
+            "rating": 6.5 + (i % 7) / 2,
+            "address": {"street": f"{i} Rue de Rivoli", "city": "Paris"},
+            "distance": f"{0.5 + (i % 9)} km",
+            "url": f"https://www.booking.com/hotel/fr/{i}.html",
+        }
+        for i in range(results)
+    ]
+    businesses = [
+        {
+            "name": f"Bistro {i}",
+            "price": "$$",
+            "rating": 4.0 + (i % 3) / 2,
+            "location": {"display_address": [f"{i} Broadway", "New York, NY"]},
+            "categories": [{"title": "French"}, {"title": "Wine Bars"}],
+            "image_url": f"https://s3-media.example/bphoto/{i}/o.jpg",
+            "url": f"https://www.yelp.com/biz/bistro-{i}",
+        }
+        for i in range(10)
+    ]
+    events = [
+        {
+            "name": f"Concert {i}",
+            "url": f"https://www.ticketmaster.com/event/{i}",
+            "dates": {"start": {"localDate": "2025-12-11"}},
+            "classifications": [{"name": "Music"}],
+            "_embedded": {"venues": [{"name": "Madison Square Garden"}]},
+        }
+        for i in range(10)
+    ]
+    cassettes = {
+        "api.travelpayouts.com": [
+            _interaction(
+                "api.travelpayouts.com",
+                "/aviasales/v3/prices_for_dates",
+                {"success": True, "data": fares},
+                latency_ms,
+            )
+        ],
+        HOTELS_HOST: [
+            _interaction(
+                HOTELS_HOST,
+                "/stays/auto-complete",
+                {"data": [{"id": "loc-1"}]},
+                latency_ms,
+            ),
+            _interaction(
+                HOTELS_HOST, "/stays/search", {"data": {"stays": stays}}, latency_ms
+            ),
+        ],
+        "api.yelp.com": [
+            _interaction(
+                "api.yelp.com",
+                "/v3/businesses/search",
+                {"businesses": businesses},
+                latency_ms,
+            )
+        ],
+        "app.ticketmaster.com": [
+            _interaction(
+                "app.ticketmaster.com",
+                "/discovery/v2/events.json",
+                {"_embedded": {"events": events}},
+                latency_ms,
+            )
+        ],
+    }
+    os.makedirs(directory, exist_ok=True)
+    for host, interactions in cassettes.items():
+        with open(os.path.join(directory, f"{host}.json"), "w") as f:
+            json.dump({"interactions": interactions}, f)
+
+
+def _planned_call(messages: List[ModelMessage]) -> Optional[ToolCallPart]:
+    """The tool call for this step, or None once it is time to answer."""
+    last = messages[-1]
+    if not isinstance(last, ModelRequest):
+        return None
+    if any(isinstance(part, ToolReturnPart) for part in last.parts):
+        return None
+    prompt = " ".join(
+        part.content
+        for part in last.parts
+        if isinstance(part, UserPromptPart) and isinstance(part.content, str)
+    ).lower()
+    for keyword, tool, args in _scenario_calls():
+        if keyword in prompt:
+            return ToolCallPart(tool_name=tool, args=args)
+    return None
+
+
+def scripted_model(token_latency: float = 0.005, answer: str = ANSWER) -> FunctionModel:
+    """
+    Offline model: one tool call for flight/hotel/trip messages, then a
+    fixed answer emitted word by word, `token_latency` seconds per word.
+    """
+    words = answer.split(" ")
+
+    async def respond(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        call = _planned_call(messages)
+        if call is not None:
+            return ModelResponse(parts=[call])
+        await asyncio.sleep(token_latency * len(words))
+        return ModelResponse(parts=[TextPart(answer)])
+
+    async def stream(
+        messages: List[ModelMessage], info: AgentInfo
+    ) -> AsyncIterator[Union[str, DeltaToolCalls]]:
+        call = _planned_call(messages)
+        if call is not None:
+            yield {
+                0: DeltaToolCall(name=call.tool_name, json_args=call.args_as_json_str())
+            }
+            return
+        for i, word in enumerate(words):
+            await asyncio.sleep(token_latency)
+            yield word if i == 0 else " " + word
+
+    return FunctionModel(respond, stream_function=stream, model_name="scripted")
@@ -0,0 +1,130 @@
+"""
+Context Builder - Token-budgeted prompt assembly for each chat turn.
+
+The context message sent to the agent contains the current message, the
+itinerary progress, a rolling summary of older turns and the most recent
+messages verbatim, all kept under a fixed token budget so prompt size (and
+LLM latency) stays flat over long planning sessions.
+
+The summary is extractive and updated one turn at a time: messages that
+fall out of the recent window are folded into it once and the result is
+cached on the session, so no turn re-reads the whole history.
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from session_store import Session
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, marking the cut with an ellipsis."""
+    max_chars = max(max_tokens, 0) * 4
+    if len(text) <= max_chars:
+        return text
+    return text[: max(max_chars - 1, 0)].rstrip() + "…"
+
+
+@dataclass
+class ContextBudget:
+    """Token limits for the pieces of the context message."""
+
+    total_tokens: int = 1500
+    summary_tokens: int = 300
+    progress_tokens: int = 300
+    recent_messages: int = 6
+    summary_line_chars: int = 160
+
+    @classmethod
+    def from_env(cls) -> "ContextBudget":
+        """Create the budget from environment variables."""
+        return cls(
+            total_tokens=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+            summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300")),
+            progress_tokens=int(os.getenv("CONTEXT_PROGRESS_TOKENS", "300")),
+            recent_messages=int(os.getenv("CONTEXT_RECENT_MESSAGES", "6")),
+        )
+
+
+def _summary_line(message: Dict[str, Any], max_chars: int) -> str:
+    content = _WHITESPACE.sub(" ", str(message.get("content", ""))).strip()
+    first_sentence = _SENTENCE_END.split(content, maxsplit=1)[0]
+    if len(first_sentence) > max_chars:
+        first_sentence = first_sentence[: max_chars - 1].rstrip() + "…"
+    return f"{message.get('role', 'user')}: {first_sentence}"
+
+
+def update_summary(session: Session, budget: ContextBudget) -> None:
+    """
+    Fold messages that left the recent window into the session's rolling
+    summary. Only messages not yet summarized are visited.
+    """
+    fold_upto = max(len(session.messages) - budget.recent_messages, 0)
+    if fold_upto <= session.summarized_upto:
+        return
+
+    for message in session.messages[session.summarized_upto : fold_upto]:
+        line = _summary_line(message, budget.summary_line_chars)
+        session.summary_lines.append(line)
+        session.summary_tokens += estimate_tokens(line) + 1
+    session.summarized_upto = fold_upto
+
+    # Keep the summary inside its budget by dropping the oldest lines;
+    # durable decisions live in itinerary_progress anyway.
+    while session.summary_tokens > budget.summary_tokens and session.summary_lines:
+        dropped = session.summary_lines.pop(0)
+        session.summary_tokens -= estimate_tokens(dropped) + 1
+
+
+def build_context_message(
+    message: str, session: Session, budget: Optional[ContextBudget] = None
+) -> str:
+    """Assemble the context message for this turn within the token budget."""
+    budget = budget or ContextBudget.from_env()
+    update_summary(session, budget)
+
+    head = f"Current message: {message}\n\n"
+    remaining = budget.total_tokens - estimate_tokens(head)
+
+    progress = ""
+    if session.itinerary_progress:
+        compact = json.dumps(session.itinerary_progress, separators=(",", ":"))
+        progress = "\nCurrent itinerary progress: " + truncate_to_tokens(
+            compact, min(budget.progress_tokens, max(remaining, 0))
+        )
+        remaining -= estimate_tokens(progress)
+
+    summary = ""
+    if session.summary_lines:
+        summary = "Earlier in this conversation (summary):\n"
+        summary += "\n".join(session.summary_lines) + "\n\n"
+        remaining -= estimate_tokens(summary)
+
+    # Fill the rest with the most recent messages, newest first.
+    recent: List[str] = []
+    for msg in reversed(session.messages[session.summarized_upto :]):
+        if remaining <= 0:
+            break
+        line = f"{msg['role']}: {msg['content']}\n"
+        cost = estimate_tokens(line)
+        if cost > remaining:
+            line = truncate_to_tokens(line.rstrip("\n"), remaining) + "\n"
+            cost = remaining
+        recent.append(line)
+        remaining -= cost
+
+    context_message = head + summary
+    if recent:
+        context_message += "Previous conversation:\n" + "".join(reversed(recent))
+    return context_message + progress
@@ -0,0 +1,296 @@
+"""
+Metrics - Prometheus text exposition for the backend.
+
+`/metrics` exposes latency histograms per endpoint, tool and upstream host,
+agent runs in flight and LLM token usage, plus gauges read from the
+counters the backend already keeps (SSE streams, cache hit ratios and
+refresh errors, upstream error and timeout counts, tool result budgets).
+
+Collection stays off the hot path: an observation is one bisect and two
+increments on plain lists, and everything else is read from existing
+stats only when /metrics is scraped. The event loop is single-threaded,
+so no locks are taken.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+PREFIX = "travelbot"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; chat turns run from milliseconds (cached) to a minute
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# pydantic-ai usage fields exported as llm_*_total counters
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_read_tokens",
+    "requests",
+    "tool_calls",
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with one series per label set."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for values, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                labels = _labels(self.labels + ("le",), values + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {round(total, 6)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def family(
+    name: str,
+    kind: str,
+    description: str,
+    samples: Sequence[Tuple[Dict[str, Any], float]],
+) -> List[str]:
+    """Render a counter or gauge from (labels, value) samples."""
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {value}")
+    return lines
+
+
+class BackendMetrics:
+    """Process-wide histograms and counters updated on the request path."""
+
+    def __init__(self):
+        self.requests = Histogram(
+            f"{PREFIX}_http_request_duration_seconds",
+            "HTTP request latency by route, including the whole SSE stream",
+            ("method", "route", "status"),
+        )
+        self.tools = Histogram(
+            f"{PREFIX}_tool_duration_seconds",
+            "Agent tool invocation latency",
+            ("tool",),
+        )
+        self.upstream = Histogram(
+            f"{PREFIX}_upstream_request_duration_seconds",
+            "Upstream API request latency by host",
+            ("host",),
+        )
+        self.agent_runs_in_flight = 0
+        self.agent_runs = 0
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+
+    @contextmanager
+    def agent_run(self) -> Iterator[None]:
+        """Count an agent run as in flight for the duration of the block."""
+        self.agent_runs_in_flight += 1
+        self.agent_runs += 1
+        try:
+            yield
+        finally:
+            self.agent_runs_in_flight -= 1
+
+    def record_usage(self, result: Any) -> None:
+        """Add an agent run result's token usage to the totals."""
+        usage = result.usage
+        # A method on older pydantic-ai releases, a property on newer ones
+        if callable(usage):
+            usage = usage()
+        for name in USAGE_FIELDS:
+            self.usage[name] += getattr(usage, name, 0) or 0
+
+    def render(
+        self,
+        streams: Dict[str, Any],
+        upstream: Optional[Dict[str, Any]] = None,
+        caches: Optional[Dict[str, Dict[str, Any]]] = None,
+        tool_results: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> str:
+        """
+        Exposition text: this object's series plus gauges and counters from
+        stream, upstream pool, cache and tool budget snapshots.
+        """
+        lines = self.requests.render() + self.tools.render() + self.upstream.render()
+        lines += family(
+            f"{PREFIX}_agent_runs_in_flight",
+            "gauge",
+            "Agent runs currently executing",
+            [({}, self.agent_runs_in_flight)],
+        )
+        lines += family(
+            f"{PREFIX}_agent_runs_total",
+            "counter",
+            "Agent runs started (cached answers excluded)",
+            [({}, self.agent_runs)],
+        )
+        for name, value in self.usage.items():
+            lines += family(
+                f"{PREFIX}_llm_{name}_total",
+                "counter",
+                f"LLM {name.replace('_', ' ')} reported by agent runs",
+                [({}, value)],
+            )
+
+        lines += family(
+            f"{PREFIX}_sse_streams_active",
+            "gauge",
+            "Open /chat/stream responses",
+            [({}, streams["active_streams"])],
+        )
+        lines += family(
+            f"{PREFIX}_sse_streams_total",
+            "counter",
+            "Finished /chat/stream responses",
+            [({}, streams["completed_streams"])],
+        )
+        lines += family(
+            f"{PREFIX}_sse_stream_errors_total",
+            "counter",
+            "/chat/stream responses that ended with an error",
+            [({}, streams["errors"])],
+        )
+
+        hosts = (upstream or {}).get("hosts", {})
+        for field, kind, description in (
+            ("requests", "counter", "Upstream requests sent"),
+            ("errors", "counter", "Upstream requests failed at the transport"),
+            ("timeouts", "counter", "Upstream requests that timed out"),
+            ("in_flight", "gauge", "Upstream requests awaiting a response"),
+            ("open_connections", "gauge", "Pooled upstream connections"),
+        ):
+            suffix = "_total" if kind == "counter" else ""
+            lines += family(
+                f"{PREFIX}_upstream_{field}{suffix}",
+                kind,
+                description,
+                [
+                    ({"host": host}, s.get(field, 0))
+                    for host, s in sorted(hosts.items())
+                ],
+            )
+
+        caches = caches or {}
+        for field, kind, description in (
+            ("hits", "counter", "Cache hits"),
+            ("misses", "counter", "Cache misses"),
+            ("hit_ratio", "gauge", "Cache hits over lookups since start"),
+            ("refresh_errors", "counter", "Background refreshes that failed"),
+            ("rejected", "counter", "Fetched values not cached (upstream errors)"),
+        ):
+            suffix = "_total" if kind == "counter" else ""
+            lines += family(
+                f"{PREFIX}_cache_{field}{suffix}",
+                kind,
+                description,
+                # Refresh counters only exist on stale-while-revalidate caches
+                [
+                    ({"cache": name}, c[field])
+                    for name, c in caches.items()
+                    if field in c
+                ],
+            )
+
+        tool_results = tool_results or {}
+        for field, description in (
+            ("calls", "Tool results produced"),
+            ("truncated", "Tool results cut to the token budget"),
+        ):
+            lines += family(
+                f"{PREFIX}_tool_results_{field}_total",
+                "counter",
+                description,
+                [
+                    ({"tool": t}, s.get(field, 0))
+                    for t, s in sorted(tool_results.items())
+                ],
+            )
+        return "\n".join(lines) + "\n"
+
+
+backend_metrics = BackendMetrics()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency by route template. Streaming
+    responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the shared scope; raw
+            # paths are not used so unknown URLs cannot add series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            backend_metrics.requests.observe(
+                time.perf_counter() - started, scope["method"], route, str(status)
+            )
@@ -0,0 +1,284 @@
+"""
+Profiling - Opt-in statistical profiler for slow chat turns.
+
+Tracing shows where a turn waited; it cannot show CPU spent on our side,
+such as JSON parsing, pydantic validation or formatting. A profiled turn
+runs under a sampling profiler:
+
+- a background thread wakes every PROFILE_INTERVAL_MS and captures the
+  Python stack of the thread running the event loop;
+- each sample is credited to the profile of the asyncio task that is
+  executing at that moment (tool calls in child tasks inherit it), so
+  concurrent unprofiled requests on the same loop are not mixed in;
+- time spent awaiting I/O is not sampled, since no task is running.
+
+Turns are profiled when a PROFILE_SAMPLE_PERCENT random share is drawn,
+or when the request carries `X-Profile-Token: <PROFILE_TOKEN>`. The
+sampler thread only runs while a profiled turn is in progress; then it
+takes the GIL briefly every interval, a cost every turn in the process
+shares.
+
+The sampler can only interrupt CPU-bound code when the interpreter hands
+over the GIL (every 5 ms by default), so long CPU stretches get about one
+sample per 5 ms. PROFILE_SWITCH_INTERVAL_MS lowers the interpreter's switch
+interval while profiles run for finer samples. That setting is process-wide:
+concurrent unprofiled turns also pay for the extra GIL handoffs, so it is
+off unless set.
+
+Each profile is kept in memory (the last PROFILE_KEEP) as folded stacks,
+one `frame;frame;frame count` line per unique stack. flamegraph.pl,
+inferno and speedscope read that format directly. Profiles are listed and
+downloaded from /admin/profiles with the same token.
+"""
+
+import asyncio
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+PROFILE_HEADER = "X-Profile-Token"
+
+# Deepest stack recorded per sample; deeper frames are cut at the root end
+MAX_STACK_DEPTH = 128
+
+
+@dataclass
+class ProfileSettings:
+    """When to profile and how finely to sample."""
+
+    sample_percent: float = 0.0
+    interval: float = 0.005
+    token: str = ""
+    keep: int = 50
+    # Seconds; 0 leaves sys.getswitchinterval() alone (see module docstring)
+    switch_interval: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ProfileSettings":
+        """Create profile settings from environment variables."""
+        return cls(
+            sample_percent=float(os.getenv("PROFILE_SAMPLE_PERCENT", "0")),
+            interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+            token=os.getenv("PROFILE_TOKEN", ""),
+            keep=int(os.getenv("PROFILE_KEEP", "50")),
+            switch_interval=float(os.getenv("PROFILE_SWITCH_INTERVAL_MS", "0")) / 1000,
+        )
+
+
+@dataclass
+class Profile:
+    """Stack samples collected for one chat turn."""
+
+    profile_id: str
+    name: str
+    reason: str
+    started_at: float
+    session_id: str = ""
+    trace_id: str = ""
+    duration_ms: float = 0.0
+    stacks: Counter = field(default_factory=Counter)
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def folded(self) -> str:
+        """Folded stacks, root first, most sampled stack first."""
+        return "".join(f"{s} {n}\n" for s, n in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Functions with the most samples at the top of the stack."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = self.samples or 1
+        return [
+            {"function": f, "samples": n, "share": round(n / total, 3)}
+            for f, n in leaves.most_common(limit)
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "reason": self.reason,
+            "session_id": self.session_id,
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "samples": self.samples,
+            "top_functions": self.top_functions(5),
+        }
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    # Keep paths short: package-relative for libraries, basename for ours
+    marker = "site-packages/"
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    else:
+        filename = filename.rsplit("/", 1)[-1]
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def fold_stack(frame: Optional[FrameType]) -> str:
+    """`root;...;leaf` labels for a frame and its callers."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+_active_profile: ContextVar[Optional[Profile]] = ContextVar(
+    "active_profile", default=None
+)
+
+
+class Profiler:
+    """Chooses turns to profile, samples them and keeps recent profiles."""
+
+    def __init__(
+        self,
+        settings: Optional[ProfileSettings] = None,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.settings = settings or ProfileSettings()
+        self._rng = rng
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._running: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._switch_interval: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        return cls(ProfileSettings.from_env())
+
+    def token_matches(self, token: Optional[str]) -> bool:
+        """True when profiling is privileged-enabled and the token is right."""
+        expected = self.settings.token
+        return bool(expected and token) and secrets.compare_digest(
+            token.encode(), expected.encode()
+        )
+
+    def reason(self, headers: Mapping[str, str]) -> Optional[str]:
+        """Why this request should be profiled, or None to run it unprofiled."""
+        if self.token_matches(headers.get(PROFILE_HEADER)):
+            return "header"
+        percent = self.settings.sample_percent
+        if percent > 0 and self._rng() * 100 < percent:
+            return "sampled"
+        return None
+
+    @contextmanager
+    def profile(self, name: str, reason: Optional[str]) -> Iterator[Optional[Profile]]:
+        """
+        Sample the enclosed block (and the tasks it starts) when `reason` is
+        set; otherwise do nothing and yield None.
+        """
+        if reason is None:
+            yield None
+            return
+        profile = Profile(
+            profile_id=secrets.token_hex(8),
+            name=name,
+            reason=reason,
+            started_at=time.time(),
+        )
+        loop = asyncio.get_running_loop()
+        token = _active_profile.set(profile)
+        started = time.perf_counter()
+        self._start(profile, loop)
+        try:
+            yield profile
+        finally:
+            self._stop(profile)
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                _active_profile.reset(token)
+            except ValueError:
+                # A streaming generator closed from another context
+                _active_profile.set(None)
+            self._store(profile)
+
+    def _start(self, profile: Profile, loop: asyncio.AbstractEventLoop) -> None:
+        with self._lock:
+            self._running[id(profile)] = (loop, threading.get_ident())
+            if self.settings.switch_interval > 0 and self._switch_interval is None:
+                # Opt-in and process-wide: every thread switches this often
+                # until the last running profile finishes
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(
+                    min(self._switch_interval, self.settings.switch_interval)
+                )
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._sample_loop, name="profiler", daemon=True
+                )
+                self._thread.start()
+
+    def _stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._running.pop(id(profile), None)
+            if not self._running and self._switch_interval is not None:
+                sys.setswitchinterval(self._switch_interval)
+                self._switch_interval = None
+
+    def _sample_loop(self) -> None:
+        while True:
+            # Jitter keeps samples from locking step with periodic work
+            time.sleep(self.settings.interval * random.uniform(0.5, 1.5))
+            with self._lock:
+                if not self._running:
+                    self._thread = None
+                    return
+                targets = set(self._running.values())
+            frames = sys._current_frames()
+            for loop, thread_id in targets:
+                frame = frames.get(thread_id)
+                task = asyncio.current_task(loop)
+                if frame is None or task is None:
+                    continue
+                profile = task.get_context().get(_active_profile)
+                if profile is None:
+                    continue
+                stack = fold_stack(frame)
+                with self._lock:
+                    # Finished profiles may already be read by the admin API
+                    if id(profile) in self._running:
+                        profile.stacks[stack] += 1
+
+    def _store(self, profile: Profile) -> None:
+        self._profiles[profile.profile_id] = profile
+        while len(self._profiles) > self.settings.keep:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of kept profiles, newest first."""
+        return [p.summary() for p in reversed(self._profiles.values())]
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    """Return the process-wide profiler, configured from the environment."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler.from_env()
+    return _profiler
@@ -0,0 +1,129 @@
+"""
+Response Cache - Opt-in exact-match cache of agent answers.
+
+Many sessions open with nearly the same message ("Hello! Can you help me
+plan a trip to New York?") and each one pays for a full model run. With
+RESPONSE_CACHE_ENABLED=1 the answer to such a turn is kept in memory and
+replayed when the same turn comes in again.
+
+Turns are keyed on the whitespace- and case-normalized context message,
+the itinerary stage and the model name. Only turns whose answer cannot
+depend on live data are stored: the agent must not have called any tool,
+or only tools that are deterministic (offline lookups), and must not have
+changed the itinerary progress. Entries expire after a TTL and the least
+recently used ones are evicted beyond the size limit.
+"""
+
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+
+from tools.cache import LRUCache
+
+# Tools whose result depends only on their arguments, never on live data
+DETERMINISTIC_TOOLS = frozenset({"airport_lookup_tool"})
+
+_WHITESPACE = re.compile(r"\s+")
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_message(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different turns match."""
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def turn_is_cacheable(messages: Iterable[ModelMessage]) -> bool:
+    """True when the turn called no tools, or only deterministic ones."""
+    for message in messages:
+        if not isinstance(message, ModelResponse):
+            continue
+        for part in message.parts:
+            if isinstance(part, ToolCallPart) and (
+                part.tool_name not in DETERMINISTIC_TOOLS
+            ):
+                return False
+    return True
+
+
+class ResponseCache:
+    """In-memory TTL/LRU cache of agent answers with hit-rate counters."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        maxsize: int = 256,
+        ttl: float = 600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.enabled = enabled
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.stores = 0
+        self.uncacheable = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Create the response cache from environment variables."""
+        return cls(
+            enabled=os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1",
+            maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "600")),
+        )
+
+    @staticmethod
+    def key(
+        context_message: str, itinerary_progress: Dict[str, Any], model: str
+    ) -> CacheKey:
+        stage = str(itinerary_progress.get("stage", "initial"))
+        return normalize_message(context_message), stage, model
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """Return the cached answer for this turn, if any."""
+        if not self.enabled:
+            return None
+        return self._cache.get(key)
+
+    def store(
+        self,
+        key: CacheKey,
+        output: str,
+        messages: Iterable[ModelMessage],
+        progress_changed: bool = False,
+    ) -> bool:
+        """Cache an answer if the turn is safe to replay; return whether it was."""
+        if not self.enabled:
+            return False
+        if progress_changed or not output or not turn_is_cacheable(messages):
+            self.uncacheable += 1
+            return False
+        self._cache.set(key, output)
+        self.stores += 1
+        return True
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl_seconds": self._cache.ttl,
+            "stores": self.stores,
+            "uncacheable_turns": self.uncacheable,
+            **self._cache.stats.as_dict(),
+        }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache, configured from the environment."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache.from_env()
+    return _response_cache
@@ -3,15 +3,32 @@ FastAPI server for Travel-Bot using Pydantic-AI unified travel agent.
 Provides HTTP endpoints for travel planning functionality.
 """
 
-import json
-from typing import Any, Dict, List
+import asyncio
+import copy
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from agent_dependencies import TravelDependencies
+from context_builder import build_context_message
+from metrics import CONTENT_TYPE, MetricsMiddleware, backend_metrics
+from profiling import Profiler, get_profiler
+from response_cache import CacheKey, get_response_cache
+from session_store import Session, get_session_store
+from streaming import DeltaBuffer, FlushPolicy, sse_frame, stream_metrics
+from tool_budget import get_tool_budget, tool_budget_metrics
+from tools import singleflight
+from tools.flight_scraper import get_fare_cache
+from tools.hotel_schema import get_schema_registry
+from tools.http_client import (TICKETMASTER_HOST, TRAVELPAYOUTS_HOST, YELP_HOST,
+                               UpstreamPools)
+from tools.location_cache import get_location_cache
+from tracing import get_tracer, span, start_trace
 from travel_agent import travel_agent
 
 
@@ -19,15 +36,62 @@ from travel_agent import travel_agent
 class ChatRequest(BaseModel):
     message: str
     stream: bool = False
-    message_history: List[Dict[str, Any]] = []
-    itinerary_progress: Dict[str, Any] = {}
     session_id: str = ""
+    # "cumulative" frames carry the whole answer so far, "delta" only new text
+    stream_mode: Literal["cumulative", "delta"] = "cumulative"
+    # Legacy client-side state; omit both to use the server-side session
+    message_history: Optional[List[Dict[str, Any]]] = None
+    itinerary_progress: Optional[Dict[str, Any]] = None
 
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: str = ""
+    new_messages: List[Dict[str, Any]] = []
     updated_itinerary_progress: Dict[str, Any] = {}
+    # Only filled for legacy clients that sent message_history
     updated_message_history: List[Dict[str, Any]] = []
+    # True when the answer was replayed from the response cache
+    cached: bool = False
+
+
+# Initialize dependencies (base instance)
+base_deps = TravelDependencies.from_env()
+
+# SSE flush policy for /chat/stream
+stream_policy = FlushPolicy.from_env()
+
+
+def configured_upstream_hosts(deps: TravelDependencies) -> List[str]:
+    """Upstream hosts whose API keys are configured and worth pre-connecting."""
+    hosts = []
+    if deps.travelpayouts_token:
+        hosts.append(TRAVELPAYOUTS_HOST)
+    if deps.hotels_rapidapi_key:
+        hosts.append(deps.hotels_rapidapi_host)
+    if deps.yelp_api_key:
+        hosts.append(YELP_HOST)
+    if deps.ticketmaster_api_key:
+        hosts.append(TICKETMASTER_HOST)
+    return hosts
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open pooled upstream connections at startup and close them on shutdown."""
+    pools = UpstreamPools.from_env(configured_upstream_hosts(base_deps))
+    if pools.settings.warmup:
+        await pools.warm_up()
+    app.state.upstream = pools
+    yield
+    app.state.upstream = None
+    await pools.aclose()
+    await get_tracer().flush()
+
+
+def app_upstream() -> Optional[UpstreamPools]:
+    """App-scoped upstream pools, or None when the lifespan has not run."""
+    return getattr(app.state, "upstream", None)
 
 
 # Initialize FastAPI app
@@ -35,6 +99,7 @@ app = FastAPI(
     title="Travel-Bot API",
     description="AI-powered travel planning assistant",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware - TODO: Change for production
@@ -48,9 +113,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-
-# Initialize dependencies (base instance)
-base_deps = TravelDependencies.from_env()
+# Latency histograms per route for /metrics
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -63,6 +127,10 @@ async def root():
             "chat": "/chat",
             "chat_stream": "/chat/stream",
             "health": "/health",
+            "upstream_stats": "/upstream/stats",
+            "cache_stats": "/cache/stats",
+            "stream_stats": "/stream/stats",
+            "metrics": "/metrics",
         },
     }
 
@@ -80,94 +148,236 @@ async def health_check():
     }
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def start_turn(
+    request: ChatRequest,
+) -> Tuple[Session, TravelDependencies, str]:
     """
-    Chat endpoint for non-streaming responses.
-
-    Args:
-        request: ChatRequest containing message, history, and progress
+    Load the session for a chat request and build the agent dependencies and
+    context message for this turn.
 
-    Returns:
-        ChatResponse with the agent's response and updated progress
+    Legacy clients that send message_history/itinerary_progress overwrite
+    the stored session with their copy; new clients send only the message.
+    The session store's SQLite I/O runs in a worker thread.
     """
-    try:
-        # Create dependencies with session context
-        deps = TravelDependencies.from_env(
-            session_id=request.session_id,
-            message_history=request.message_history,
-            itinerary_progress=request.itinerary_progress,
+    store = get_session_store()
+    session_id = request.session_id or uuid.uuid4().hex
+    if request.message_history is not None or request.itinerary_progress is not None:
+        session = await asyncio.to_thread(
+            store.replace,
+            session_id,
+            request.message_history or [],
+            request.itinerary_progress or {},
         )
+    else:
+        session = await asyncio.to_thread(store.load, session_id)
+
+    # Create dependencies with session context
+    deps = TravelDependencies.from_env(
+        session_id=session_id,
+        message_history=session.messages,
+        itinerary_progress=dict(session.itinerary_progress),
+        upstream=app_upstream(),
+    )
+
+    # Create token-budgeted context message (rolling summary + recent turns)
+    context_message = build_context_message(request.message, session)
+
+    return session, deps, context_message
 
-        # Add current message to history
-        updated_history = request.message_history + [
-            {"role": "user", "content": request.message}
-        ]
 
-        # Create context message with history
-        context_message = f"Current message: {request.message}\n\n"
-        if request.message_history:
-            context_message += "Previous conversation:\n"
-            for msg in request.message_history[-5:]:  # Last 5 messages for context
-                context_message += f"{msg['role']}: {msg['content']}\n"
+def response_cache_key(context_message: str, deps: TravelDependencies) -> CacheKey:
+    """Response cache key for this turn (context, itinerary stage, model)."""
+    model = travel_agent.model
+    model_name = getattr(model, "model_name", None) or str(model)
+    return get_response_cache().key(
+        context_message, deps.itinerary_progress, model_name
+    )
+
 
-        if request.itinerary_progress:
-            context_message += f"\nCurrent itinerary progress: {json.dumps(request.itinerary_progress)}"
+async def finish_turn(
+    session: Session, request: ChatRequest, output: str, deps: TravelDependencies
+) -> List[Dict[str, Any]]:
+    """Append this turn to the session and return the new messages."""
+    new_messages = [
+        {"role": "user", "content": request.message},
+        {"role": "assistant", "content": output},
+    ]
+    await asyncio.to_thread(
+        get_session_store().append_turn, session, new_messages, deps.itinerary_progress
+    )
+    return new_messages
 
-        result = await travel_agent.run(context_message, deps=deps)
 
-        # Add assistant response to history
-        updated_history.append({"role": "assistant", "content": result.output})
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(
+    request: ChatRequest, response: Response, http_request: Request
+):
+    """
+    Chat endpoint for non-streaming responses.
+
+    Args:
+        request: ChatRequest containing the new message and session_id
 
+    Returns:
+        ChatResponse with the agent's response, this turn's messages and
+        updated progress. The Server-Timing header breaks the turn down
+        into model, tool and upstream time; profiled turns also get an
+        X-Profile-Id header.
+    """
+    profiler = get_profiler()
+    reason = profiler.reason(http_request.headers)
+    try:
+        with (
+            start_trace("POST /chat", request.session_id) as trace,
+            profiler.profile("POST /chat", reason) as profile,
+        ):
+            session, deps, context_message = await start_turn(request)
+            trace.session_id = session.session_id
+            if profile is not None:
+                profile.session_id = session.session_id
+                profile.trace_id = trace.trace_id
+
+            # Repeated turns that needed no live data are answered from cache
+            cache = get_response_cache()
+            cache_key = response_cache_key(context_message, deps)
+            output = cache.get(cache_key)
+            cached = output is not None
+            trace.root.attributes["response.cached"] = cached
+            if not cached:
+                progress_before = copy.deepcopy(deps.itinerary_progress)
+                with span("agent.run", "agent"), backend_metrics.agent_run():
+                    result = await travel_agent.run(context_message, deps=deps)
+                backend_metrics.record_usage(result)
+                output = result.output
+                cache.store(
+                    cache_key,
+                    output,
+                    result.new_messages(),
+                    progress_changed=deps.itinerary_progress != progress_before,
+                )
+
+            new_messages = await finish_turn(session, request, output, deps)
+
+        response.headers["Server-Timing"] = trace.server_timing()
+        if profile is not None:
+            response.headers["X-Profile-Id"] = profile.profile_id
         return ChatResponse(
-            response=result.output,
+            response=output,
+            session_id=session.session_id,
+            new_messages=new_messages,
             updated_itinerary_progress=deps.itinerary_progress,
-            updated_message_history=updated_history,
+            updated_message_history=(
+                list(session.messages) if request.message_history is not None else []
+            ),
+            cached=cached,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent processing error: {str(e)}")
 
 
-async def response_generator(request: ChatRequest):
+async def response_generator(
+    request: ChatRequest, profile_reason: Optional[str] = None
+):
     """
     Async generator for true streaming responses from the travel agent using Pydantic-AI.
+
+    Frames are pre-encoded bytes; their timing and volume are recorded in
+    `stream_metrics` and reported in the final frame. With a
+    `profile_reason` the turn is profiled (see profiling.py).
     """
+    stats = stream_metrics.opened()
+    failed = False
     try:
-        # Create dependencies with session context
-        deps = TravelDependencies.from_env(
-            session_id=request.session_id,
-            message_history=request.message_history,
-            itinerary_progress=request.itinerary_progress,
-        )
-
-        # Create context message with history
-        context_message = f"Current message: {request.message}\n\n"
-        if request.message_history:
-            context_message += "Previous conversation:\n"
-            for msg in request.message_history[-5:]:  # Last 5 messages for context
-                context_message += f"{msg['role']}: {msg['content']}\n"
-
-        if request.itinerary_progress:
-            context_message += f"\nCurrent itinerary progress: {json.dumps(request.itinerary_progress)}"
-
-        # Use Pydantic-AI's true streaming capability
-        async with travel_agent.run_stream(context_message, deps=deps) as result:
-            full_response = ""
-            async for chunk in result.stream_output(debounce_by=0.01):
-                # Stream each chunk as it's generated by the LLM
-                full_response += chunk
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
+        with (
+            start_trace("POST /chat/stream", request.session_id) as trace,
+            get_profiler().profile("POST /chat/stream", profile_reason) as profile,
+        ):
+            session, deps, context_message = await start_turn(request)
+            trace.session_id = session.session_id
+            if profile is not None:
+                profile.session_id = session.session_id
+                profile.trace_id = trace.trace_id
+
+            cache = get_response_cache()
+            cache_key = response_cache_key(context_message, deps)
+            full_response = cache.get(cache_key)
+            cached = full_response is not None
+            trace.root.attributes["response.cached"] = cached
+            if cached:
+                # Replayed answers go out as a single frame
+                field = "delta" if request.stream_mode == "delta" else "content"
+                yield stats.record(sse_frame({field: full_response}))
+            else:
+                progress_before = copy.deepcopy(deps.itinerary_progress)
+                # Use Pydantic-AI's true streaming capability
+                with span("agent.run_stream", "agent"), backend_metrics.agent_run():
+                    async with travel_agent.run_stream(
+                        context_message, deps=deps
+                    ) as result:
+                        if request.stream_mode == "delta":
+                            # Only new text per frame; small pieces may be
+                            # held back until the flush policy's byte
+                            # threshold is reached
+                            parts = []
+                            buffer = DeltaBuffer(stream_policy.min_bytes)
+                            async for delta in result.stream_text(
+                                delta=True, debounce_by=stream_policy.interval
+                            ):
+                                parts.append(delta)
+                                text = buffer.push(delta)
+                                if text:
+                                    yield stats.record(sse_frame({"delta": text}))
+                            text = buffer.flush()
+                            if text:
+                                yield stats.record(sse_frame({"delta": text}))
+                            full_response = "".join(parts)
+                        else:
+                            # Each chunk is the cumulative output so far
+                            full_response = ""
+                            async for chunk in result.stream_output(
+                                debounce_by=stream_policy.interval
+                            ):
+                                full_response = chunk
+                                yield stats.record(sse_frame({"content": chunk}))
+
+                        backend_metrics.record_usage(result)
+                        cache.store(
+                            cache_key,
+                            full_response,
+                            result.new_messages(),
+                            progress_changed=(
+                                deps.itinerary_progress != progress_before
+                            ),
+                        )
+
+            await finish_turn(session, request, full_response, deps)
 
             # Send completion signal with updated progress when streaming is done
-            yield f"data: {json.dumps({'content': '', 'done': True, 'itinerary_progress': deps.itinerary_progress})}\n\n"
+            done = {
+                "content": "",
+                "done": True,
+                "session_id": session.session_id,
+                "itinerary_progress": deps.itinerary_progress,
+                "cached": cached,
+                "stats": stats.as_dict(),
+                # Headers are long gone, so the Server-Timing
+                # breakdown travels in the final frame
+                "timing": trace.timings(),
+            }
+            if profile is not None:
+                done["profile_id"] = profile.profile_id
+            yield stats.record(sse_frame(done))
 
     except Exception as e:
         # Send error message
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        failed = True
+        yield sse_frame({"error": str(e)})
+    finally:
+        stream_metrics.closed(stats, error=failed)
 
 
 @app.post("/chat/stream")
-async def chat_stream_endpoint(request: ChatRequest):
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
     """
     Streaming chat endpoint using Server-Sent Events.
 
@@ -178,7 +388,7 @@ async def chat_stream_endpoint(request: ChatRequest):
         StreamingResponse with real-time agent output
     """
     return StreamingResponse(
-        response_generator(request),
+        response_generator(request, get_profiler().reason(http_request.headers)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -188,6 +398,101 @@ async def chat_stream_endpoint(request: ChatRequest):
     )
 
 
+@app.get("/upstream/stats")
+async def upstream_stats():
+    """
+    Connection pool settings, per-host request counters and request
+    coalescing counters for upstream APIs.
+    """
+    pools = app_upstream()
+    coalescing = singleflight.snapshot()
+    if pools is None:
+        return {"pools_ready": False, "coalescing": coalescing}
+    return {"pools_ready": True, **pools.stats(), "coalescing": coalescing}
+
+
+@app.get("/stream/stats")
+async def stream_stats():
+    """
+    Aggregate SSE stream counters: active streams, time-to-first-byte and
+    chunk/byte volume.
+    """
+    return stream_metrics.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus text exposition: latency histograms per endpoint, tool and
+    upstream host, agent runs in flight, LLM token usage, SSE streams,
+    cache hit ratios and upstream error/timeout counts.
+    """
+    pools = app_upstream()
+    body = backend_metrics.render(
+        streams=stream_metrics.snapshot(),
+        upstream=pools.stats() if pools is not None else None,
+        caches={
+            "location_ids": get_location_cache().snapshot(),
+            "flight_fares": get_fare_cache().snapshot(),
+            "responses": get_response_cache().snapshot(),
+        },
+        tool_results=tool_budget_metrics.snapshot(),
+    )
+    return PlainTextResponse(body, media_type=CONTENT_TYPE)
+
+
+def admin_profiler(token: Optional[str]) -> Profiler:
+    """The profiler, if the request carries the admin profile token."""
+    profiler = get_profiler()
+    if not profiler.settings.token:
+        raise HTTPException(
+            status_code=404, detail="Profiling admin is disabled; set PROFILE_TOKEN"
+        )
+    if not profiler.token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid X-Profile-Token")
+    return profiler
+
+
+@app.get("/admin/profiles")
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """
+    Recently profiled chat turns, newest first, with their hottest
+    functions. Requires the X-Profile-Token header.
+    """
+    profiler = admin_profiler(x_profile_token)
+    return {
+        "sample_percent": profiler.settings.sample_percent,
+        "interval_ms": profiler.settings.interval * 1000,
+        "profiles": profiler.list(),
+    }
+
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """
+    Folded stacks of one profiled turn, for flamegraph.pl, inferno or
+    speedscope. Requires the X-Profile-Token header.
+    """
+    profile = admin_profiler(x_profile_token).get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown profile id")
+    return PlainTextResponse(profile.folded())
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters for the caches in front of upstream APIs and the
+    agent response cache.
+    """
+    return {
+        "location_ids": get_location_cache().snapshot(),
+        "flight_fares": get_fare_cache().snapshot(),
+        "hotel_schemas": get_schema_registry().snapshot(),
+        "responses": get_response_cache().snapshot(),
+    }
+
+
 @app.get("/tools")
 async def list_tools():
     """
@@ -202,6 +507,20 @@ async def list_tools():
     }
 
 
+@app.get("/tools/stats")
+async def tool_stats():
+    """
+    Tool result token budgets and per-tool size/truncation counters.
+    """
+    budget = get_tool_budget()
+    return {
+        "per_tool_tokens": budget.per_tool_tokens,
+        "per_turn_tokens": budget.per_turn_tokens,
+        "tool_tokens": budget.tool_tokens,
+        "tools": tool_budget_metrics.snapshot(),
+    }
+
+
 @app.get("/agent/info")
 async def agent_info():
     """
@@ -217,11 +536,14 @@ async def agent_info():
             "ticketmaster_api_configured": bool(base_deps.ticketmaster_api_key),
         },
         "capabilities": [
+            "airport_lookup",
             "flight_search",
+            "flexible_date_search",
             "hotel_search",
             "restaurant_search",
             "event_search",
             "attraction_search",
+            "trip_bundle_search",
         ],
         "workflow": {
             "type": "sequential",
@@ -0,0 +1,226 @@
+"""
+Session Store - Server-side conversation state keyed by session_id.
+
+Clients send only the new message each turn; the server keeps the message
+history and itinerary progress. Sessions live in two tiers:
+
+- an in-process LRU of recently active sessions, and
+- a local SQLite database in WAL mode holding append-only turn records,
+  so sessions survive restarts and are visible to every worker.
+
+A session found in memory is checked against the database on every load
+(one indexed lookup of the newest turn) and catches up on turns other workers have
+written since, so no worker answers from stale history. If the record of its
+last cached turn changed, the session was replaced elsewhere and is rebuilt.
+
+Every method does blocking SQLite I/O; async callers run them through
+`asyncio.to_thread` so a busy database never stalls the event loop.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from tools.cache import LRUCache
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "sessions.sqlite3"
+)
+
+
+@dataclass
+class Session:
+    """Conversation state for one session."""
+
+    session_id: str
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    itinerary_progress: Dict[str, Any] = field(default_factory=dict)
+    turns: int = 0
+    # created_at of the newest turn record this copy has seen
+    updated_at: float = 0.0
+
+    # Rolling summary of older turns, maintained by context_builder
+    summary_lines: List[str] = field(default_factory=list)
+    summary_tokens: int = 0
+    summarized_upto: int = 0
+
+
+class SessionStore:
+    """Two-tier (memory LRU + SQLite WAL) store of chat sessions."""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_PATH,
+        maxsize: int = 1024,
+        ttl: Optional[float] = 3600.0,
+    ):
+        self.path = path
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = self._open(path)
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        """Create the store from environment variables."""
+        path = os.getenv("SESSION_STORE_PATH", DEFAULT_PATH)
+        return cls(
+            path=path if path not in ("", ":none:") else None,
+            maxsize=int(os.getenv("SESSION_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("SESSION_CACHE_TTL", "3600")),
+        )
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " session_id TEXT NOT NULL,"
+            " turn INTEGER NOT NULL,"
+            " messages TEXT NOT NULL,"
+            " itinerary_progress TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (session_id, turn))"
+        )
+        return db
+
+    def load(self, session_id: str) -> Session:
+        """
+        Return the session, reading it from disk on a memory miss and
+        catching up on other workers' turns on a hit.
+        """
+        session = self.memory.get(session_id)
+        if session is None:
+            session = Session(session_id=session_id)
+        if self._db is not None:
+            with self._lock:
+                self._sync(session)
+        self.memory.set(session_id, session)
+        return session
+
+    def _sync(self, session: Session) -> None:
+        # Caller holds self._lock. `session` is updated in place, since the
+        # agent deps of a running turn hold references to its message list
+        latest, updated_at = self._db.execute(
+            "SELECT COALESCE(MAX(turn), 0), COALESCE(MAX(created_at), 0)"
+            " FROM turns WHERE session_id = ?",
+            (session.session_id,),
+        ).fetchone()
+        if latest == session.turns and updated_at == session.updated_at:
+            return
+        if session.turns and not self._has_turn(session):
+            # Replaced by another worker; rebuild from its records
+            session.messages.clear()
+            session.itinerary_progress = {}
+            session.turns = 0
+            session.updated_at = 0.0
+            session.summary_lines = []
+            session.summary_tokens = 0
+            session.summarized_upto = 0
+        rows = self._db.execute(
+            "SELECT turn, messages, itinerary_progress, created_at FROM turns"
+            " WHERE session_id = ? AND turn > ? ORDER BY turn",
+            (session.session_id, session.turns),
+        ).fetchall()
+        for turn, messages, progress, created_at in rows:
+            session.messages.extend(json.loads(messages))
+            session.itinerary_progress = json.loads(progress)
+            session.turns = turn
+            session.updated_at = created_at
+
+    def _has_turn(self, session: Session) -> bool:
+        # A replaced session's turn records are rewritten with new
+        # created_at values, even when the numbering has moved past ours
+        row = self._db.execute(
+            "SELECT created_at FROM turns WHERE session_id = ? AND turn = ?",
+            (session.session_id, session.turns),
+        ).fetchone()
+        return row is not None and row[0] == session.updated_at
+
+    def append_turn(
+        self,
+        session: Session,
+        messages: List[Dict[str, Any]],
+        itinerary_progress: Dict[str, Any],
+    ) -> None:
+        """
+        Record one turn's new messages and the resulting progress. Turns
+        another worker wrote since `session` was loaded are merged in first,
+        so the session ends up identical to what the database holds.
+        """
+        self._write(session, messages, itinerary_progress, replace=False)
+
+    def _write(
+        self,
+        session: Session,
+        messages: List[Dict[str, Any]],
+        itinerary_progress: Dict[str, Any],
+        replace: bool,
+    ) -> None:
+        created_at = time.time()
+        if self._db is not None:
+            with self._lock:
+                # The write lock is taken before reading MAX(turn) so
+                # workers appending at the same moment queue up here
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    if replace:
+                        self._db.execute(
+                            "DELETE FROM turns WHERE session_id = ?",
+                            (session.session_id,),
+                        )
+                    else:
+                        self._sync(session)
+                    self._db.execute(
+                        "INSERT INTO turns (session_id, turn, messages,"
+                        " itinerary_progress, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (
+                            session.session_id,
+                            session.turns + 1,
+                            json.dumps(messages),
+                            json.dumps(itinerary_progress),
+                            created_at,
+                        ),
+                    )
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self._db.execute("COMMIT")
+        session.messages.extend(messages)
+        session.itinerary_progress = itinerary_progress
+        session.turns += 1
+        session.updated_at = created_at
+        self.memory.set(session.session_id, session)
+
+    def replace(
+        self,
+        session_id: str,
+        messages: List[Dict[str, Any]],
+        itinerary_progress: Dict[str, Any],
+    ) -> Session:
+        """Overwrite a session with client-supplied state (legacy clients)."""
+        session = Session(session_id=session_id)
+        # Deleting and writing the new first turn in one transaction keeps
+        # another worker's append from landing in between
+        self._write(session, list(messages), dict(itinerary_progress), replace=True)
+        return session
+
+
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store, opening it on first use."""
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore.from_env()
+    return _session_store
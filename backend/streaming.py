@@ -0,0 +1,181 @@
+"""
+Streaming - Server-Sent Events framing, flush policy and stream metrics.
+
+`/chat/stream` frames are encoded straight to bytes (with orjson, a
+declared dependency; a compact stdlib encoder is kept as a fallback for
+environments without it) and flushed according to
+a configurable policy: pydantic-ai debounces model output by time, and
+small pieces can additionally be held back until a byte threshold is met.
+
+Clients that ask for `stream_mode="delta"` receive only the new text in
+each frame instead of the cumulative answer, so bytes on the wire grow
+linearly with the answer rather than quadratically.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - fallback when not installed
+    orjson = None
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+
+
+def encode_json(payload: Any) -> bytes:
+    """Encode a payload as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _json_encoder.encode(payload).encode("utf-8")
+
+
+def sse_frame(payload: Any) -> bytes:
+    """Encode a payload as one SSE `data:` frame."""
+    return SSE_PREFIX + encode_json(payload) + SSE_SUFFIX
+
+
+@dataclass
+class FlushPolicy:
+    """When buffered model output is written to the client."""
+
+    # Passed to pydantic-ai as debounce_by; None streams every model event
+    interval: Optional[float] = 0.01
+    # Hold delta text back until this many UTF-8 bytes are buffered
+    min_bytes: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FlushPolicy":
+        """Create the flush policy from environment variables."""
+        interval = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.01"))
+        return cls(
+            interval=interval if interval > 0 else None,
+            min_bytes=int(os.getenv("STREAM_FLUSH_BYTES", "0")),
+        )
+
+
+def utf8_length(text: str) -> int:
+    """Length of `text` in UTF-8 bytes, without encoding ASCII text."""
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class DeltaBuffer:
+    """Accumulates delta text and releases it once the byte threshold is met."""
+
+    def __init__(self, min_bytes: int = 0):
+        self.min_bytes = min_bytes
+        self._parts: List[str] = []
+        self._size = 0
+
+    def push(self, text: str) -> Optional[str]:
+        """Add text; return the buffered text if it should be flushed now."""
+        self._parts.append(text)
+        self._size += utf8_length(text)
+        if self._size >= self.min_bytes:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return and clear whatever is buffered."""
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        return text
+
+
+@dataclass
+class StreamStats:
+    """Timing and volume counters for one SSE stream."""
+
+    started_at: float = field(default_factory=time.perf_counter)
+    first_byte_at: Optional[float] = None
+    chunks: int = 0
+    bytes_sent: int = 0
+    finished_at: Optional[float] = None
+
+    def record(self, frame: bytes) -> bytes:
+        """Count an outgoing frame and return it unchanged."""
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+        self.chunks += 1
+        self.bytes_sent += len(frame)
+        return frame
+
+    @property
+    def ttfb(self) -> Optional[float]:
+        if self.first_byte_at is None:
+            return None
+        return self.first_byte_at - self.started_at
+
+    @property
+    def duration(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def chunks_per_second(self) -> float:
+        duration = self.duration
+        return self.chunks / duration if duration > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ttfb_ms": round(self.ttfb * 1000, 2) if self.ttfb is not None else None,
+            "duration_ms": round(self.duration * 1000, 2),
+            "chunks": self.chunks,
+            "bytes": self.bytes_sent,
+            "chunks_per_sec": round(self.chunks_per_second, 2),
+        }
+
+
+class StreamMetrics:
+    """Process-wide aggregate of SSE stream stats."""
+
+    def __init__(self):
+        self.active = 0
+        self.completed = 0
+        self.errors = 0
+        self.total_chunks = 0
+        self.total_bytes = 0
+        self._ttfb_sum = 0.0
+        self._ttfb_count = 0
+        self.max_ttfb = 0.0
+
+    def opened(self) -> StreamStats:
+        self.active += 1
+        return StreamStats()
+
+    def closed(self, stats: StreamStats, error: bool = False) -> None:
+        stats.finished_at = time.perf_counter()
+        self.active -= 1
+        self.completed += 1
+        self.errors += int(error)
+        self.total_chunks += stats.chunks
+        self.total_bytes += stats.bytes_sent
+        if stats.ttfb is not None:
+            self._ttfb_sum += stats.ttfb
+            self._ttfb_count += 1
+            self.max_ttfb = max(self.max_ttfb, stats.ttfb)
+
+    def snapshot(self) -> Dict[str, Any]:
+        mean_ttfb = self._ttfb_sum / self._ttfb_count if self._ttfb_count else 0.0
+        return {
+            "active_streams": self.active,
+            "completed_streams": self.completed,
+            "errors": self.errors,
+            "total_chunks": self.total_chunks,
+            "total_bytes": self.total_bytes,
+            "mean_ttfb_ms": round(mean_ttfb * 1000, 2),
+            "max_ttfb_ms": round(self.max_ttfb * 1000, 2),
+            "encoder": "orjson" if orjson is not None else "json",
+        }
+
+
+stream_metrics = StreamMetrics()
@@ -41,3 +41,94 @@ def mock_env_vars(monkeypatch):
         monkeypatch.setenv(key, value)
 
     return env_vars
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    """
+    Fixture routing the default upstream pools through an in-process
+    handler. Tests assign `mock_upstream.handler` a callable taking an
+    httpx.Request and returning an httpx.Response.
+    """
+    import httpx
+
+    from tools import http_client
+
+    class Upstream:
+        handler = None
+        requests = []
+
+    upstream = Upstream()
+    upstream.requests = []
+
+    def dispatch(request):
+        upstream.requests.append(request)
+        return upstream.handler(request)
+
+    pools = http_client.UpstreamPools(transport=httpx.MockTransport(dispatch))
+    monkeypatch.setattr(http_client, "_default_pools", pools)
+    upstream.pools = pools
+    return upstream
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(monkeypatch):
+    """Fixture giving every test fresh, memory-only tool caches."""
+    import response_cache
+    from tools import flight_scraper, hotel_schema, location_cache, singleflight
+
+    monkeypatch.setattr(
+        location_cache, "_location_cache", location_cache.LocationCache(path=None)
+    )
+    monkeypatch.setattr(flight_scraper, "_fare_cache", None)
+    monkeypatch.setattr(singleflight, "_groups", {})
+    monkeypatch.setattr(hotel_schema, "_registry", None)
+    monkeypatch.setattr(response_cache, "_response_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_tool_budget(monkeypatch):
+    """Fixture giving every test default tool budgets and fresh counters."""
+    import tool_budget
+
+    monkeypatch.setattr(tool_budget, "_budget", None)
+    monkeypatch.setattr(
+        tool_budget, "tool_budget_metrics", tool_budget.ToolBudgetMetrics()
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolated_tracer(monkeypatch):
+    """Fixture giving every test a tracer that exports nothing."""
+    import tracing
+
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer())
+
+
+@pytest.fixture(autouse=True)
+def isolated_profiler(monkeypatch):
+    """Fixture giving every test a profiler that profiles nothing."""
+    import profiling
+
+    monkeypatch.setattr(profiling, "_profiler", profiling.Profiler())
+
+
+@pytest.fixture(autouse=True)
+def isolated_sessions(monkeypatch):
+    """Fixture giving every test a fresh, memory-only session store."""
+    import session_store
+
+    monkeypatch.setattr(
+        session_store, "_session_store", session_store.SessionStore(path=None)
+    )
+
+
+@pytest.fixture
+def offline_agent():
+    """Fixture replacing the LLM with pydantic-ai's offline test model."""
+    from pydantic_ai.models.test import TestModel
+
+    from travel_agent import travel_agent
+
+    with travel_agent.override(model=TestModel(call_tools=[])):
+        yield travel_agent
@@ -0,0 +1,152 @@
+"""Test the offline airport index and its use by the flight tools."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tools.airports import (
+    Airport,
+    AirportIndex,
+    airport_lookup_tool,
+    get_airport_index,
+    haversine_km,
+    resolve_airport_code,
+)
+from tools.flight_scraper import flight_search_tool
+
+
+class TestAirportIndex:
+    """Test suite for exact, prefix and fuzzy airport lookup."""
+
+    def test_bundled_dataset_loads(self):
+        """Test the bundled CSV loads with unique codes and coordinates."""
+        index = get_airport_index()
+
+        assert len(index) > 100
+        sfo = index.get("sfo")
+        assert sfo.city == "San Francisco"
+        assert sfo.lat == pytest.approx(37.62, abs=0.01)
+
+    @pytest.mark.parametrize(
+        "query, code",
+        [
+            ("SFO", "SFO"),
+            ("San Francisco", "SFO"),
+            ("sf", "SFO"),
+            ("kennedy", "JFK"),
+            ("Heathrow", "LHR"),
+            ("Paris, France", "PAR"),
+            ("Washington DC", "WAS"),
+        ],
+    )
+    def test_resolves_codes_cities_and_names(self, query, code):
+        """Test codes, city names, aliases and airport names resolve."""
+        assert resolve_airport_code(query) == code
+
+    def test_city_with_several_airports_prefers_metro_code(self):
+        """Test a multi-airport city lists its metro code first."""
+        codes = [a.code for a in get_airport_index().search("New York")]
+
+        assert codes[0] == "NYC"
+        assert {"JFK", "LGA"} <= set(codes)
+
+    def test_prefix_and_fuzzy_matches(self):
+        """Test partial input uses the trie and typos fall back to fuzzy."""
+        index = get_airport_index()
+
+        assert index.resolve("san fr") == "SFO"
+        assert index.resolve("Tokio") == "TYO"
+        assert index.resolve("sanfrancisco") == "SFO"
+
+    def test_unknown_places(self):
+        """Test unknown names resolve to None and unknown codes pass through."""
+        index = AirportIndex(
+            [Airport("SFO", "airport", "San Francisco", "San Francisco", "US", 0, 0)]
+        )
+
+        assert index.resolve("Atlantis") is None
+        assert index.resolve("XYZ") == "XYZ"
+
+
+class TestNearbyAirports:
+    """Test suite for the spatial nearby-airport lookup."""
+
+    def test_haversine_distance(self):
+        """Test great-circle distance between SFO and JFK (~4150 km)."""
+        assert haversine_km(37.6213, -122.3790, 40.6413, -73.7781) == pytest.approx(
+            4150, rel=0.01
+        )
+
+    def test_finds_neighbors_nearest_first(self):
+        """Test SFO's neighbors within 100 km are OAK then SJC."""
+        nearby = get_airport_index().nearby("SFO", radius_km=100)
+
+        assert [a.code for a, _ in nearby] == ["OAK", "SJC"]
+        assert nearby[0][1] < nearby[1][1] <= 100
+
+    def test_radius_and_limit(self):
+        """Test the radius and result limit bound the neighbors."""
+        index = get_airport_index()
+
+        assert index.nearby("SFO", radius_km=20) == [
+            (index.get("OAK"), pytest.approx(17, abs=1))
+        ]
+        assert len(index.nearby("JFK", radius_km=100, limit=2)) == 2
+        assert index.nearby("XXX") == []
+
+    def test_metro_code_excludes_its_own_airports(self):
+        """Test a metro search skips airports the metro code already covers."""
+        codes = {a.code for a, _ in get_airport_index().nearby("NYC", 100)}
+
+        assert "HPN" in codes
+        assert not codes & {"JFK", "EWR", "LGA"}
+
+    def test_grid_wraps_around_the_antimeridian(self):
+        """Test airports either side of 180° longitude find each other."""
+        index = AirportIndex(
+            [
+                Airport("AAA", "airport", "East", "East", "XX", -17.0, 179.9),
+                Airport("BBB", "airport", "West", "West", "XX", -17.0, -179.9),
+            ]
+        )
+
+        assert [a.code for a, _ in index.nearby("AAA", 50)] == ["BBB"]
+
+
+class TestAirportTools:
+    """Test suite for airport resolution inside the agent tools."""
+
+    @pytest.mark.asyncio
+    async def test_lookup_tool_lists_matches(self):
+        """Test the lookup tool returns a table of codes with names."""
+        result = await airport_lookup_tool(MagicMock(), "London", limit=2)
+
+        assert result.splitlines() == [
+            "city=London country=GB",
+            "code|kind|name",
+            "LON|metro|London (all airports)",
+            "LHR|airport|Heathrow",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_flight_search_tool_resolves_city_names(self, test_deps):
+        """Test city names are turned into IATA codes before searching."""
+        ctx = MagicMock(deps=test_deps)
+
+        with patch("tools.flight_scraper.search_flights") as mock_search:
+            mock_search.return_value = {"data": []}
+            await flight_search_tool(ctx, "San Francisco", "new york", "2025-12-10")
+
+        args = mock_search.call_args.args
+        assert args[:2] == ("SFO", "NYC")
+
+    @pytest.mark.asyncio
+    async def test_flight_search_tool_reports_unknown_city(self, test_deps):
+        """Test an unresolvable place is reported without an upstream call."""
+        ctx = MagicMock(deps=test_deps)
+
+        with patch("tools.flight_scraper.search_flights") as mock_search:
+            result = await flight_search_tool(ctx, "Gotham", "JFK", "2025-12-10")
+
+        mock_search.assert_not_called()
+        assert "Gotham" in result
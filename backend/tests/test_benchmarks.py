@@ -0,0 +1,112 @@
+"""Test the offline load-test harness."""
+
+import pytest
+
+from benchmarks import load_test
+from benchmarks.load_test import compare, offline_env, percentile, summarize
+from benchmarks.stubs import write_stub_cassettes
+
+
+def run(p95, rps):
+    return {
+        "results": [
+            {
+                "endpoint": "chat",
+                "concurrency": 4,
+                "rps": rps,
+                "latency_ms": {"p95": p95},
+            }
+        ]
+    }
+
+
+class TestLoadTestReport:
+    """Test suite for percentile summaries and regression checks."""
+
+    def test_percentiles(self):
+        """Test interpolated percentiles over latencies in seconds."""
+        values = [i / 1000 for i in range(1, 101)]
+
+        assert percentile([3, 1, 2], 50) == 2
+        assert percentile([], 95) == 0.0
+        stats = summarize(values)
+        assert stats["p50"] == pytest.approx(50.5)
+        assert stats["p99"] == pytest.approx(99.01)
+        assert stats["max"] == 100
+
+    def test_compare_flags_latency_and_throughput_regressions(self):
+        """Test p95 or req/s changes beyond the threshold are reported."""
+        assert compare(run(105, 48), run(100, 50)) == []
+        assert compare(run(130, 40), run(100, 50)) == [
+            "chat @ 4: p95 100 -> 130 ms",
+            "chat @ 4: 50 -> 40 req/s",
+        ]
+
+
+class TestOfflineLoadTest:
+    """Test suite for running the app against stub upstreams and model."""
+
+    @pytest.mark.asyncio
+    async def test_small_run_reports_every_level(self, tmp_path, monkeypatch):
+        """Test a tiny offline run completes without errors and is saved."""
+        write_stub_cassettes(str(tmp_path / "cassettes"), latency_ms=5)
+        for key, value in offline_env(str(tmp_path / "cassettes"), 5).items():
+            monkeypatch.setenv(key, value)
+
+        result = await load_test.run_benchmark(
+            levels=(1, 3), requests_per_level=4, token_latency=0.001
+        )
+
+        levels = [(r["endpoint"], r["concurrency"]) for r in result["results"]]
+        assert levels == [
+            ("chat", 1),
+            ("chat", 3),
+            ("chat_stream", 1),
+            ("chat_stream", 3),
+        ]
+        assert all(r["errors"] == 0 and r["rps"] > 0 for r in result["results"])
+        assert result["results"][-1]["ttfb_ms"]["p50"] > 0
+
+        path = load_test.save_results(result, str(tmp_path / "results"))
+        assert load_test.previous_run(result["config"], str(tmp_path / "results")) == (
+            result
+        )
+        assert path.endswith(f"-{result['commit']}.json")
+
+
+class TestMicrobench:
+    """Test suite for the parsing and summarization microbenchmarks."""
+
+    def test_every_shape_parses_to_full_records(self):
+        """Test each synthetic payload yields one output per record."""
+        from benchmarks.microbench import CASES
+
+        for case in CASES:
+            out = case.run(case.make(12))
+            expected = 12
+            if case.function == "validate_dates":
+                expected = 12 if case.shape == "valid" else 0
+                assert out == expected, case
+            else:
+                assert len(out) == expected, case
+
+    def test_run_records_time_and_memory_per_size(self):
+        """Test a run reports per-call time and peak memory for every size."""
+        from benchmarks.microbench import compare, run_microbench
+
+        run = run_microbench(sizes=(10, 100), functions=["clean_events"], repeats=1)
+
+        assert [(r["shape"], r["records"]) for r in run["results"]] == [
+            ("full", 10),
+            ("full", 100),
+            ("sparse", 10),
+            ("sparse", 100),
+        ]
+        assert all(r["us_per_call"] > 0 and r["peak_kib"] > 0 for r in run["results"])
+        slower = {
+            "results": [
+                dict(r, us_per_call=r["us_per_call"] * 2) for r in run["results"]
+            ]
+        }
+        assert compare(run, run) == []
+        assert len(compare(slower, run)) == 4
@@ -0,0 +1,229 @@
+"""Test caching layers in front of upstream APIs."""
+
+import threading
+
+import httpx
+import pytest
+
+from tools.cache import LRUCache, StaleWhileRevalidateCache
+from tools.flight_scraper import get_fare_cache, search_flights
+from tools.hotel_scraper import get_location_id
+from tools.location_cache import LocationCache, get_location_cache, normalize_city
+
+
+class TestLRUCache:
+    """Test suite for the bounded in-memory cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted at capacity."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats.evictions == 1
+
+    def test_expired_entries_count_as_misses(self):
+        """Test TTL expiry removes entries and records a miss."""
+        now = [100.0]
+        cache = LRUCache(ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        now[0] = 111.0
+
+        assert cache.get("a") is None
+        assert cache.stats.expirations == 1
+        assert cache.stats.misses == 1
+
+
+class TestLocationCache:
+    """Test suite for the city -> locationId cache."""
+
+    def test_normalize_city(self):
+        """Test case, whitespace, punctuation and aliases share one key."""
+        assert normalize_city("  New   York ") == "new york"
+        assert normalize_city("NYC") == "new york"
+        assert normalize_city("Washington, D.C.") == "washington"
+        assert normalize_city("San Francisco") == normalize_city("SF")
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test a new cache instance reads ids written by a previous one."""
+        path = str(tmp_path / "locations.sqlite3")
+        LocationCache(path=path).set("host", "Paris", "loc-1")
+
+        reopened = LocationCache(path=path)
+        assert reopened.get("host", "paris") == "loc-1"
+        assert reopened.disk_hits == 1
+        assert reopened.get("host", "PARIS") == "loc-1"
+        assert reopened.disk_hits == 1  # second lookup served from memory
+
+    def test_disk_entries_expire(self, tmp_path):
+        """Test expired rows are ignored."""
+        cache = LocationCache(path=str(tmp_path / "l.sqlite3"), ttl=-1)
+        cache.set("host", "Paris", "loc-1")
+
+        cache.memory.clear()
+        assert cache.get("host", "Paris") is None
+        assert cache.stats.expirations == 1
+
+    @pytest.mark.asyncio
+    async def test_async_disk_tier_runs_off_the_event_loop(self, tmp_path, monkeypatch):
+        """Test aget/aset do their SQLite I/O in a worker thread."""
+        path = str(tmp_path / "locations.sqlite3")
+        await LocationCache(path=path).aset("host", "Paris", "loc-1")
+        cache = LocationCache(path=path)
+        threads = []
+        read_disk = cache._read_disk
+
+        def recording_read(key):
+            threads.append(threading.get_ident())
+            return read_disk(key)
+
+        monkeypatch.setattr(cache, "_read_disk", recording_read)
+
+        assert await cache.aget("host", "PARIS") == "loc-1"
+        assert await cache.aget("host", "paris") == "loc-1"
+
+        assert threads and threading.get_ident() not in threads
+        assert len(threads) == 1  # the second lookup is a memory hit
+        assert cache.disk_hits == 1
+
+    def test_ids_are_scoped_per_host(self):
+        """Test different RapidAPI hosts do not share ids."""
+        cache = LocationCache(path=None)
+        cache.set("a.example", "Paris", "1")
+
+        assert cache.get("b.example", "Paris") is None
+
+    @pytest.mark.asyncio
+    async def test_get_location_id_skips_repeat_lookups(self, mock_upstream):
+        """Test only the first search for a city calls auto-complete."""
+        mock_upstream.handler = lambda request: httpx.Response(
+            200, json={"data": [{"id": "eyJjaXR5IjoiTllDIn0="}]}
+        )
+
+        first = await get_location_id("New York", "key", "test.api.com")
+        second = await get_location_id("nyc", "key", "test.api.com")
+
+        assert first == second == "eyJjaXR5IjoiTllDIn0="
+        assert len(mock_upstream.requests) == 1
+        snapshot = get_location_cache().snapshot()
+        assert snapshot["hits"] == 1
+        assert snapshot["misses"] == 1
+
+
+class TestStaleWhileRevalidateCache:
+    """Test suite for the fare cache refresh policy."""
+
+    @pytest.mark.asyncio
+    async def test_fresh_stale_and_expired_entries(self):
+        """Test fresh hits, stale hits with refresh, and inline refetch."""
+        now = [0.0]
+        calls = []
+
+        async def fetch():
+            calls.append(now[0])
+            return len(calls)
+
+        cache = StaleWhileRevalidateCache(
+            fresh_for=10, stale_for=20, clock=lambda: now[0]
+        )
+
+        assert await cache.get_or_fetch("k", fetch) == 1
+        now[0] = 5
+        assert await cache.get_or_fetch("k", fetch) == 1
+        assert len(calls) == 1
+
+        now[0] = 15
+        assert await cache.get_or_fetch("k", fetch) == 1  # stale, served at once
+        await cache.drain()
+        assert cache.stats.stale_hits == 1
+        assert cache.stats.refreshes == 1
+        assert await cache.get_or_fetch("k", fetch) == 2
+
+        now[0] = 100
+        assert await cache.get_or_fetch("k", fetch) == 3  # expired, fetched inline
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_stale_value(self):
+        """Test a failing background refresh does not evict the entry."""
+        now = [0.0]
+        cache = StaleWhileRevalidateCache(
+            fresh_for=1, stale_for=10, clock=lambda: now[0]
+        )
+
+        async def ok():
+            return "fare"
+
+        async def broken():
+            raise RuntimeError("upstream down")
+
+        await cache.get_or_fetch("k", ok)
+        now[0] = 2
+        assert await cache.get_or_fetch("k", broken) == "fare"
+        await cache.drain()
+
+        assert cache.stats.refresh_errors == 1
+        assert await cache.get_or_fetch("k", broken) == "fare"
+
+    @pytest.mark.asyncio
+    async def test_rejected_values_are_never_cached(self):
+        """Test error payloads are returned but neither stored nor refreshed in."""
+        now = [0.0]
+        cache = StaleWhileRevalidateCache(
+            fresh_for=1,
+            stale_for=10,
+            clock=lambda: now[0],
+            cacheable=lambda value: value != "error",
+        )
+
+        async def failing():
+            return "error"
+
+        async def ok():
+            return "fare"
+
+        assert await cache.get_or_fetch("k", failing) == "error"
+        assert await cache.get_or_fetch("k", ok) == "fare"
+        assert cache.stats.misses == 2
+
+        now[0] = 2
+        assert await cache.get_or_fetch("k", failing) == "fare"  # stale
+        await cache.drain()
+        assert await cache.get_or_fetch("k", ok) == "fare"
+        await cache.drain()
+
+        assert cache.stats.rejected == 2
+        assert cache.stats.refresh_errors == 1
+        assert cache.stats.refreshes == 1
+
+    @pytest.mark.asyncio
+    async def test_unsuccessful_fares_are_not_cached(self, mock_upstream):
+        """Test a `success: false` Travelpayouts body is refetched next time."""
+        mock_upstream.handler = lambda request: httpx.Response(
+            200, json={"success": False, "data": [], "error": "rate limited"}
+        )
+
+        for _ in range(2):
+            await search_flights("SFO", "JFK", "2025-12-15", travelpayouts_token="t")
+
+        assert len(mock_upstream.requests) == 2
+        assert get_fare_cache().stats.rejected == 2
+
+    @pytest.mark.asyncio
+    async def test_search_flights_reuses_cached_fares(self, mock_upstream):
+        """Test identical fare searches hit the upstream once."""
+        mock_upstream.handler = lambda request: httpx.Response(
+            200, json={"data": [{"price": 99}]}
+        )
+
+        for origin in ("SFO", "sfo"):
+            raw = await search_flights(
+                origin, "JFK", "2025-12-15", travelpayouts_token="t"
+            )
+            assert raw["data"][0]["price"] == 99
+
+        assert len(mock_upstream.requests) == 1
+        assert get_fare_cache().stats.hits == 1
@@ -0,0 +1,124 @@
+"""Test record/replay of upstream API traffic."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from tools import http_client
+from tools.cassette import CassetteTransport
+from tools.web_scraper import _query_ticketmaster, _query_yelp
+
+YELP_BODY = {"businesses": [{"name": "Deli", "rating": 4.5, "url": "https://y/deli"}]}
+
+
+def live_upstream(request):
+    if request.url.host == "api.yelp.com":
+        return httpx.Response(200, json=YELP_BODY)
+    return httpx.Response(200, json={"_embedded": {"events": [{"name": "Gig"}]}})
+
+
+async def record(directory, **params):
+    transport = CassetteTransport(
+        str(directory), mode="record", transport=httpx.MockTransport(live_upstream)
+    )
+    pools = http_client.UpstreamPools(transport=transport)
+    yelp = await _query_yelp("Paris", 5, "secret-yelp-key", pools=pools)
+    events = await _query_ticketmaster(
+        "Paris", "2025-12-10", "2025-12-12", 5, "secret-tm-key", pools=pools
+    )
+    await pools.aclose()
+    return transport, yelp, events
+
+
+class TestCassettes:
+    """Test suite for recording cassettes and replaying them offline."""
+
+    @pytest.mark.asyncio
+    async def test_replay_returns_recorded_responses(self, tmp_path):
+        """Test tools get identical results from a replayed cassette."""
+        recorder, yelp, events = await record(tmp_path)
+        assert recorder.stats.recorded == 2
+
+        replay = CassetteTransport(str(tmp_path), mode="replay", latency=0)
+        pools = http_client.UpstreamPools(transport=replay)
+
+        assert await _query_yelp("Paris", 5, "other-key", pools=pools) == yelp
+        assert (
+            await _query_ticketmaster(
+                "Paris", "2025-12-10", "2025-12-12", 5, "other-key", pools=pools
+            )
+            == events
+        )
+        assert replay.snapshot()["replayed"] == 2
+        assert pools.stats()["cassette"]["misses"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cassettes_hold_no_credentials(self, tmp_path):
+        """Test API keys in params or headers never reach the cassette files."""
+        await record(tmp_path)
+
+        files = sorted(p.name for p in tmp_path.iterdir())
+        text = "".join(p.read_text() for p in tmp_path.iterdir())
+        assert files == ["api.yelp.com.json", "app.ticketmaster.com.json"]
+        assert "secret" not in text
+        assert (
+            json.loads((tmp_path / "api.yelp.com.json").read_text())["interactions"][0][
+                "request"
+            ]["path"]
+            == "/v3/businesses/search"
+        )
+
+    @pytest.mark.asyncio
+    async def test_misses_and_path_fallback(self, tmp_path, capsys):
+        """Test unknown queries miss, or fall back to the same path if asked."""
+        await record(tmp_path)
+        exact = http_client.UpstreamPools(
+            transport=CassetteTransport(str(tmp_path), latency=0)
+        )
+        by_path = http_client.UpstreamPools(
+            transport=CassetteTransport(str(tmp_path), latency=0, match="path")
+        )
+
+        assert await _query_yelp("Rome", 5, "k", pools=exact) == []
+        assert "No cassette entry" in capsys.readouterr().out
+        assert await _query_yelp("Rome", 5, "k", pools=by_path) != []
+
+        assert exact.stats()["cassette"]["misses"] == 1
+        assert by_path.stats()["cassette"]["path_fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_replay_simulates_latency(self, tmp_path):
+        """Test replayed responses are delayed by the configured latency."""
+        await record(tmp_path)
+        pools = http_client.UpstreamPools(
+            transport=CassetteTransport(str(tmp_path), latency=0.1, match="path")
+        )
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(
+            *(_query_yelp(f"City {i}", 5, "k", pools=pools) for i in range(5))
+        )
+        elapsed = loop.time() - started
+
+        # Concurrent replays overlap like real requests would (5 x 0.1s serially)
+        assert 0.1 <= elapsed < 0.35
+
+    def test_pools_from_env(self, tmp_path, monkeypatch):
+        """Test UPSTREAM_MODE switches the pools to a cassette transport."""
+        monkeypatch.setenv("UPSTREAM_MODE", "replay")
+        monkeypatch.setenv("UPSTREAM_CASSETTE_DIR", str(tmp_path))
+        monkeypatch.setenv("UPSTREAM_REPLAY_LATENCY_MS", "25")
+
+        pools = http_client.UpstreamPools.from_env()
+
+        assert pools.settings.warmup is False
+        cassette = pools.stats()["cassette"]
+        assert cassette["mode"] == "replay"
+        assert cassette["directory"] == str(tmp_path)
+
+        monkeypatch.setenv("UPSTREAM_MODE", "live")
+        with pytest.raises(ValueError):
+            http_client.UpstreamPools.from_env()
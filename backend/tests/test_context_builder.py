@@ -0,0 +1,78 @@
+"""Test token-budgeted context assembly."""
+
+from context_builder import (
+    ContextBudget,
+    build_context_message,
+    estimate_tokens,
+    update_summary,
+)
+from session_store import Session
+
+
+def make_session(turns: int, words: int = 40) -> Session:
+    session = Session(session_id="s1")
+    for i in range(turns):
+        session.messages.append(
+            {"role": "user", "content": f"Question {i}. " + "detail " * words}
+        )
+        session.messages.append(
+            {"role": "assistant", "content": f"Answer {i}. " + "option " * words}
+        )
+    return session
+
+
+class TestContextBuilder:
+    """Test suite for the context builder."""
+
+    def test_short_history_is_kept_verbatim(self):
+        """Test a short conversation is passed through unchanged."""
+        session = make_session(1, words=3)
+        session.itinerary_progress = {"stage": "flights"}
+
+        context = build_context_message("Find flights", session, ContextBudget())
+
+        assert context.startswith("Current message: Find flights\n\n")
+        assert "Previous conversation:\nuser: Question 0." in context
+        assert 'Current itinerary progress: {"stage":"flights"}' in context
+        assert "summary" not in context
+
+    def test_prompt_size_stays_bounded(self):
+        """Test context size stays within budget as the session grows."""
+        budget = ContextBudget(total_tokens=800, summary_tokens=200)
+        sizes = []
+        session = Session(session_id="s1")
+        for turns in (5, 50, 200):
+            grown = make_session(turns)
+            session.messages = grown.messages
+            sizes.append(
+                estimate_tokens(build_context_message("Next?", session, budget))
+            )
+
+        assert max(sizes) <= budget.total_tokens + 20
+        assert sizes[2] - sizes[1] < 50
+
+    def test_summary_is_updated_incrementally(self):
+        """Test only newly aged-out messages are folded into the summary."""
+        budget = ContextBudget(recent_messages=4, summary_tokens=10_000)
+        session = make_session(4)
+
+        update_summary(session, budget)
+        assert session.summarized_upto == 4
+        lines = list(session.summary_lines)
+        assert lines[0] == "user: Question 0."
+
+        session.messages.append({"role": "user", "content": "New question."})
+        update_summary(session, budget)
+        assert session.summarized_upto == 5
+        assert session.summary_lines[:4] == lines
+        assert session.summary_lines[4] == "user: Question 2."
+
+    def test_summary_drops_oldest_lines_over_budget(self):
+        """Test the summary never exceeds its token budget."""
+        budget = ContextBudget(recent_messages=2, summary_tokens=30)
+        session = make_session(30)
+
+        update_summary(session, budget)
+
+        assert session.summary_tokens <= 30
+        assert session.summary_lines[-1].startswith("assistant: Answer 28.")
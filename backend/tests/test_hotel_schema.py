@@ -0,0 +1,181 @@
+"""Test learned hotel response schemas and their compiled extractors."""
+
+import json
+
+import pytest
+
+from tools import hotel_scraper
+from tools.hotel_schema import (
+    HotelSchema,
+    HotelSchemaRegistry,
+    compile_extractor,
+    detect_schema,
+)
+
+V1_STAYS = [
+    {
+        "name": f"Hotel {i}",
+        "price": {"value": 100 + i, "currency": "USD"},
+        "rating": 8.0,
+        "address": {"street": "1 Main St", "city": "Paris", "country": "FR"},
+        "url": f"https://example.com/{i}",
+    }
+    for i in range(6)
+]
+V2_STAYS = [
+    {
+        "hotelName": f"Hotel {i}",
+        "priceBreakdown": {"grossPrice": {"value": 200 + i}, "currencyCode": "EUR"},
+        "reviewScore": 9.1,
+        "location": "Paris",
+        "bookingUrl": f"https://example.com/v2/{i}",
+    }
+    for i in range(6)
+]
+
+
+class TestSchemaDetection:
+    """Test suite for detecting and compiling a response shape."""
+
+    def test_detects_key_paths(self):
+        """Test each field's path is learned from the sample."""
+        schema = detect_schema(V2_STAYS[:3])
+
+        assert schema.name == ("hotelName",)
+        assert schema.price == ("priceBreakdown", "grossPrice", "value")
+        assert schema.currency == ("priceBreakdown", "currencyCode")
+        assert schema.link == ("bookingUrl",)
+
+    @pytest.mark.parametrize("stays", [V1_STAYS, V2_STAYS])
+    def test_compiled_extractor_matches_generic_summary(self, stays):
+        """Test the compiled extractor agrees with summarize_hotel."""
+        extract = compile_extractor(detect_schema(stays))
+
+        assert [extract(h) for h in stays] == [
+            hotel_scraper.summarize_hotel(h) for h in stays
+        ]
+
+    def test_paths_are_plain_keys(self):
+        """Test key paths are looked up as data, never evaluated as code."""
+        key = "x'), __import__('os').getcwd(), ('"
+        extract = compile_extractor(HotelSchema(name=(key,), price=("p", key)))
+
+        summary = extract({key: "Odd", "p": {key: 10}})
+
+        assert summary["name"] == "Odd"
+        assert summary["price"] == 10
+        assert extract({"p": "not a dict"})["price"] is None
+
+
+class TestSchemaRegistry:
+    """Test suite for caching extractors per host and detecting drift."""
+
+    def test_learns_once_per_host(self):
+        """Test the shape is detected once and reused for later responses."""
+        registry = HotelSchemaRegistry()
+
+        for _ in range(3):
+            list(registry.extract("booking-com18", V1_STAYS))
+
+        stats = registry.snapshot()["booking-com18"]
+        assert stats["detections"] == 1
+        assert stats["records"] == 18
+        assert stats["schema"]["price"] == "price.value"
+
+    def test_shape_drift_is_reported_and_relearned(self, capsys):
+        """Test a changed shape is re-detected and reported as drift."""
+        registry = HotelSchemaRegistry()
+        list(registry.extract("h", V1_STAYS))
+
+        hotels = list(registry.extract("h", V2_STAYS))
+
+        assert hotels[0]["price"] == 200
+        assert registry.snapshot()["h"]["drifts"] == 1
+        assert "drifted" in capsys.readouterr().out
+
+    def test_renamed_non_price_field_is_relearned(self):
+        """Test drift in a field other than price is detected, not zeroed."""
+        registry = HotelSchemaRegistry()
+        list(registry.extract("h", V1_STAYS))
+        renamed = [
+            {**{k: v for k, v in h.items() if k != "rating"}, "reviewScore": 7.5}
+            for h in V1_STAYS
+        ]
+
+        hotels = list(registry.extract("h", renamed))
+
+        assert {h["rating"] for h in hotels} == {7.5}
+        stats = registry.snapshot()["h"]
+        assert stats["drifts"] == 1
+        assert stats["schema"]["rating"] == "reviewScore"
+
+    def test_field_missing_from_every_record_is_reported(self, capsys):
+        """Test a field renamed to an unknown key raises an alert once."""
+        registry = HotelSchemaRegistry()
+        list(registry.extract("h", V1_STAYS))
+        renamed = [
+            {**{k: v for k, v in h.items() if k != "url"}, "deeplink": "x"}
+            for h in V1_STAYS
+        ]
+
+        list(registry.extract("h", renamed))
+        list(registry.extract("h", renamed))
+
+        assert registry.snapshot()["h"]["incomplete_responses"] == 2
+        assert capsys.readouterr().out.count("has no link") == 1
+
+    def test_sparse_field_keeps_its_path(self):
+        """Test a field absent from one response's sample is not unmapped."""
+        registry = HotelSchemaRegistry()
+        with_distance = [{**h, "distance": 1.5} for h in V1_STAYS]
+        list(registry.extract("h", with_distance))
+
+        list(registry.extract("h", V1_STAYS))
+        hotels = list(registry.extract("h", with_distance))
+
+        assert registry.snapshot()["h"]["schema"]["distance"] == "distance"
+        assert hotels[0]["distance"] == 1.5
+
+    def test_sparse_field_does_not_trigger_relearning(self, capsys):
+        """Test a field that is often empty is judged against its own baseline."""
+        registry = HotelSchemaRegistry()
+        # distance is filled for a third of the hotels, unevenly per response
+        responses = [
+            [
+                {**h, "distance": 1.5} if i % 3 == offset else h
+                for i, h in enumerate(V1_STAYS)
+            ]
+            for offset in (0, 1, 2, 0)
+        ]
+        responses.append(V1_STAYS)
+
+        for stays in responses:
+            list(registry.extract("h", stays))
+
+        stats = registry.snapshot()["h"]
+        assert stats["detections"] == 1
+        assert stats["drifts"] == 0
+        assert stats["incomplete_responses"] == 0
+        assert stats["schema"]["distance"] == "distance"
+        assert 0 < stats["fill"]["distance"] < 0.5
+        assert capsys.readouterr().out == ""
+
+    def test_unpriced_response_is_reported(self, capsys):
+        """Test a response without any price field raises an alert."""
+        registry = HotelSchemaRegistry()
+
+        hotels = list(registry.extract("h", [{"name": "A", "cost": 10}]))
+
+        assert hotels[0]["price"] is None
+        assert registry.snapshot()["h"]["unpriced_responses"] == 1
+        assert "No price field" in capsys.readouterr().out
+
+    def test_parse_hotels_uses_host_extractor(self):
+        """Test parse_hotels goes through the learned extractor for the host."""
+        body = json.dumps({"data": {"hotels": V2_STAYS}}).encode()
+
+        hotels = hotel_scraper.parse_hotels(body, limit=2, host="booking-com18")
+
+        assert [h["price"] for h in hotels] == [200, 201]
+        registry = hotel_scraper.get_schema_registry()
+        assert registry.snapshot()["booking-com18"]["detections"] == 1
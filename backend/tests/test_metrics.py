@@ -0,0 +1,131 @@
+"""Test the Prometheus /metrics endpoint."""
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from metrics import BackendMetrics, Histogram
+from tools.http_client import UpstreamPools
+
+
+def sample(body, line_start):
+    """Value of the first exposition line starting with `line_start`."""
+    for line in body.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_start} not in /metrics")
+
+
+class TestHistogram:
+    """Test suite for histogram bookkeeping and exposition."""
+
+    def test_buckets_are_cumulative(self):
+        """Test observations land in the first bucket they fit and accumulate."""
+        histogram = Histogram("t_seconds", "test", ("host",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "a")
+
+        assert histogram.render() == [
+            "# HELP t_seconds test",
+            "# TYPE t_seconds histogram",
+            't_seconds_bucket{host="a",le="0.1"} 2',
+            't_seconds_bucket{host="a",le="1"} 3',
+            't_seconds_bucket{host="a",le="+Inf"} 4',
+            't_seconds_sum{host="a"} 3.65',
+            't_seconds_count{host="a"} 4',
+        ]
+
+    def test_usage_and_in_flight_runs(self):
+        """Test token usage accumulates and in-flight runs are released."""
+        from types import SimpleNamespace
+
+        from pydantic_ai.usage import RunUsage
+
+        metrics = BackendMetrics()
+        with pytest.raises(RuntimeError):
+            with metrics.agent_run():
+                assert metrics.agent_runs_in_flight == 1
+                raise RuntimeError("model down")
+        usage = RunUsage(input_tokens=120, output_tokens=30, requests=2)
+        metrics.record_usage(SimpleNamespace(usage=usage))
+        # Older pydantic-ai results expose usage() as a method
+        usage = RunUsage(input_tokens=80, output_tokens=10, requests=1)
+        metrics.record_usage(SimpleNamespace(usage=lambda: usage))
+
+        assert metrics.agent_runs_in_flight == 0
+        assert metrics.usage["input_tokens"] == 200
+        assert metrics.usage["output_tokens"] == 40
+        assert metrics.usage["requests"] == 3
+
+
+class TestMetricsEndpoint:
+    """Test suite for the metrics exposed by the server."""
+
+    @pytest.mark.asyncio
+    async def test_upstream_latency_and_timeouts(self, monkeypatch):
+        """Test upstream requests are timed per host and timeouts counted."""
+        from metrics import backend_metrics
+
+        def handler(request):
+            if request.url.path == "/slow":
+                raise httpx.ReadTimeout("timed out", request=request)
+            return httpx.Response(200)
+
+        pools = UpstreamPools(transport=httpx.MockTransport(handler))
+        before = backend_metrics.upstream.count("metrics.test")
+
+        await pools.get("https://metrics.test/ok")
+        with pytest.raises(httpx.ReadTimeout):
+            await pools.get("https://metrics.test/slow")
+
+        assert backend_metrics.upstream.count("metrics.test") == before + 2
+        stats = pools.stats()["hosts"]["metrics.test"]
+        assert stats["errors"] == 1
+        assert stats["timeouts"] == 1
+
+        body = backend_metrics.render(
+            {"active_streams": 0, "completed_streams": 0, "errors": 0},
+            upstream=pools.stats(),
+        )
+        assert (
+            sample(body, 'travelbot_upstream_timeouts_total{host="metrics.test"}') == 1
+        )
+
+    def test_metrics_after_chat_turns(self, offline_agent):
+        """Test /metrics reports endpoint latency, tokens, streams and caches."""
+        from server import app
+
+        client = TestClient(app)
+        client.post("/chat", json={"message": "Hi", "session_id": "s1"})
+        client.post("/chat/stream", json={"message": "Hi", "session_id": "s1"})
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+        chat = 'travelbot_http_request_duration_seconds_count{method="POST",route="/chat",status="200"}'
+        stream = chat.replace('"/chat"', '"/chat/stream"')
+        assert sample(body, chat) >= 1
+        assert sample(body, stream) >= 1
+        assert sample(body, "travelbot_agent_runs_in_flight") == 0
+        assert sample(body, "travelbot_llm_input_tokens_total") > 0
+        assert sample(body, "travelbot_llm_output_tokens_total") > 0
+        assert sample(body, "travelbot_sse_streams_active") == 0
+        assert 'travelbot_cache_hit_ratio{cache="responses"}' in body
+        assert (
+            sample(body, 'travelbot_cache_refresh_errors_total{cache="flight_fares"}')
+            == 0
+        )
+        assert 'travelbot_cache_refresh_errors_total{cache="responses"}' not in body
+
+    def test_unknown_paths_share_one_series(self):
+        """Test unmatched URLs are not recorded under their raw path."""
+        from server import app
+
+        client = TestClient(app)
+        client.get("/no/such/page-123")
+
+        body = client.get("/metrics").text
+        assert "page-123" not in body
+        assert 'route="unmatched",status="404"' in body
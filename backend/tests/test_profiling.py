@@ -0,0 +1,207 @@
+"""Test the opt-in request profiler."""
+
+import asyncio
+import json
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import profiling
+from profiling import Profiler, ProfileSettings
+
+
+def spin_profiled(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def spin_elsewhere(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    # Sampling CPU-bound spins needs the opt-in switch interval
+    profiler = Profiler(
+        ProfileSettings(interval=0.001, token="s3cret", keep=2, switch_interval=0.0005)
+    )
+    monkeypatch.setattr(profiling, "_profiler", profiler)
+    return profiler
+
+
+class TestProfiler:
+    """Test suite for choosing, sampling and keeping profiles."""
+
+    def test_reason_for_header_and_sampling(self):
+        """Test the privileged header or the sampled share selects a request."""
+        draws = iter([0.04, 0.06])
+        profiler = Profiler(
+            ProfileSettings(sample_percent=5, token="s3cret"), rng=lambda: next(draws)
+        )
+
+        assert profiler.reason({"X-Profile-Token": "s3cret"}) == "header"
+        assert profiler.reason({}) == "sampled"
+        assert profiler.reason({"X-Profile-Token": "wrong"}) is None
+
+    def test_header_is_ignored_without_a_configured_token(self):
+        """Test an empty PROFILE_TOKEN never matches, even an empty header."""
+        profiler = Profiler(ProfileSettings(token=""))
+
+        assert profiler.reason({"X-Profile-Token": ""}) is None
+        assert not profiler.token_matches("")
+
+    @pytest.mark.asyncio
+    async def test_samples_belong_to_the_profiled_task(self, profiler):
+        """Test CPU in child tasks is sampled and other requests are left out."""
+
+        async def other_request():
+            for _ in range(20):
+                spin_elsewhere(0.005)
+                await asyncio.sleep(0)
+
+        async def profiled_request():
+            with profiler.profile("POST /chat", "header") as profile:
+                # Work in a child task, as tool calls run
+                async def tool():
+                    for _ in range(20):
+                        spin_profiled(0.005)
+                        await asyncio.sleep(0)
+
+                await asyncio.create_task(tool())
+            return profile
+
+        profile, _ = await asyncio.gather(profiled_request(), other_request())
+
+        folded = profile.folded()
+        assert profile.samples > 10
+        assert "spin_profiled (test_profiling.py:" in folded
+        assert "spin_elsewhere" not in folded
+        line = folded.splitlines()[0]
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+        assert profile.top_functions(1)[0]["function"].startswith("spin_profiled")
+
+    @pytest.mark.asyncio
+    async def test_switch_interval_is_left_alone_by_default(self):
+        """Test profiling only changes the process switch interval on request."""
+        before = sys.getswitchinterval()
+        profiler = Profiler(ProfileSettings(interval=0.001))
+
+        with profiler.profile("POST /chat", "header"):
+            assert sys.getswitchinterval() == before
+            spin_profiled(0.01)
+
+        assert sys.getswitchinterval() == before
+
+    @pytest.mark.asyncio
+    async def test_switch_interval_is_restored_after_profiling(self, profiler):
+        """Test the opt-in switch interval only lasts while profiles run."""
+        before = sys.getswitchinterval()
+
+        with profiler.profile("POST /chat", "header"):
+            assert sys.getswitchinterval() == pytest.approx(0.0005)
+
+        assert sys.getswitchinterval() == before
+
+    @pytest.mark.asyncio
+    async def test_unprofiled_requests_start_no_sampler(self, profiler):
+        """Test a request without a reason costs nothing and is not kept."""
+        with profiler.profile("POST /chat", None) as profile:
+            assert profile is None
+
+        assert profiler._thread is None
+        assert profiler.list() == []
+
+    @pytest.mark.asyncio
+    async def test_only_recent_profiles_are_kept(self, profiler):
+        """Test profiles beyond PROFILE_KEEP are dropped oldest first."""
+        ids = []
+        for _ in range(3):
+            with profiler.profile("POST /chat", "sampled") as profile:
+                ids.append(profile.profile_id)
+
+        assert [p["profile_id"] for p in profiler.list()] == ids[:0:-1]
+        assert profiler.get(ids[0]) is None
+
+
+class TestProfileEndpoints:
+    """Test suite for profiling chat turns and the admin endpoints."""
+
+    def test_profiled_chat_turn_is_viewable(self, profiler, offline_agent):
+        """Test the header profiles /chat and the profile can be downloaded."""
+        from server import app
+
+        client = TestClient(app)
+        headers = {"X-Profile-Token": "s3cret"}
+
+        response = client.post(
+            "/chat", json={"message": "Hi", "session_id": "s1"}, headers=headers
+        )
+        profile_id = response.headers["X-Profile-Id"]
+        listing = client.get("/admin/profiles", headers=headers).json()
+        folded = client.get(f"/admin/profiles/{profile_id}", headers=headers)
+
+        assert listing["profiles"][0]["profile_id"] == profile_id
+        assert listing["profiles"][0]["session_id"] == "s1"
+        assert listing["profiles"][0]["reason"] == "header"
+        assert folded.status_code == 200
+        assert folded.headers["content-type"].startswith("text/plain")
+
+    def test_unprofiled_turns_have_no_profile(self, profiler, offline_agent):
+        """Test requests without the header are not profiled."""
+        from server import app
+
+        client = TestClient(app)
+
+        response = client.post("/chat", json={"message": "Hi", "session_id": "s1"})
+
+        assert "X-Profile-Id" not in response.headers
+        assert profiler.list() == []
+
+    def test_stream_reports_its_profile_id(self, profiler, offline_agent):
+        """Test a profiled /chat/stream turn names its profile in the last frame."""
+        from server import app
+
+        client = TestClient(app)
+
+        response = client.post(
+            "/chat/stream",
+            json={"message": "Hi", "session_id": "s1"},
+            headers={"X-Profile-Token": "s3cret"},
+        )
+
+        frames = [
+            json.loads(line[len("data: ") :])
+            for line in response.text.split("\n")
+            if line.startswith("data: ")
+        ]
+        assert profiler.get(frames[-1]["profile_id"]) is not None
+
+    def test_admin_endpoints_require_the_token(self, profiler):
+        """Test the admin API rejects missing or wrong tokens."""
+        from server import app
+
+        client = TestClient(app)
+
+        assert client.get("/admin/profiles").status_code == 403
+        wrong = {"X-Profile-Token": "guess"}
+        assert client.get("/admin/profiles", headers=wrong).status_code == 403
+        missing = client.get(
+            "/admin/profiles/nope", headers={"X-Profile-Token": "s3cret"}
+        )
+        assert missing.status_code == 404
+
+    def test_admin_endpoints_are_off_without_a_token(self):
+        """Test the admin API is disabled when PROFILE_TOKEN is unset."""
+        from server import app
+
+        response = TestClient(app).get(
+            "/admin/profiles", headers={"X-Profile-Token": ""}
+        )
+
+        assert response.status_code == 404
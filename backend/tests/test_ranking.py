@@ -0,0 +1,174 @@
+"""Test server-side scoring and tiering of search results."""
+
+import math
+import random
+
+import pytest
+
+from tools import ranking
+from tools.ranking import pareto_front, rank_flights, rank_hotels
+
+
+def hotel(name, price, rating=None, distance=None):
+    return {"name": name, "price": price, "rating": rating, "distance": distance}
+
+
+def not_selected(*args):
+    raise AssertionError("the other ranking backend was used")
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """
+    Run each test with the NumPy scorer and the plain-Python fallback; the
+    implementation not under test fails if it is called.
+    """
+    if request.param == "numpy":
+        assert ranking.np is not None
+        monkeypatch.setattr(ranking, "_scores_python", not_selected)
+        monkeypatch.setattr(ranking, "_pareto_python", not_selected)
+    else:
+        monkeypatch.setattr(ranking, "np", None)
+        monkeypatch.setattr(ranking, "_scores_numpy", not_selected)
+        monkeypatch.setattr(ranking, "_pareto_numpy", not_selected)
+    return request.param
+
+
+class TestRankHotels:
+    """Test suite for value/comfort/premium hotel tiers."""
+
+    def test_tiers_follow_price_thirds(self, backend):
+        """Test each tier draws from its own third of the price range."""
+        hotels = [hotel(f"H{p}", p, 8.0) for p in (300, 90, 150, 210, 120, 400)]
+
+        tiers = rank_hotels(hotels, per_tier=2)
+
+        assert {h["name"] for h in tiers["value"]} == {"H90", "H120"}
+        assert {h["name"] for h in tiers["comfort"]} == {"H150", "H210"}
+        assert {h["name"] for h in tiers["premium"]} == {"H300", "H400"}
+
+    def test_rating_and_distance_decide_within_a_tier(self, backend):
+        """Test a better-rated, closer hotel beats a slightly cheaper one."""
+        hotels = [
+            hotel("cheap-far", 100, 6.0, "9 km"),
+            hotel("good-near", 110, 9.2, "0.5 km"),
+            hotel("mid", 200, 8.0, 2),
+            hotel("lux", 400, 9.5, 1),
+        ]
+
+        tiers = rank_hotels(hotels, per_tier=1)
+
+        assert tiers["value"][0]["name"] == "good-near"
+        assert 0 <= tiers["value"][0]["score"] <= 1
+
+    def test_unpriced_and_short_lists(self, backend):
+        """Test unpriced hotels are skipped and short lists leave tiers empty."""
+        tiers = rank_hotels([hotel("A", None, 9), hotel("B", 80)], per_tier=2)
+
+        assert [h["name"] for h in tiers["value"]] == ["B"]
+        assert tiers["comfort"] == tiers["premium"] == []
+        assert rank_hotels([]) == {"value": [], "comfort": [], "premium": []}
+
+    def test_numpy_and_python_agree(self, monkeypatch):
+        """Test both scorers pick the same hotels over a large random set."""
+        rng = random.Random(7)
+        hotels = [
+            hotel(
+                f"H{i}",
+                rng.randint(50, 900),
+                rng.choice([None, round(rng.uniform(5, 10), 1)]),
+                rng.choice([None, round(rng.uniform(0.1, 15), 1)]),
+            )
+            for i in range(500)
+        ]
+
+        with_numpy = rank_hotels(hotels, per_tier=3)
+        monkeypatch.setattr(ranking, "np", None)
+        without_numpy = rank_hotels(hotels, per_tier=3)
+
+        for tier in ranking.TIERS:
+            assert [h["name"] for h in with_numpy[tier]] == [
+                h["name"] for h in without_numpy[tier]
+            ]
+
+
+def brute_force_front(prices, durations, stops):
+    points = list(zip(prices, durations, stops))
+    front = []
+    for i, p in enumerate(points):
+        dominated = any(
+            all(a <= b for a, b in zip(q, p)) and (q != p or j < i)
+            for j, q in enumerate(points)
+            if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+class TestParetoFront:
+    """Test suite for the price / duration / stops frontier."""
+
+    def test_drops_dominated_options(self, backend):
+        """Test options beaten on every axis are removed, cheapest first."""
+        prices = [300, 120, 210, 500, 120]
+        durations = [330, 600, 650, 300, 600]
+        stops = [0, 1, 1, 0, 1]
+
+        assert pareto_front(prices, durations, stops) == [1, 0, 3]
+
+    def test_matches_brute_force(self, backend):
+        """Test the sort-based frontier equals a pairwise dominance check."""
+        rng = random.Random(3)
+        for _ in range(20):
+            n = rng.randint(1, 60)
+            prices = [rng.randint(100, 400) for _ in range(n)]
+            durations = [rng.choice([math.inf, rng.randint(60, 900)]) for _ in range(n)]
+            stops = [rng.choice([0, 1, 2, math.inf]) for _ in range(n)]
+
+            assert sorted(pareto_front(prices, durations, stops)) == sorted(
+                brute_force_front(prices, durations, stops)
+            )
+
+    def test_numpy_and_python_agree(self, monkeypatch):
+        """Test both frontier implementations return the same order."""
+        rng = random.Random(11)
+        prices = [rng.randint(100, 400) for _ in range(500)]
+        durations = [rng.choice([math.inf, rng.randint(60, 900)]) for _ in range(500)]
+        stops = [rng.choice([0, 1, 2, math.inf]) for _ in range(500)]
+
+        with_numpy = pareto_front(prices, durations, stops)
+        monkeypatch.setattr(ranking, "np", None)
+
+        assert pareto_front(prices, durations, stops) == with_numpy
+
+
+class TestRankFlights:
+    """Test suite for per-tier flight picks from the frontier."""
+
+    def test_tiers_come_from_the_frontier(self, backend):
+        """Test value is cheapest, premium is nonstop and dominated fares vanish."""
+        flights = [
+            {"price": 120, "duration": 600, "stops": 1},
+            {"price": 210, "duration": 650, "stops": 1},
+            {"price": 300, "duration": 330, "stops": 0},
+            {"price": 180, "duration": 420, "stops": 1},
+            {"price": None, "duration": 100, "stops": 0},
+        ]
+
+        ranked = rank_flights(flights, per_tier=1)
+
+        assert ranked["count"] == 4
+        assert ranked["frontier_size"] == 3
+        assert ranked["tiers"]["value"][0]["price"] == 120
+        assert ranked["tiers"]["premium"][0]["price"] == 300
+        assert ranked["tiers"]["comfort"][0]["price"] == 180
+
+    def test_unknown_duration_and_stops_rank_last(self, backend):
+        """Test missing duration/stops never beat known values."""
+        flights = [{"price": 100}, {"price": 150, "duration": 300, "stops": 0}]
+
+        ranked = rank_flights(flights)
+
+        assert ranked["tiers"]["premium"][0]["price"] == 150
+        assert rank_flights([])["count"] == 0
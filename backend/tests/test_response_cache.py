@@ -0,0 +1,141 @@
+"""Test the opt-in exact-match response cache."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart
+
+import response_cache
+from response_cache import ResponseCache, normalize_message, turn_is_cacheable
+from server import app
+
+
+def tool_turn(*tools):
+    return [ModelResponse(parts=[ToolCallPart(tool_name=t) for t in tools])]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache:
+    """Test suite for keys, cacheability and eviction."""
+
+    def test_key_normalizes_message_and_includes_stage(self):
+        """Test whitespace/case differences share a key; stage and model do not."""
+        key = ResponseCache.key
+        hello = key("Hello!  Plan a trip\nto NYC", {}, "gpt-4o")
+
+        assert hello == key(
+            "hello! plan a trip to nyc ", {"stage": "initial"}, "gpt-4o"
+        )
+        assert hello != key("hello! plan a trip to nyc", {"stage": "hotels"}, "gpt-4o")
+        assert hello != key("hello! plan a trip to nyc", {}, "gpt-4o-mini")
+        assert normalize_message("  A\tB ") == "a b"
+
+    def test_only_turns_without_live_tool_calls_are_cacheable(self):
+        """Test live-data tool calls make a turn uncacheable."""
+        assert turn_is_cacheable([ModelResponse(parts=[TextPart("Hi!")])])
+        assert turn_is_cacheable(tool_turn("airport_lookup_tool"))
+        assert not turn_is_cacheable(
+            tool_turn("airport_lookup_tool", "flight_search_tool")
+        )
+
+    def test_store_skips_uncacheable_turns(self):
+        """Test tool-using or progress-changing turns are counted, not stored."""
+        cache = ResponseCache(enabled=True)
+
+        assert not cache.store(
+            ("a", "initial", "m"), "x", tool_turn("hotel_search_tool")
+        )
+        assert not cache.store(("b", "initial", "m"), "x", [], progress_changed=True)
+        assert cache.store(("c", "initial", "m"), "x", [])
+
+        stats = cache.snapshot()
+        assert stats["stores"] == 1
+        assert stats["uncacheable_turns"] == 2
+
+    def test_ttl_and_lru_eviction(self):
+        """Test entries expire after the TTL and the oldest is evicted."""
+        clock = FakeClock()
+        cache = ResponseCache(enabled=True, maxsize=2, ttl=60, clock=clock)
+        for name in ("a", "b", "c"):
+            cache.store((name, "initial", "m"), name.upper(), [])
+
+        assert cache.get(("a", "initial", "m")) is None
+        assert cache.get(("c", "initial", "m")) == "C"
+        clock.now += 61
+        assert cache.get(("c", "initial", "m")) is None
+
+        stats = cache.snapshot()
+        assert stats["evictions"] == 1
+        assert stats["expirations"] == 1
+        assert stats["hits"] == 1
+
+    def test_disabled_cache_is_inert(self):
+        """Test the default (disabled) cache never stores or counts."""
+        cache = ResponseCache()
+
+        assert not cache.store(("a", "initial", "m"), "x", [])
+        assert cache.get(("a", "initial", "m")) is None
+        assert cache.snapshot()["misses"] == 0
+
+
+class TestServerResponseCache:
+    """Test suite for cached answers in the chat endpoints."""
+
+    @pytest.fixture(autouse=True)
+    def enabled(self, monkeypatch):
+        cache = ResponseCache(enabled=True)
+        monkeypatch.setattr(response_cache, "_response_cache", cache)
+        return cache
+
+    def test_repeated_first_turn_is_served_from_cache(self, offline_agent, enabled):
+        """Test a second session opening with the same message skips the model."""
+        client = TestClient(app)
+
+        first = client.post("/chat", json={"message": "Hello!", "session_id": "s1"})
+        second = client.post("/chat", json={"message": "hello! ", "session_id": "s2"})
+
+        assert first.json()["cached"] is False
+        assert second.json()["cached"] is True
+        assert second.json()["response"] == first.json()["response"]
+        # The replayed turn is still recorded in the second session
+        from session_store import get_session_store
+
+        assert len(get_session_store().load("s2").messages) == 2
+        assert enabled.snapshot()["hits"] == 1
+
+    def test_stream_replays_cached_answer(self, offline_agent):
+        """Test a cached answer streams as one frame plus the done frame."""
+        client = TestClient(app)
+        client.post("/chat", json={"message": "Hi there", "session_id": "s1"})
+
+        response = client.post(
+            "/chat/stream",
+            json={"message": "Hi there", "session_id": "s2", "stream_mode": "delta"},
+        )
+
+        frames = [
+            json.loads(line[len("data: ") :])
+            for line in response.text.split("\n")
+            if line.startswith("data: ")
+        ]
+        assert len(frames) == 2
+        assert frames[0]["delta"]
+        assert frames[1]["done"] is True
+        assert frames[1]["cached"] is True
+
+    def test_cache_stats_include_responses(self):
+        """Test /cache/stats reports the response cache counters."""
+        client = TestClient(app)
+
+        data = client.get("/cache/stats").json()["responses"]
+
+        assert data["enabled"] is True
+        assert "hit_ratio" in data
@@ -154,3 +154,37 @@ class TestFastAPIServer:
 
         assert response.status_code == 200
         assert "text/event-stream" in response.headers["content-type"]
+
+    def test_upstream_stats_endpoint(self, monkeypatch):
+        """Test lifespan creates upstream pools and exposes their stats."""
+        monkeypatch.setenv("UPSTREAM_WARMUP", "0")
+        monkeypatch.setenv("UPSTREAM_POOL_SIZE", "7")
+
+        with TestClient(app) as client:
+            response = client.get("/upstream/stats")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["pools_ready"] is True
+        assert data["max_connections"] == 7
+        assert "hosts" in data
+
+    def test_cache_stats_endpoint(self):
+        """Test cache stats endpoint reports location cache counters."""
+        client = TestClient(app)
+        response = client.get("/cache/stats")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert "hit_ratio" in data["location_ids"]
+        assert "stale_hits" in data["flight_fares"]
+
+    def test_tool_stats_endpoint(self):
+        """Test tool stats endpoint reports the token budgets."""
+        client = TestClient(app)
+        response = client.get("/tools/stats")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["per_turn_tokens"] >= data["per_tool_tokens"]
+        assert "tools" in data
@@ -0,0 +1,173 @@
+"""Test server-side session storage."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server import app
+from session_store import SessionStore
+
+
+class TestSessionStore:
+    """Test suite for the two-tier session store."""
+
+    def test_turns_persist_across_instances(self, tmp_path):
+        """Test sessions are rebuilt from append-only turn records."""
+        path = str(tmp_path / "sessions.sqlite3")
+        store = SessionStore(path=path)
+        session = store.load("s1")
+        store.append_turn(
+            session,
+            [
+                {"role": "user", "content": "hi"},
+                {"role": "assistant", "content": "hello"},
+            ],
+            {"stage": "initial"},
+        )
+        store.append_turn(
+            session,
+            [{"role": "user", "content": "SFO to JFK"}],
+            {"stage": "flights"},
+        )
+
+        reopened = SessionStore(path=path).load("s1")
+        assert [m["content"] for m in reopened.messages] == [
+            "hi",
+            "hello",
+            "SFO to JFK",
+        ]
+        assert reopened.itinerary_progress == {"stage": "flights"}
+        assert reopened.turns == 2
+
+    def test_cached_session_sees_other_workers_turns(self, tmp_path):
+        """Test a session held in memory catches up on turns written elsewhere."""
+        path = str(tmp_path / "sessions.sqlite3")
+        worker_a = SessionStore(path=path)
+        worker_b = SessionStore(path=path)
+        worker_a.append_turn(
+            worker_a.load("s1"), [{"role": "user", "content": "turn 1"}], {}
+        )
+
+        worker_b.append_turn(
+            worker_b.load("s1"),
+            [{"role": "user", "content": "turn 2"}],
+            {"stage": "flights"},
+        )
+
+        session = worker_a.load("s1")
+        assert [m["content"] for m in session.messages] == ["turn 1", "turn 2"]
+        assert session.itinerary_progress == {"stage": "flights"}
+        assert session.turns == 2
+
+    def test_stale_append_merges_other_workers_turns(self, tmp_path):
+        """Test appending to a stale copy keeps both workers' turns in order."""
+        path = str(tmp_path / "sessions.sqlite3")
+        worker_a = SessionStore(path=path)
+        worker_b = SessionStore(path=path)
+        stale = worker_a.load("s1")
+        worker_b.append_turn(
+            worker_b.load("s1"), [{"role": "user", "content": "from b"}], {}
+        )
+
+        worker_a.append_turn(
+            stale, [{"role": "user", "content": "from a"}], {"stage": "hotels"}
+        )
+
+        expected = ["from b", "from a"]
+        assert [m["content"] for m in stale.messages] == expected
+        reopened = SessionStore(path=path).load("s1")
+        assert [m["content"] for m in reopened.messages] == expected
+        assert reopened.turns == 2
+
+    def test_cached_session_sees_replacement(self, tmp_path):
+        """Test a session replaced by another worker is rebuilt on load."""
+        path = str(tmp_path / "sessions.sqlite3")
+        worker_a = SessionStore(path=path)
+        worker_b = SessionStore(path=path)
+        worker_a.append_turn(
+            worker_a.load("s1"), [{"role": "user", "content": "old"}], {}
+        )
+
+        worker_b.replace("s1", [{"role": "user", "content": "new"}], {})
+
+        session = worker_a.load("s1")
+        assert [m["content"] for m in session.messages] == ["new"]
+        assert session.turns == 1
+
+    def test_cached_session_sees_replacement_that_grew(self, tmp_path):
+        """Test a replaced session is rebuilt even once it has more turns."""
+        path = str(tmp_path / "sessions.sqlite3")
+        worker_a = SessionStore(path=path)
+        worker_b = SessionStore(path=path)
+        worker_a.append_turn(
+            worker_a.load("s1"), [{"role": "user", "content": "old"}], {}
+        )
+        worker_a.load("s1")
+
+        session = worker_b.replace("s1", [{"role": "user", "content": "new"}], {})
+        for content in ("new 2", "new 3"):
+            worker_b.append_turn(session, [{"role": "user", "content": content}], {})
+
+        session = worker_a.load("s1")
+        assert [m["content"] for m in session.messages] == ["new", "new 2", "new 3"]
+        assert session.turns == 3
+
+    def test_unknown_session_is_empty(self):
+        """Test loading a new session id returns empty state."""
+        session = SessionStore(path=None).load("new")
+
+        assert session.messages == []
+        assert session.itinerary_progress == {}
+
+    def test_replace_overwrites_history(self, tmp_path):
+        """Test legacy client state replaces what the server had stored."""
+        path = str(tmp_path / "sessions.sqlite3")
+        store = SessionStore(path=path)
+        store.append_turn(store.load("s1"), [{"role": "user", "content": "old"}], {})
+
+        store.replace("s1", [{"role": "user", "content": "new"}], {"stage": "hotels"})
+
+        reopened = SessionStore(path=path).load("s1")
+        assert [m["content"] for m in reopened.messages] == ["new"]
+        assert reopened.itinerary_progress == {"stage": "hotels"}
+
+
+class TestSessionEndpoints:
+    """Test chat endpoints keep history on the server."""
+
+    def test_chat_returns_only_new_messages(self, offline_agent):
+        """Test the client sends only the new message and gets the delta back."""
+        client = TestClient(app)
+
+        first = client.post("/chat", json={"message": "Plan a trip to NYC"}).json()
+        session_id = first["session_id"]
+        assert session_id
+        assert [m["role"] for m in first["new_messages"]] == ["user", "assistant"]
+        assert first["updated_message_history"] == []
+
+        second = client.post(
+            "/chat", json={"message": "Find flights", "session_id": session_id}
+        ).json()
+        assert second["session_id"] == session_id
+        assert second["new_messages"][0]["content"] == "Find flights"
+
+        from session_store import get_session_store
+
+        assert len(get_session_store().load(session_id).messages) == 4
+
+    def test_stream_records_turn(self, offline_agent):
+        """Test streamed turns are stored and the done frame names the session."""
+        client = TestClient(app)
+        response = client.post(
+            "/chat/stream", json={"message": "Hello", "session_id": "stream-1"}
+        )
+
+        done = json.loads(response.text.strip().split("\n\n")[-1][len("data: ") :])
+        assert done["session_id"] == "stream-1"
+
+        from session_store import get_session_store
+
+        messages = get_session_store().load("stream-1").messages
+        assert [m["role"] for m in messages] == ["user", "assistant"]
+        assert messages[1]["content"]
@@ -0,0 +1,106 @@
+"""Test SSE framing, flush policy and stream metrics."""
+
+import json
+
+from fastapi.testclient import TestClient
+
+import streaming
+from server import app
+from streaming import DeltaBuffer, StreamStats, sse_frame, stream_metrics
+
+
+def parse_frames(body: str):
+    return [
+        json.loads(line[len("data: ") :])
+        for line in body.split("\n")
+        if line.startswith("data: ")
+    ]
+
+
+class TestStreaming:
+    """Test suite for the /chat/stream pipeline."""
+
+    def test_sse_frame_is_compact_bytes(self):
+        """Test frames are pre-encoded compact JSON."""
+        frame = sse_frame({"delta": "héllo"})
+
+        assert frame == 'data: {"delta":"héllo"}\n\n'.encode("utf-8")
+        assert stream_metrics.snapshot()["encoder"] == "orjson"
+
+    def test_sse_frame_stdlib_fallback(self, monkeypatch):
+        """Test the stdlib encoder produces the same bytes without orjson."""
+        payload = {"delta": "héllo", "done": False, "n": [1, 2.5, None]}
+        expected = sse_frame(payload)
+        monkeypatch.setattr(streaming, "orjson", None)
+
+        assert sse_frame(payload) == expected
+        assert stream_metrics.snapshot()["encoder"] == "json"
+
+    def test_delta_buffer_flushes_at_threshold(self):
+        """Test small deltas are held back until the byte threshold."""
+        buffer = DeltaBuffer(min_bytes=5)
+
+        assert buffer.push("ab") is None
+        assert buffer.push("cde") == "abcde"
+        assert buffer.push("f") is None
+        assert buffer.flush() == "f"
+        assert buffer.flush() is None
+
+    def test_delta_buffer_counts_utf8_bytes(self):
+        """Test the threshold is measured in encoded bytes, not characters."""
+        buffer = DeltaBuffer(min_bytes=6)
+
+        assert buffer.push("ab") is None
+        # Two characters, four bytes
+        assert buffer.push("éé") == "abéé"
+
+    def test_stream_stats_track_ttfb_and_volume(self):
+        """Test per-stream counters record first byte, chunks and bytes."""
+        stats = StreamStats()
+        stats.record(b"data: {}\n\n")
+        stats.record(b"data: {}\n\n")
+
+        data = stats.as_dict()
+        assert data["chunks"] == 2
+        assert data["bytes"] == 20
+        assert data["ttfb_ms"] is not None
+
+    def test_delta_mode_streams_only_new_text(self, offline_agent):
+        """Test delta frames concatenate to the stored answer."""
+        client = TestClient(app)
+        response = client.post(
+            "/chat/stream",
+            json={"message": "Hi", "session_id": "d1", "stream_mode": "delta"},
+        )
+
+        frames = parse_frames(response.text)
+        text = "".join(f.get("delta", "") for f in frames)
+        done = frames[-1]
+        assert done["done"] is True
+        assert done["stats"]["chunks"] == len(frames) - 1
+
+        from session_store import get_session_store
+
+        assert get_session_store().load("d1").messages[-1]["content"] == text
+
+    def test_cumulative_mode_is_default(self, offline_agent):
+        """Test legacy clients still receive cumulative content frames."""
+        client = TestClient(app)
+        before = stream_metrics.completed
+        response = client.post("/chat/stream", json={"message": "Hi"})
+
+        frames = parse_frames(response.text)
+        contents = [f["content"] for f in frames if f.get("content")]
+        assert contents and all(
+            later.startswith(earlier) for earlier, later in zip(contents, contents[1:])
+        )
+        assert stream_metrics.completed == before + 1
+        assert stream_metrics.active == 0
+
+    def test_stream_stats_endpoint(self):
+        """Test aggregate stream metrics are exposed."""
+        client = TestClient(app)
+        data = client.get("/stream/stats").json()
+
+        assert "active_streams" in data
+        assert "mean_ttfb_ms" in data
@@ -0,0 +1,129 @@
+"""Test token budgets for tool results."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import tool_budget
+from context_builder import estimate_tokens
+from tool_budget import ToolBudget, budgeted, truncate_result
+
+
+def table(rows: int) -> str:
+    lines = ["best picks of many hotels", "tier|name|price"]
+    lines += [f"value|Hotel number {i}|{100 + i}" for i in range(rows)]
+    return "\n".join(lines)
+
+
+@budgeted
+async def big_tool(ctx, rows: int = 200) -> str:
+    """Return a large table."""
+    return table(rows)
+
+
+class TestTruncateResult:
+    """Test suite for line-based truncation of tool results."""
+
+    def test_small_result_is_unchanged(self):
+        """Test results within the limit pass through untouched."""
+        text = table(3)
+
+        assert truncate_result(text, 100) is text
+
+    def test_keeps_header_and_reports_omitted_rows(self):
+        """Test a cut keeps the leading lines and says how many were dropped."""
+        text = table(200)
+
+        cut = truncate_result(text, 100)
+
+        lines = cut.splitlines()
+        assert lines[:2] == text.splitlines()[:2]
+        assert estimate_tokens(cut) <= 100
+        kept_rows = len(lines) - 3
+        assert lines[-1] == f"… {200 - kept_rows} more lines omitted (token budget)"
+
+    def test_single_long_line_is_cut(self):
+        """Test a result without line breaks is still bounded."""
+        cut = truncate_result("x" * 4000, 50)
+
+        assert estimate_tokens(cut) <= 50
+        assert cut.endswith("…")
+
+
+class TestBudgetedTools:
+    """Test suite for the per-tool and per-turn budget wrapper."""
+
+    @pytest.fixture
+    def ctx(self, test_deps):
+        return SimpleNamespace(deps=test_deps)
+
+    @pytest.fixture(autouse=True)
+    def budget(self, monkeypatch):
+        budget = ToolBudget(per_tool_tokens=300, per_turn_tokens=500, tool_tokens={})
+        monkeypatch.setattr(tool_budget, "_budget", budget)
+        return budget
+
+    @pytest.mark.asyncio
+    async def test_result_is_cut_to_tool_limit(self, ctx):
+        """Test one large result is cut to the per-tool limit and counted."""
+        result = await big_tool(ctx)
+
+        assert estimate_tokens(result) <= 300
+        assert ctx.deps.tool_tokens_used == estimate_tokens(result)
+        stats = tool_budget.tool_budget_metrics.snapshot()["big_tool"]
+        assert stats["calls"] == 1
+        assert stats["truncated"] == 1
+        assert stats["turn_limited"] == 0
+        assert stats["tokens_in"] > stats["tokens_out"]
+
+    @pytest.mark.asyncio
+    async def test_turn_budget_is_shared_across_calls(self, ctx):
+        """Test later calls in a turn get only what is left of the turn budget."""
+        first = await big_tool(ctx)
+        second = await big_tool(ctx)
+        third = await big_tool(ctx)
+
+        assert estimate_tokens(first) + estimate_tokens(second) <= 500
+        # Once the turn budget is spent a short result still gets through
+        assert estimate_tokens(third) <= tool_budget.MIN_RESULT_TOKENS
+        assert "omitted" in third
+        stats = tool_budget.tool_budget_metrics.snapshot()["big_tool"]
+        assert stats["truncated"] == 3
+        assert stats["turn_limited"] == 2
+
+    @pytest.mark.asyncio
+    async def test_small_results_are_not_counted_as_truncated(self, ctx, budget):
+        """Test results within budget are returned as-is."""
+        budget.tool_tokens["big_tool"] = 2000
+
+        result = await big_tool(ctx, rows=5)
+
+        assert result == table(5)
+        stats = tool_budget.tool_budget_metrics.snapshot()["big_tool"]
+        assert stats["truncated"] == 0
+
+    def test_budget_from_env(self, monkeypatch):
+        """Test limits and per-tool overrides are read from the environment."""
+        monkeypatch.setenv("TOOL_RESULT_TOKENS", "250")
+        monkeypatch.setenv(
+            "TOOL_RESULT_TOKEN_LIMITS", "search_events=100, bad, hotel_search_tool=x"
+        )
+
+        budget = ToolBudget.from_env()
+
+        assert budget.limit_for("flight_search_tool") == 250
+        assert budget.limit_for("search_events") == 100
+        assert budget.limit_for("hotel_search_tool") == 250
+        assert budget.limit_for("trip_bundle_search") == 1200
+
+    def test_agent_tools_keep_their_schemas(self):
+        """Test wrapped tools still expose their own names and parameters."""
+        from travel_agent import travel_agent
+
+        tools = travel_agent.toolsets[0].tools
+
+        assert "hotel_search_tool" in tools
+        hotel = tools["hotel_search_tool"]
+        assert hotel.takes_ctx
+        assert "checkin_date" in hotel.function_schema.json_schema["properties"]
+        assert hotel.function.__wrapped__.__name__ == "hotel_search_tool"
@@ -0,0 +1,665 @@
+"""Test upstream tool helpers against an in-process HTTP transport."""
+
+import asyncio
+import json
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from context_builder import estimate_tokens
+from tools import hotel_scraper, http_client, singleflight
+from tools.flight_scraper import (
+    flexible_flight_search_tool,
+    format_price_matrix,
+    nearby_airports,
+    search_flight_matrix,
+    search_flights,
+    search_nearby_flights,
+)
+from tools.hotel_scraper import get_location_id, search_hotels
+from tools.tool_format import format_table
+from tools.web_scraper import _query_ticketmaster, _query_yelp
+
+
+class TestAsyncHttpLayer:
+    """Test suite for the shared async HTTP client used by every tool."""
+
+    @pytest.mark.asyncio
+    async def test_search_flights_drops_empty_params(self, mock_upstream):
+        """Test None-valued params are not sent upstream."""
+        mock_upstream.handler = lambda request: httpx.Response(
+            200, json={"data": [{"price": 120}]}
+        )
+
+        raw = await search_flights("SFO", "JFK", "2025-12-15", travelpayouts_token="t")
+
+        assert raw == {"data": [{"price": 120}]}
+        params = mock_upstream.requests[0].url.params
+        assert params["origin"] == "SFO"
+        assert "return_at" not in params
+
+    @pytest.mark.asyncio
+    async def test_get_location_id_handles_http_error(self, mock_upstream):
+        """Test auto-complete failures resolve to None instead of raising."""
+        mock_upstream.handler = lambda request: httpx.Response(503, text="down")
+
+        assert await get_location_id("Paris", "key", "test.api.com") is None
+
+    @pytest.mark.asyncio
+    async def test_activity_helpers_return_empty_on_error(self, mock_upstream):
+        """Test Yelp and Ticketmaster helpers degrade to empty lists."""
+        mock_upstream.handler = lambda request: httpx.Response(401)
+
+        assert await _query_yelp("Paris", 5, "key") == []
+        assert await _query_ticketmaster("Paris", "2025-12-10", "2025-12-12") == []
+
+    @pytest.mark.asyncio
+    async def test_requests_do_not_block_event_loop(self, mock_upstream):
+        """Test concurrent upstream calls overlap instead of running serially."""
+
+        async def slow(request):
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json={"businesses": []})
+
+        mock_upstream.handler = slow
+
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(*(_query_yelp("Paris", 5, "key") for _ in range(5)))
+        elapsed = asyncio.get_running_loop().time() - started
+
+        assert elapsed < 0.6
+
+
+class TestUpstreamPools:
+    """Test suite for per-host upstream connection pools."""
+
+    @pytest.mark.asyncio
+    async def test_pools_reuse_client_per_host(self):
+        """Test each host gets one pooled client that is reused."""
+        pools = http_client.UpstreamPools(["api.yelp.com"])
+
+        first = pools.client_for_host("api.yelp.com")
+        assert pools.client_for_host("api.yelp.com") is first
+        assert pools.client_for_host("app.ticketmaster.com") is not first
+
+        await pools.aclose()
+
+    @pytest.mark.asyncio
+    async def test_pool_stats_count_requests_and_errors(self, mock_upstream):
+        """Test per-host counters track requests and transport errors."""
+
+        def handler(request):
+            if request.url.path == "/boom":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={})
+
+        mock_upstream.handler = handler
+
+        await http_client.get("https://api.yelp.com/ok")
+        with pytest.raises(httpx.ConnectError):
+            await http_client.get("https://api.yelp.com/boom")
+
+        stats = mock_upstream.pools.stats()["hosts"]["api.yelp.com"]
+        assert stats == {
+            "requests": 2,
+            "errors": 1,
+            "timeouts": 0,
+            "in_flight": 0,
+            "open_connections": 0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_tools_use_pools_from_dependencies(self, test_deps):
+        """Test tool helpers send requests through the pools passed to them."""
+        seen = []
+
+        def handler(request):
+            seen.append(request.url.host)
+            return httpx.Response(200, json={"data": []})
+
+        test_deps.upstream = http_client.UpstreamPools(
+            transport=httpx.MockTransport(handler)
+        )
+
+        await search_flights(
+            "SFO",
+            "JFK",
+            "2025-12-15",
+            travelpayouts_token="t",
+            pools=test_deps.upstream,
+        )
+
+        assert seen == ["api.travelpayouts.com"]
+        assert (
+            test_deps.upstream.stats()["hosts"]["api.travelpayouts.com"]["requests"]
+            == 1
+        )
+
+
+class TestSingleFlight:
+    """Test suite for coalescing identical concurrent upstream requests."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_share_one_execution(self):
+        """Test callers with the same key await a single execution."""
+        flight = singleflight.SingleFlight("test")
+        runs = []
+
+        async def fetch():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {"price": 100}
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(10)))
+
+        assert runs == [1]
+        assert all(r == {"price": 100} for r in results)
+        assert flight.snapshot() == {
+            "calls": 10,
+            "executions": 1,
+            "coalesced": 9,
+            "errors": 0,
+            "in_flight": 0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_waiter(self):
+        """Test a failed execution raises for all coalesced callers."""
+        flight = singleflight.SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("quota exceeded")
+
+        results = await asyncio.gather(
+            *(flight.do("k", fetch) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats.errors == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_call(self):
+        """Test other waiters still get the result if one caller is cancelled."""
+        flight = singleflight.SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "ok"
+
+    @pytest.mark.asyncio
+    async def test_identical_hotel_searches_are_coalesced(self, mock_upstream):
+        """Test concurrent identical hotel searches hit the upstream once."""
+
+        async def slow(request):
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"data": {"stays": []}})
+
+        mock_upstream.handler = slow
+
+        await asyncio.gather(
+            *(
+                search_hotels(
+                    "loc-1",
+                    "2025-12-10",
+                    "2025-12-12",
+                    hotels_rapidapi_key="key",
+                    hotels_rapidapi_host="test.api.com",
+                )
+                for _ in range(5)
+            )
+        )
+
+        assert len(mock_upstream.requests) == 1
+        assert singleflight.snapshot()["hotels"]["coalesced"] == 4
+
+
+class TestFlexibleDateSearch:
+    """Test suite for the flexible-date flight price matrix."""
+
+    @staticmethod
+    def fare_handler(request):
+        dep = request.url.params["departure_at"]
+        ret = request.url.params.get("return_at")
+        price = 100 + int(dep[-2:]) * 10 + (int(ret[-2:]) if ret else 0)
+        return httpx.Response(
+            200,
+            json={
+                "data": [
+                    {
+                        "origin": "SFO",
+                        "destination": "JFK",
+                        "price": price,
+                        "airline": "UA",
+                        "departure_at": dep,
+                        "return_at": ret,
+                    }
+                ]
+            },
+        )
+
+    @pytest.mark.asyncio
+    async def test_matrix_covers_every_valid_date_pair(self, mock_upstream):
+        """Test ±1 day around both dates searches all nine cells."""
+        mock_upstream.handler = self.fare_handler
+
+        matrix = await search_flight_matrix(
+            "SFO",
+            "JFK",
+            "2025-12-10",
+            "2025-12-15",
+            flex_days=1,
+            travelpayouts_token="t",
+        )
+
+        assert matrix["departures"] == ["2025-12-09", "2025-12-10", "2025-12-11"]
+        assert matrix["returns"] == ["2025-12-14", "2025-12-15", "2025-12-16"]
+        assert len(matrix["grid"]) == 9
+        assert len(mock_upstream.requests) == 9
+        assert matrix["cheapest_price"] == 100 + 90 + 14
+
+    @pytest.mark.asyncio
+    async def test_skips_returns_before_departure_and_caps_window(self, mock_upstream):
+        """Test impossible date pairs are skipped and flex_days is capped."""
+        mock_upstream.handler = self.fare_handler
+
+        matrix = await search_flight_matrix(
+            "SFO",
+            "JFK",
+            "2025-12-10",
+            "2025-12-11",
+            flex_days=10,
+            travelpayouts_token="t",
+        )
+
+        assert len(matrix["departures"]) == 7
+        assert all(r > d for d, r in matrix["grid"])
+        assert ("2025-12-13", "2025-12-08") not in matrix["grid"]
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, mock_upstream):
+        """Test no more than max_concurrency cells are fetched at once."""
+        active, peak = 0, 0
+
+        async def slow(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return self.fare_handler(request)
+
+        mock_upstream.handler = slow
+
+        await search_flight_matrix(
+            "SFO",
+            "JFK",
+            "2025-12-10",
+            "2025-12-20",
+            flex_days=2,
+            max_concurrency=3,
+            travelpayouts_token="t",
+        )
+
+        assert peak == 3
+        assert len(mock_upstream.requests) == 25
+
+    @pytest.mark.asyncio
+    async def test_format_marks_cheapest_and_missing_cells(self, mock_upstream):
+        """Test the text grid marks the cheapest fare and missing cells."""
+
+        def handler(request):
+            if request.url.params["departure_at"] == "2025-12-11":
+                return httpx.Response(500)
+            return self.fare_handler(request)
+
+        mock_upstream.handler = handler
+
+        matrix = await search_flight_matrix(
+            "SFO", "JFK", "2025-12-10", None, flex_days=1, travelpayouts_token="t"
+        )
+        text = format_price_matrix(matrix)
+
+        assert "depart | price" in text
+        assert "2025-12-09 | 190*" in text
+        assert "2025-12-11 | -" in text
+        assert "cheapest: 2025-12-09 -> one-way UA 190" in text
+
+    @pytest.mark.asyncio
+    async def test_rejected_token_is_not_reported_as_no_fares(self, mock_upstream):
+        """Test a 401 from Travelpayouts raises instead of returning no offers."""
+        mock_upstream.handler = lambda request: httpx.Response(401)
+
+        with pytest.raises(ValueError, match="rejected TRAVELPAYOUTS_TOKEN"):
+            await search_flight_matrix(
+                "SFO", "JFK", "2025-12-10", flex_days=1, travelpayouts_token="bad"
+            )
+
+    @pytest.mark.asyncio
+    async def test_missing_token_raises(self, mock_upstream):
+        """Test a missing token fails before any request is sent."""
+        with pytest.raises(ValueError, match="TRAVELPAYOUTS_TOKEN"):
+            await search_flight_matrix("SFO", "JFK", "2025-12-10")
+
+        assert mock_upstream.requests == []
+
+    @pytest.mark.asyncio
+    async def test_malformed_cells_are_left_empty(self, mock_upstream):
+        """Test a non-JSON body or null data empties one cell, not the matrix."""
+
+        def handler(request):
+            departure = request.url.params["departure_at"]
+            if departure == "2025-12-09":
+                return httpx.Response(200, text="<html>busy</html>")
+            if departure == "2025-12-11":
+                return httpx.Response(200, json={"data": None})
+            return self.fare_handler(request)
+
+        mock_upstream.handler = handler
+
+        matrix = await search_flight_matrix(
+            "SFO", "JFK", "2025-12-10", None, flex_days=1, travelpayouts_token="t"
+        )
+
+        assert list(matrix["grid"]) == [("2025-12-10", None)]
+
+    @pytest.mark.asyncio
+    async def test_code_errors_are_not_swallowed(self, mock_upstream, monkeypatch):
+        """Test only upstream HTTP failures are turned into empty cells."""
+        from tools import flight_scraper
+
+        async def broken(*args, **kwargs):
+            raise KeyError("data")
+
+        monkeypatch.setattr(flight_scraper, "search_flights", broken)
+
+        with pytest.raises(KeyError):
+            await search_flight_matrix(
+                "SFO", "JFK", "2025-12-10", flex_days=0, travelpayouts_token="t"
+            )
+
+    @pytest.mark.asyncio
+    async def test_tool_rejects_malformed_dates(self, test_deps, mock_upstream):
+        """Test bad model-supplied dates come back as an error message."""
+        ctx = SimpleNamespace(deps=test_deps)
+
+        bad_format = await flexible_flight_search_tool(ctx, "SFO", "JFK", "12/10/2025")
+        reversed_dates = await flexible_flight_search_tool(
+            ctx, "SFO", "JFK", "2025-12-10", "2025-12-01"
+        )
+
+        assert bad_format.startswith("Date validation error: Invalid departure date")
+        assert "before departure" in reversed_dates
+        assert mock_upstream.requests == []
+
+
+class TestNearbyAirportSearch:
+    """Test suite for searching neighboring airports concurrently."""
+
+    @staticmethod
+    def route_handler(request):
+        origin = request.url.params["origin"]
+        destination = request.url.params["destination"]
+        prices = {"OAK": 150, "SFO": 300, "SJC": 250}
+        return httpx.Response(
+            200,
+            json={
+                "data": [
+                    {
+                        "origin": origin,
+                        "destination": destination,
+                        "price": prices.get(origin, 200)
+                        + (50 if destination == "JFK" else 0),
+                        "airline": "UA",
+                        "departure_at": request.url.params["departure_at"],
+                    }
+                ]
+            },
+        )
+
+    @pytest.mark.asyncio
+    async def test_merges_nearby_routes_by_price(self, mock_upstream):
+        """Test offers from all searched pairs come back cheapest first."""
+        mock_upstream.handler = self.route_handler
+
+        offers = await search_nearby_flights(
+            "SFO", "JFK", "2025-12-10", travelpayouts_token="t", max_pairs=9
+        )
+
+        routes = [(o["origin"], o["destination"]) for o in offers]
+        assert routes[0] == ("OAK", "LGA")
+        assert ("SFO", "JFK") in routes
+        assert [o["price"] for o in offers] == sorted(o["price"] for o in offers)
+        assert len(mock_upstream.requests) == 9
+
+    @pytest.mark.asyncio
+    async def test_fan_out_is_capped(self, mock_upstream):
+        """Test only max_pairs routes are searched, requested route first."""
+        mock_upstream.handler = self.route_handler
+
+        await search_nearby_flights(
+            "SFO", "JFK", "2025-12-10", travelpayouts_token="t", max_pairs=3
+        )
+
+        searched = [
+            (r.url.params["origin"], r.url.params["destination"])
+            for r in mock_upstream.requests
+        ]
+        assert len(searched) == 3
+        assert ("SFO", "JFK") in searched
+        assert ("SJC", "EWR") not in searched
+
+    def test_nearby_airports_includes_requested_code_first(self):
+        """Test the expansion keeps the requested airport and caps the list."""
+        assert nearby_airports("SFO", max_airports=2) == ["SFO", "OAK"]
+        assert nearby_airports("XXX") == ["XXX"]
+
+
+class TestHotelParsing:
+    """Test suite for top-N parsing of hotel search responses."""
+
+    stays = [
+        {
+            "name": f"Hotel {i}",
+            "price": {"value": price, "currency": "USD"},
+            "rating": rating,
+            "photos": ["x" * 100] * 5,
+        }
+        for i, (price, rating) in enumerate([(90, 7.1), (120, 9.0), (80, 8.2)])
+    ]
+
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            {"data": {"stays": stays}},
+            {"data": {"hotels": stays}},
+            {"data": stays},
+            stays,
+        ],
+    )
+    def test_matches_summarize_hotels(self, payload):
+        """Test parsed summaries equal summarize_hotels on the full payload."""
+        body = json.dumps(payload).encode()
+
+        assert hotel_scraper.parse_hotels(body, limit=2) == (
+            hotel_scraper.summarize_hotels(json.loads(body), limit=2)
+        )
+        assert len(hotel_scraper.parse_hotels(body, limit=None)) == 3
+
+    def test_bounded_heap_keeps_best_by_key(self):
+        """Test a key keeps the N best records from anywhere in the response."""
+        body = json.dumps({"data": {"stays": self.stays}}).encode()
+
+        best = hotel_scraper.parse_hotels(body, limit=2, key=lambda h: -h["rating"])
+
+        assert [h["name"] for h in best] == ["Hotel 1", "Hotel 2"]
+
+    @pytest.mark.asyncio
+    async def test_summaries_share_the_coalesced_fetch(self, mock_upstream):
+        """Test raw and summarized searches for the same query share a request."""
+
+        async def slow(request):
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"data": {"stays": self.stays}})
+
+        mock_upstream.handler = slow
+        args = ("loc-1", "2025-12-10", "2025-12-12")
+        kwargs = {"hotels_rapidapi_key": "key", "hotels_rapidapi_host": "h.com"}
+
+        raw, summaries = await asyncio.gather(
+            hotel_scraper.search_hotels(*args, **kwargs),
+            hotel_scraper.search_hotel_summaries(*args, **kwargs, limit=1),
+        )
+
+        assert len(mock_upstream.requests) == 1
+        assert raw["data"]["stays"][0]["name"] == "Hotel 0"
+        assert summaries == [hotel_scraper.summarize_hotel(self.stays[0])]
+
+
+class TestCompactToolOutput:
+    """Test suite for the tabular tool-result encoding."""
+
+    @staticmethod
+    def upstream(request):
+        host = request.url.host
+        if host == "api.travelpayouts.com":
+            fares = [
+                {
+                    "origin": "SFO",
+                    "destination": "JFK",
+                    "price": 150 + 7 * i,
+                    "airline": "UA",
+                    "departure_at": "2025-12-10T08:00:00-08:00",
+                    "return_at": None,
+                    "duration": 330 + 15 * (i % 5),
+                    "transfers": i % 2,
+                    "link": f"/search/SFO1012JFK1?t={i}",
+                }
+                for i in range(30)
+            ]
+            return httpx.Response(200, json={"data": fares})
+        if request.url.path.endswith("auto-complete"):
+            return httpx.Response(200, json={"data": [{"id": "loc-1"}]})
+        if request.url.path.endswith("stays/search"):
+            stays = [
+                {
+                    "name": f"Hotel {i}",
+                    "price": {"value": 90 + 11 * i, "currency": "USD"},
+                    "rating": 7.0 + (i % 4) / 2,
+                    "address": {"street": f"{i} Rue X", "city": "Paris"},
+                    "url": f"https://booking.example/h/{i}",
+                    "distance": f"{i % 6}.5 km",
+                }
+                for i in range(30)
+            ]
+            return httpx.Response(200, json={"data": {"stays": stays}})
+        if host == "api.yelp.com":
+            businesses = [
+                {
+                    "name": f"Bistro {i}",
+                    "price": "$$",
+                    "rating": 4.5,
+                    "location": {"display_address": [f"{i} Rue Y", "Paris"]},
+                    "categories": [{"title": "French"}, {"title": "Wine Bars"}],
+                    "image_url": f"https://s3-media.example/bphoto/{i}/o.jpg",
+                    "url": f"https://www.yelp.com/biz/bistro-{i}",
+                }
+                for i in range(10)
+            ]
+            return httpx.Response(200, json={"businesses": businesses})
+        events = [
+            {
+                "name": f"Concert {i}",
+                "url": f"https://www.ticketmaster.com/event/{i}",
+                "dates": {"start": {"localDate": "2025-12-11"}},
+                "classifications": [{"name": "Music"}],
+                "_embedded": {"venues": [{"name": "Olympia"}]},
+            }
+            for i in range(8)
+        ]
+        return httpx.Response(200, json={"_embedded": {"events": events}})
+
+    def test_format_table(self):
+        """Test header, constant-column hoisting and cell escaping."""
+        rows = [
+            {"name": "A|B", "price": 10.0, "tags": ["x", "y"], "cur": "USD"},
+            {"name": "C\nD", "price": 12.5, "tags": [], "cur": "USD", "ok": True},
+        ]
+
+        table = format_table(
+            rows, ("name", "price", "tags", "cur", "ok", "gone"), "2 rows"
+        )
+
+        assert table.splitlines() == [
+            "2 rows cur=USD",
+            "name|price|tags|ok",
+            "A/B|10|x;y|",
+            "C D|12.5||yes",
+        ]
+        assert format_table([], ("name",)) == ""
+
+    @pytest.mark.asyncio
+    async def test_every_tool_output_shrinks(self, mock_upstream, test_deps):
+        """Test each tool's table is well under its former repr/JSON size."""
+        from tools.airports import airport_lookup_tool, get_airport_index
+        from tools.flight_scraper import flight_search_tool, summarize_flights
+        from tools.hotel_scraper import hotel_search_tool, search_hotel_summaries
+        from tools.ranking import rank_flights, rank_hotels
+        from tools.web_scraper import (
+            STATIC_ATTRACTIONS,
+            search_attractions,
+            search_events,
+            search_restaurants,
+        )
+
+        mock_upstream.handler = self.upstream
+        ctx = SimpleNamespace(deps=test_deps)
+        checkin = (date.today() + timedelta(days=30)).isoformat()
+        checkout = (date.today() + timedelta(days=33)).isoformat()
+
+        raw_fares = self.upstream(
+            httpx.Request("GET", "https://api.travelpayouts.com/x")
+        ).json()
+        hotels = await search_hotel_summaries(
+            "loc-1",
+            checkin,
+            checkout,
+            hotels_rapidapi_key="k",
+            hotels_rapidapi_host="test.api.com",
+            limit=None,
+        )
+        before = {
+            "flights": str(rank_flights(summarize_flights(raw_fares, limit=30))),
+            "hotels": str({"tiers": rank_hotels(hotels), "count": len(hotels)}),
+            "restaurants": json.dumps(await _query_yelp("Paris", 10, "k")),
+            "events": json.dumps(
+                await _query_ticketmaster("Paris", "2025-12-10", "2025-12-12")
+            ),
+            "attractions": json.dumps(STATIC_ATTRACTIONS["paris"]),
+            "airports": "\n".join(
+                f"{a.code} ({a.kind}) {a.name}, {a.city}, {a.country}"
+                for a in get_airport_index().search("London")
+            ),
+        }
+        after = {
+            "flights": await flight_search_tool(ctx, "SFO", "JFK", "2025-12-10"),
+            "hotels": await hotel_search_tool(ctx, "Paris", checkin, checkout),
+            "restaurants": await search_restaurants(ctx, "Paris"),
+            "events": await search_events(ctx, "Paris", "2025-12-10", "2025-12-12"),
+            "attractions": await search_attractions(ctx, "Paris"),
+            "airports": await airport_lookup_tool(ctx, "London"),
+        }
+
+        for tool, text in after.items():
+            ratio = estimate_tokens(text) / estimate_tokens(before[tool])
+            assert ratio < 0.9, f"{tool}: {ratio:.2f}"
+        assert "image" not in after["restaurants"]
@@ -0,0 +1,218 @@
+"""Test per-request tracing and the Server-Timing header."""
+
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import tracing
+from tools.http_client import UpstreamPools
+from tracing import Span, Trace, Tracer, otlp_payload, span, start_trace
+
+
+def timed(trace, name, kind, start_ms, end_ms):
+    s = Span(name, kind, trace.trace_id, name, None, start_ms * 10**6, end_ms * 10**6)
+    trace.spans.append(s)
+    return s
+
+
+class TestSpans:
+    """Test suite for span nesting, timing breakdowns and export."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_children_share_their_parent(self):
+        """Test spans opened in gathered tasks nest under the enclosing span."""
+
+        async def tool(name):
+            with span(name, "tool"):
+                await asyncio.sleep(0.01)
+
+        with start_trace("POST /chat", "s1") as trace:
+            with span("agent.run", "agent") as agent:
+                await asyncio.gather(tool("a"), tool("b"))
+
+        by_name = {s.name: s for s in trace.spans}
+        assert by_name["a"].parent_id == agent.span_id
+        assert by_name["b"].parent_id == agent.span_id
+        assert agent.parent_id == trace.root.span_id
+        assert all(s.end_ns for s in trace.spans)
+        assert tracing.current_trace() is None
+
+    def test_spans_outside_a_trace_are_noops(self):
+        """Test instrumented code runs untraced outside a request."""
+        with span("orphan") as s:
+            assert s is None
+
+    def test_errors_are_recorded_on_the_span(self):
+        """Test an exception marks its span and still propagates."""
+        with pytest.raises(ValueError):
+            with start_trace("POST /chat") as trace:
+                with span("get_location_id"):
+                    raise ValueError("no city")
+
+        assert trace.spans[1].error == "ValueError: no city"
+        assert trace.root.error == "ValueError: no city"
+
+    def test_timings_split_model_tool_and_upstream_time(self):
+        """Test overlapping tools count once and the rest of the run is model time."""
+        trace = Trace("POST /chat")
+        trace.root.start_ns, trace.root.end_ns = 0, 1000 * 10**6
+        timed(trace, "agent.run", "agent", 0, 900)
+        timed(trace, "flights", "tool", 100, 400)
+        timed(trace, "hotels", "tool", 300, 500)
+        timed(trace, "GET api", "http", 150, 350)
+
+        assert trace.timings() == {
+            "llm": 500.0,
+            "tools": 400.0,
+            "upstream": 200.0,
+            "total": 1000.0,
+        }
+        assert trace.server_timing() == (
+            "llm;dur=500.0, tools;dur=400.0, upstream;dur=200.0, total;dur=1000.0"
+        )
+
+    def test_json_export_writes_one_line_per_span(self, tmp_path):
+        """Test the JSON log exporter tags every span with the session id."""
+        path = tmp_path / "traces" / "spans.jsonl"
+        tracer = Tracer(exporter="json", json_path=str(path))
+        trace = Trace("POST /chat", session_id="s1")
+        timed(trace, "agent.run", "agent", 0, 5)
+        trace.root.end_ns = trace.root.start_ns + 1
+
+        tracer.export(trace)
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["name"] for line in lines] == ["POST /chat", "agent.run"]
+        assert all(line["attributes"]["session.id"] == "s1" for line in lines)
+        assert tracer.snapshot()["exported_spans"] == 2
+
+    @pytest.mark.asyncio
+    async def test_json_export_runs_off_the_event_loop(self, tmp_path, monkeypatch):
+        """Test spans are written from a worker thread and flushed on demand."""
+        path = tmp_path / "spans.jsonl"
+        tracer = Tracer(exporter="json", json_path=str(path))
+        writers = []
+        write = tracer._write_json
+
+        def record_thread(spans):
+            writers.append(threading.get_ident())
+            write(spans)
+
+        monkeypatch.setattr(tracer, "_write_json", record_thread)
+        traces = [Trace(f"POST /chat {i}") for i in range(5)]
+        for trace in traces:
+            trace.root.end_ns = trace.root.start_ns + 1
+            tracer.export(trace)
+
+        await tracer.flush()
+
+        assert len(writers) == 5
+        assert threading.get_ident() not in writers
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert sorted(line["name"] for line in lines) == sorted(
+            t.root.name for t in traces
+        )
+
+    def test_otlp_payload(self):
+        """Test spans encode as OTLP/HTTP JSON with kinds, parents and status."""
+        trace = Trace("POST /chat", session_id="s1")
+        trace.root.end_ns = trace.root.start_ns + 1
+        child = timed(trace, "GET api.yelp.com/v3", "http", 0, 1)
+        child.parent_id = trace.root.span_id
+        child.error = "ConnectError: refused"
+        child.attributes["http.status_code"] = 503
+
+        payload = otlp_payload(trace.finished_spans())
+
+        resource = payload["resourceSpans"][0]
+        spans = resource["scopeSpans"][0]["spans"]
+        assert resource["resource"]["attributes"][0]["value"] == {
+            "stringValue": "travel-bot"
+        }
+        assert [s["kind"] for s in spans] == [2, 3]
+        assert "parentSpanId" not in spans[0]
+        assert spans[1]["parentSpanId"] == trace.root.span_id
+        assert spans[1]["status"] == {"code": 2, "message": "ConnectError: refused"}
+        attributes = {a["key"]: a["value"] for a in spans[1]["attributes"]}
+        assert attributes["http.status_code"] == {"intValue": "503"}
+        assert attributes["session.id"] == {"stringValue": "s1"}
+
+    def test_unknown_exporter_is_rejected(self, monkeypatch):
+        """Test a typo in TRACE_EXPORT fails loudly."""
+        monkeypatch.setenv("TRACE_EXPORT", "jaeger")
+
+        with pytest.raises(ValueError):
+            Tracer.from_env()
+
+
+class TestInstrumentation:
+    """Test suite for spans recorded by the server, tools and HTTP client."""
+
+    @pytest.mark.asyncio
+    async def test_upstream_requests_are_traced_without_query(self):
+        """Test HTTP spans carry host, path and status but not API keys."""
+        pools = UpstreamPools(
+            transport=httpx.MockTransport(lambda r: httpx.Response(204))
+        )
+
+        with start_trace("POST /chat") as trace:
+            await pools.get(
+                "https://api.yelp.com/v3/businesses/search", params={"key": "secret"}
+            )
+
+        http = trace.spans[1]
+        assert http.kind == "http"
+        assert http.name == "GET api.yelp.com/v3/businesses/search"
+        assert http.attributes["http.status_code"] == 204
+        assert "secret" not in json.dumps(http.as_dict())
+
+    def test_chat_returns_server_timing(self, monkeypatch, tmp_path):
+        """Test /chat reports a timing breakdown and exports agent and tool spans."""
+        from pydantic_ai.models.test import TestModel
+
+        from server import app
+        from travel_agent import travel_agent
+
+        path = tmp_path / "spans.jsonl"
+        monkeypatch.setattr(
+            tracing, "_tracer", Tracer(exporter="json", json_path=str(path))
+        )
+        model = TestModel(call_tools=["airport_lookup_tool"])
+        # Leaving the client runs the lifespan shutdown, which flushes exports
+        with TestClient(app) as client, travel_agent.override(model=model):
+            response = client.post(
+                "/chat", json={"message": "Airports in Paris?", "session_id": "s1"}
+            )
+
+        assert response.status_code == 200
+        timing = response.headers["Server-Timing"]
+        for metric in ("llm;dur=", "tools;dur=", "upstream;dur=", "total;dur="):
+            assert metric in timing
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+        kinds = {s["name"]: s["kind"] for s in spans}
+        assert kinds["POST /chat"] == "request"
+        assert kinds["agent.run"] == "agent"
+        assert kinds["airport_lookup_tool"] == "tool"
+        assert {s["attributes"]["session.id"] for s in spans} == {"s1"}
+        assert len({s["trace_id"] for s in spans}) == 1
+
+    def test_stream_done_frame_carries_timing(self, offline_agent):
+        """Test /chat/stream reports the breakdown in its final frame."""
+        from server import app
+
+        client = TestClient(app)
+
+        response = client.post(
+            "/chat/stream", json={"message": "Hi", "session_id": "s1"}
+        )
+
+        frames = [
+            json.loads(line[len("data: ") :])
+            for line in response.text.split("\n")
+            if line.startswith("data: ")
+        ]
+        assert set(frames[-1]["timing"]) == {"llm", "tools", "upstream", "total"}
@@ -74,24 +74,22 @@ class TestTravelAgent:
         with patch("tools.hotel_scraper.get_location_id") as mock_location:
             mock_location.return_value = "12345"
 
-            with patch("tools.hotel_scraper.search_hotels") as mock_search:
-                mock_search.return_value = {"data": {"stays": []}}
+            with patch("tools.hotel_scraper.search_hotel_summaries") as mock_search:
+                mock_search.return_value = []
 
-                with patch("tools.hotel_scraper.summarize_hotels") as mock_summarize:
-                    mock_summarize.return_value = []
-
-                    result = await travel_agent.run(
-                        "Search hotels in Paris from 2025-12-10 to 2025-12-15",
-                        deps=test_deps,
-                    )
+                result = await travel_agent.run(
+                    "Search hotels in Paris from 2025-12-10 to 2025-12-15",
+                    deps=test_deps,
+                )
 
-                    # Should get a response about hotels
-                    assert len(result.output) > 0
-                    mock_location.assert_called_once_with(
-                        "Paris",
-                        test_deps.hotels_rapidapi_key,
-                        test_deps.hotels_rapidapi_host,
-                    )
+                # Should get a response about hotels
+                assert len(result.output) > 0
+                mock_location.assert_called_once_with(
+                    "Paris",
+                    test_deps.hotels_rapidapi_key,
+                    test_deps.hotels_rapidapi_host,
+                    pools=test_deps.upstream,
+                )
 
     @pytest.mark.asyncio
     async def test_restaurant_search_integration(self, test_deps):
@@ -105,7 +103,9 @@ class TestTravelAgent:
 
             # Should get a response about restaurants
             assert len(result.output) > 0
-            mock_yelp.assert_called_once_with("Paris", 10, test_deps.yelp_api_key)
+            mock_yelp.assert_called_once_with(
+                "Paris", 10, test_deps.yelp_api_key, pools=test_deps.upstream
+            )
 
     @pytest.mark.asyncio
     async def test_events_search_integration(self, test_deps):
@@ -120,7 +120,12 @@ class TestTravelAgent:
             # Should get a response about events
             assert len(result.output) > 0
             mock_events.assert_called_once_with(
-                "Paris", "2025-12-10", "2025-12-15", 8, test_deps.ticketmaster_api_key
+                "Paris",
+                "2025-12-10",
+                "2025-12-15",
+                8,
+                test_deps.ticketmaster_api_key,
+                pools=test_deps.upstream,
             )
 
     @pytest.mark.asyncio
@@ -144,3 +149,118 @@ class TestTravelAgent:
 
             # Agent should still respond, even with tool errors
             assert len(result.output) > 0
+
+
+def read_bundle(text):
+    """Split a bundle result into {section: body}."""
+    blocks = (block.partition("\n") for block in text.split("## ")[1:])
+    return {name: body.strip() for name, _, body in blocks}
+
+
+def read_rows(table, first_column):
+    """Read the rows of a compact table whose header starts with first_column."""
+    lines = table.splitlines()
+    start = next(
+        i for i, line in enumerate(lines) if line.split("|")[0] == first_column
+    )
+    header = lines[start].split("|")
+    return [dict(zip(header, line.split("|"))) for line in lines[start + 1 :]]
+
+
+class TestTripBundleSearch:
+    """Test suite for the concurrent whole-trip search tool."""
+
+    @pytest.mark.asyncio
+    async def test_bundle_runs_sections_concurrently(self, test_deps, mock_upstream):
+        """Test all upstream sections run at once and merge into tiers."""
+        import asyncio
+        from datetime import date, timedelta
+        from types import SimpleNamespace
+
+        import httpx
+
+        from travel_agent import trip_bundle_search
+
+        async def handler(request):
+            await asyncio.sleep(0.1)
+            path = request.url.path
+            if request.url.host == "api.travelpayouts.com":
+                fares = [
+                    {"price": p, "duration": d, "transfers": t}
+                    for p, d, t in ((300, 330, 0), (120, 600, 1), (210, 650, 1))
+                ]
+                return httpx.Response(200, json={"data": fares})
+            if path.endswith("auto-complete"):
+                return httpx.Response(200, json={"data": [{"id": "loc-1"}]})
+            if path.endswith("stays/search"):
+                stays = [
+                    {"name": n, "price": {"value": p}}
+                    for n, p in (("A", 90), ("B", 250), ("C", 160))
+                ]
+                return httpx.Response(200, json={"data": {"stays": stays}})
+            if request.url.host == "api.yelp.com":
+                return httpx.Response(200, json={"businesses": [{"name": "Deli"}]})
+            return httpx.Response(500)
+
+        mock_upstream.handler = handler
+        checkin = date.today() + timedelta(days=30)
+        checkout = checkin + timedelta(days=3)
+
+        started = asyncio.get_running_loop().time()
+        result = await trip_bundle_search(
+            SimpleNamespace(deps=test_deps),
+            "SFO",
+            "JFK",
+            "New York",
+            checkin.isoformat(),
+            checkout.isoformat(),
+        )
+        elapsed = asyncio.get_running_loop().time() - started
+
+        bundle = read_bundle(result)
+        flights = read_rows(bundle["flights"], "tier")
+        assert [(f["tier"], f["price"]) for f in flights] == [
+            ("value", "120"),
+            ("premium", "300"),
+        ]
+        # 210 is slower and pricier than 120 with as many stops
+        assert bundle["flights"].startswith("2 of 3 offers")
+        hotels = {h["tier"]: h["name"] for h in read_rows(bundle["hotels"], "tier")}
+        assert hotels["value"] == "A"
+        assert hotels["premium"] == "B"
+        assert read_rows(bundle["restaurants"], "name")[0]["name"] == "Deli"
+        assert bundle["events"].startswith("No events found for New York")
+        # hotels need two sequential calls; everything else overlaps
+        assert elapsed < 0.35
+
+    @pytest.mark.asyncio
+    async def test_bundle_reports_failed_sections(self, test_deps, mock_upstream):
+        """Test a failing section is reported without losing the others."""
+        from types import SimpleNamespace
+
+        import httpx
+
+        from travel_agent import trip_bundle_search
+
+        def handler(request):
+            if request.url.host == "api.travelpayouts.com":
+                return httpx.Response(503)
+            return httpx.Response(200, json={})
+
+        mock_upstream.handler = handler
+
+        result = read_bundle(
+            await trip_bundle_search(
+                SimpleNamespace(deps=test_deps),
+                "SFO",
+                "JFK",
+                "New York",
+                "2025-01-01",
+                include_events=False,
+            )
+        )
+
+        assert result["flights"].startswith("error:")
+        assert "return_date" in result["hotels"]
+        assert result["restaurants"] == "No restaurants found for New York."
+        assert "events" not in result
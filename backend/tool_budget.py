@@ -0,0 +1,174 @@
+"""
+Tool Budget - Token limits for tool results fed back into the agent.
+
+Every tool result goes straight into the model context for the rest of the
+turn, so one verbose upstream response (50 restaurants, a large events
+page) can spike prompt size and latency. Each registered tool is wrapped
+so its result is cut to a per-tool token limit and to what is left of a
+per-turn budget shared by all tool calls in the turn.
+
+Results are tables (see tools/tool_format.py), so cuts are made on whole
+lines: the note and header are kept, trailing rows are dropped and
+replaced by a line saying how many were omitted. Truncations are counted
+per tool and reported by `/tools/stats`.
+"""
+
+import functools
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from context_builder import estimate_tokens, truncate_to_tokens
+
+# A result is never cut below this, so the model always learns what the
+# tool found even when the turn budget is spent
+MIN_RESULT_TOKENS = 40
+
+# Tools whose results may exceed the default per-tool limit
+DEFAULT_TOOL_TOKENS = {"trip_bundle_search": 1200}
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """Parse 'tool=tokens,tool=tokens' into a dict, skipping bad entries."""
+    limits = {}
+    for item in spec.split(","):
+        name, _, tokens = item.partition("=")
+        if name.strip() and tokens.strip().isdigit():
+            limits[name.strip()] = int(tokens)
+    return limits
+
+
+@dataclass
+class ToolBudget:
+    """Token limits for tool results."""
+
+    per_tool_tokens: int = 600
+    per_turn_tokens: int = 2400
+    # Per-tool overrides of per_tool_tokens
+    tool_tokens: Dict[str, int] = field(
+        default_factory=lambda: dict(DEFAULT_TOOL_TOKENS)
+    )
+
+    @classmethod
+    def from_env(cls) -> "ToolBudget":
+        """Create the tool budget from environment variables."""
+        return cls(
+            per_tool_tokens=int(os.getenv("TOOL_RESULT_TOKENS", "600")),
+            per_turn_tokens=int(os.getenv("TOOL_TURN_TOKENS", "2400")),
+            tool_tokens={
+                **DEFAULT_TOOL_TOKENS,
+                **_parse_limits(os.getenv("TOOL_RESULT_TOKEN_LIMITS", "")),
+            },
+        )
+
+    def limit_for(self, tool: str) -> int:
+        return self.tool_tokens.get(tool, self.per_tool_tokens)
+
+
+def truncate_result(text: str, max_tokens: int) -> str:
+    """
+    Cut a tool result to roughly max_tokens on line boundaries, ending with
+    a note of how many lines were dropped.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = text.split("\n")
+    kept, used = [], 0
+    for line in lines:
+        # Leave room for the omission note on the last line
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens - 10:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        return truncate_to_tokens(lines[0], max_tokens)
+    omitted = len(lines) - len(kept)
+    kept.append(f"… {omitted} more lines omitted (token budget)")
+    return "\n".join(kept)
+
+
+@dataclass
+class ToolResultStats:
+    """Size and truncation counters for one tool."""
+
+    calls: int = 0
+    truncated: int = 0
+    # Truncations forced by the shared turn budget, not the tool's own limit
+    turn_limited: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+
+class ToolBudgetMetrics:
+    """Process-wide tool result counters, keyed by tool name."""
+
+    def __init__(self):
+        self.tools: Dict[str, ToolResultStats] = {}
+
+    def record(
+        self,
+        tool: str,
+        tokens_in: int,
+        tokens_out: int,
+        truncated: bool,
+        turn_limited: bool,
+    ) -> None:
+        stats = self.tools.setdefault(tool, ToolResultStats())
+        stats.calls += 1
+        stats.tokens_in += tokens_in
+        stats.tokens_out += tokens_out
+        if truncated:
+            stats.truncated += 1
+            stats.turn_limited += int(turn_limited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {tool: asdict(stats) for tool, stats in self.tools.items()}
+
+
+tool_budget_metrics = ToolBudgetMetrics()
+
+_budget: Optional[ToolBudget] = None
+
+
+def get_tool_budget() -> ToolBudget:
+    """Return the process-wide tool budget, read from the environment once."""
+    global _budget
+    if _budget is None:
+        _budget = ToolBudget.from_env()
+    return _budget
+
+
+def budgeted(tool: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+    """
+    Wrap a `(ctx, ...) -> str` agent tool so its result respects the tool
+    and turn budgets. The turn's running total is kept on `ctx.deps`, which
+    is created fresh for every chat turn.
+    """
+    name = tool.__name__
+
+    @functools.wraps(tool)
+    async def wrapper(ctx, *args, **kwargs):
+        result = await tool(ctx, *args, **kwargs)
+        if not isinstance(result, str):
+            return result
+
+        budget = get_tool_budget()
+        deps = ctx.deps
+        remaining = budget.per_turn_tokens - deps.tool_tokens_used
+        tool_limit = budget.limit_for(name)
+        limit = max(min(tool_limit, remaining), MIN_RESULT_TOKENS)
+
+        cut = truncate_result(result, limit)
+        tokens_out = estimate_tokens(cut)
+        deps.tool_tokens_used += tokens_out
+        tool_budget_metrics.record(
+            name,
+            estimate_tokens(result),
+            tokens_out,
+            truncated=cut is not result,
+            turn_limited=limit < tool_limit,
+        )
+        return cut
+
+    return wrapper
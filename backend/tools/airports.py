@@ -0,0 +1,282 @@
+"""
+airports.py — Offline airport / metro-code lookup.
+
+The flight tools need IATA codes, but users talk about cities. A bundled
+dataset (`data/airports.csv`) is loaded once into an in-memory index so
+"San Francisco", "kennedy" or "sanfrancisco" resolve to a code without a
+network call or an extra LLM turn:
+
+- exact matches on codes, city names, airport names and name words,
+- a prefix trie for partial input ("san fr" -> SFO), and
+- fuzzy matching (difflib) as a last resort for typos.
+
+Cities with several airports also have a metro code (NYC, LON, TYO, ...),
+which Travelpayouts accepts as an origin/destination and which is preferred
+when the query names the city.
+
+Airports are also bucketed into a coarse lat/lon grid so `nearby` can find
+alternative airports within a radius (OAK/SJC for SFO) by scanning only
+the few cells the radius touches.
+"""
+
+import csv
+import difflib
+import math
+import os
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic_ai import RunContext
+
+from agent_dependencies import TravelDependencies
+from tools.location_cache import normalize_city
+from tools.tool_format import format_table
+
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "airports.csv"
+)
+
+# Name words too common to identify an airport on their own
+_STOPWORDS = {"international", "airport", "airports", "all", "regional", "the"}
+_CODE = re.compile(r"^[A-Za-z]{3}$")
+_FUZZY_CUTOFF = 0.8
+
+EARTH_RADIUS_KM = 6371.0
+GRID_CELL_DEGREES = 1.0
+_KM_PER_DEGREE = 111.2
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(lat: float, lon: float) -> Tuple[int, int]:
+    return (
+        math.floor(lat / GRID_CELL_DEGREES),
+        math.floor(lon / GRID_CELL_DEGREES) % int(360 / GRID_CELL_DEGREES),
+    )
+
+
+@dataclass(frozen=True)
+class Airport:
+    """One airport or metropolitan-area code from the bundled dataset."""
+
+    code: str
+    kind: str  # "airport" or "metro"
+    name: str
+    city: str
+    country: str
+    lat: float
+    lon: float
+    metro: Optional[str] = None
+    # Position in the dataset; busier airports are listed first
+    rank: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        del data["rank"]
+        return data
+
+
+class _TrieNode:
+    __slots__ = ("children", "codes")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.codes: Set[str] = set()
+
+
+class AirportIndex:
+    """In-memory exact/prefix/fuzzy index over airport names and cities."""
+
+    def __init__(self, airports: List[Airport]):
+        self.airports: Dict[str, Airport] = {a.code: a for a in airports}
+        self._keys: Dict[str, Set[str]] = {}
+        self._root = _TrieNode()
+        self._grid: Dict[Tuple[int, int], List[Airport]] = {}
+        for airport in airports:
+            for key in self._index_keys(airport):
+                self._add(key, airport.code)
+            if airport.kind == "airport":
+                self._grid.setdefault(_cell(airport.lat, airport.lon), []).append(
+                    airport
+                )
+
+    @classmethod
+    def load(cls, path: str = DATA_PATH) -> "AirportIndex":
+        """Load the index from a CSV file in the bundled format."""
+        with open(path, newline="", encoding="utf-8") as f:
+            airports = [
+                Airport(
+                    code=row["code"],
+                    kind=row["kind"],
+                    name=row["name"],
+                    city=row["city"],
+                    country=row["country"],
+                    lat=float(row["lat"]),
+                    lon=float(row["lon"]),
+                    metro=row["metro"] or None,
+                    rank=rank,
+                )
+                for rank, row in enumerate(csv.DictReader(f))
+            ]
+        return cls(airports)
+
+    def __len__(self) -> int:
+        return len(self.airports)
+
+    @staticmethod
+    def _index_keys(airport: Airport) -> Set[str]:
+        city = normalize_city(airport.city)
+        name = normalize_city(airport.name)
+        keys = {airport.code.casefold(), city, name, f"{city} {name}"}
+        keys.update(w for w in name.split() if len(w) > 2 and w not in _STOPWORDS)
+        return keys
+
+    def _add(self, key: str, code: str) -> None:
+        self._keys.setdefault(key, set()).add(code)
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        node.codes.add(code)
+
+    def _prefix(self, prefix: str) -> Set[str]:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        codes: Set[str] = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            codes |= node.codes
+            stack.extend(node.children.values())
+        return codes
+
+    def _ranked(self, codes: Set[str]) -> List[Airport]:
+        # Metro codes first (they cover every airport in the city), then by
+        # dataset order.
+        airports = (self.airports[c] for c in codes)
+        return sorted(airports, key=lambda a: (a.kind != "metro", a.rank))
+
+    def get(self, code: str) -> Optional[Airport]:
+        return self.airports.get(code.strip().upper())
+
+    def search(self, query: str, limit: int = 5) -> List[Airport]:
+        """Return the best matches for a code, city or airport name."""
+        key = normalize_city(query)
+        if not key:
+            return []
+
+        results: List[Airport] = []
+        seen: Set[str] = set()
+
+        def extend(codes: Set[str]) -> None:
+            for airport in self._ranked(codes - seen):
+                seen.add(airport.code)
+                results.append(airport)
+
+        extend(self._keys.get(key, set()))
+        if len(results) < limit:
+            extend(self._prefix(key))
+        if not results and "," in query:
+            # "Paris, France" -> "Paris"
+            return self.search(query.split(",", 1)[0], limit)
+        if not results:
+            for close in difflib.get_close_matches(
+                key, self._keys, n=limit, cutoff=_FUZZY_CUTOFF
+            ):
+                extend(self._keys[close])
+        return results[:limit]
+
+    def nearby(
+        self, code: str, radius_km: float = 100.0, limit: int = 5
+    ) -> List[Tuple[Airport, float]]:
+        """
+        Return (airport, distance_km) for other airports within radius_km of
+        the given airport or metro code, nearest first. Airports belonging
+        to a metro code are excluded when searching from that metro.
+        """
+        center = self.get(code)
+        if center is None:
+            return []
+
+        lat_cells = math.ceil(radius_km / _KM_PER_DEGREE / GRID_CELL_DEGREES)
+        # Longitude degrees shrink towards the poles
+        cos_lat = max(math.cos(math.radians(center.lat)), 0.01)
+        lon_cells = math.ceil(
+            radius_km / (_KM_PER_DEGREE * cos_lat) / GRID_CELL_DEGREES
+        )
+        lon_cells = min(lon_cells, int(180 / GRID_CELL_DEGREES))
+        row, col = _cell(center.lat, center.lon)
+        wrap = int(360 / GRID_CELL_DEGREES)
+
+        found: List[Tuple[Airport, float]] = []
+        for dr in range(-lat_cells, lat_cells + 1):
+            for dc in range(-lon_cells, lon_cells + 1):
+                for airport in self._grid.get((row + dr, (col + dc) % wrap), ()):
+                    if airport.code == center.code or (
+                        center.kind == "metro" and airport.metro == center.code
+                    ):
+                        continue
+                    distance = haversine_km(
+                        center.lat, center.lon, airport.lat, airport.lon
+                    )
+                    if distance <= radius_km:
+                        found.append((airport, distance))
+        found.sort(key=lambda item: item[1])
+        return found[:limit]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """
+        Resolve free text to one IATA code. Known codes pass through, and
+        any other three-letter code is assumed to be valid upstream.
+        """
+        query = query.strip()
+        if _CODE.match(query) and (query.upper() in self.airports or query.isupper()):
+            return query.upper()
+        matches = self.search(query, limit=1)
+        if matches:
+            return matches[0].code
+        return query.upper() if _CODE.match(query) else None
+
+
+_airport_index: Optional[AirportIndex] = None
+
+
+def get_airport_index() -> AirportIndex:
+    """Return the process-wide airport index, loading it on first use."""
+    global _airport_index
+    if _airport_index is None:
+        _airport_index = AirportIndex.load()
+    return _airport_index
+
+
+def resolve_airport_code(query: str) -> Optional[str]:
+    """Resolve a city, airport name or code to an IATA code (None if unknown)."""
+    return get_airport_index().resolve(query)
+
+
+async def airport_lookup_tool(
+    ctx: RunContext[TravelDependencies], query: str, limit: int = 5
+) -> str:
+    """
+    Find IATA airport or metro codes for a city or airport name, e.g.
+    'San Francisco' -> SFO, 'London' -> LON (all London airports).
+    """
+    matches = get_airport_index().search(query, limit=limit)
+    if not matches:
+        return f"No airports found for '{query}'."
+    return format_table(
+        [a.as_dict() for a in matches], ("code", "kind", "name", "city", "country")
+    )
@@ -0,0 +1,206 @@
+"""
+cache.py — Small in-process caches shared by the upstream tools.
+
+`LRUCache` is a bounded, TTL-aware least-recently-used map with hit/miss
+counters. `StaleWhileRevalidateCache` builds on it for upstream responses
+that may be served slightly out of date while a background task refreshes
+them. Tools layer their own persistence or refresh policies on top.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for one cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_ratio": round(self.hit_ratio, 4)}
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with optional per-entry expiry."""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self._data: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss or expiry."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(
+        self, key: Hashable, value: Any, expires_at: Optional[float] = None
+    ) -> None:
+        """Store a value, expiring at `expires_at` or after the default TTL."""
+        if expires_at is None and self.ttl is not None:
+            expires_at = self.clock() + self.ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+@dataclass
+class SWRStats(CacheStats):
+    """Counters for a stale-while-revalidate cache."""
+
+    stale_hits: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+    # Fetched values `cacheable` refused to store
+    rejected: int = 0
+
+
+class StaleWhileRevalidateCache:
+    """
+    Async response cache with a freshness window and a stale window.
+
+    Fresh entries are returned as-is. Stale entries are returned immediately
+    while one background task per key fetches a replacement. Entries older
+    than both windows are refetched inline.
+
+    Only values `cacheable` accepts are stored; others (e.g. an upstream
+    error payload) are returned to the caller but never served from cache.
+    Failed refreshes keep the stale value and are counted in `stats`, which
+    /metrics exports.
+    """
+
+    def __init__(
+        self,
+        fresh_for: float = 300.0,
+        stale_for: float = 1800.0,
+        maxsize: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ):
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.clock = clock
+        self.cacheable = cacheable
+        self.stats = SWRStats()
+        self._entries = LRUCache(maxsize=maxsize, clock=clock)
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value for key, fetching or refreshing as needed."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = self.clock() - fetched_at
+            if age < self.fresh_for:
+                self.stats.hits += 1
+                return value
+            if age < self.fresh_for + self.stale_for:
+                self.stats.hits += 1
+                self.stats.stale_hits += 1
+                self._schedule_refresh(key, fetch)
+                return value
+
+        self.stats.misses += 1
+        value = await fetch()
+        self._store(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: Any) -> bool:
+        if not self.cacheable(value):
+            self.stats.rejected += 1
+            return False
+        self._entries.set(
+            key,
+            (self.clock(), value),
+            expires_at=self.clock() + self.fresh_for + self.stale_for,
+        )
+        return True
+
+    def _schedule_refresh(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            # On failure the stale value keeps being served and the next
+            # stale hit retries
+            try:
+                if self._store(key, await fetch()):
+                    self.stats.refreshes += 1
+                else:
+                    self.stats.refresh_errors += 1
+            except Exception:
+                self.stats.refresh_errors += 1
+            finally:
+                self._refreshing.pop(key, None)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self) -> None:
+        """Wait for in-flight background refreshes (used on shutdown/tests)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats.as_dict(),
+            "entries": len(self._entries),
+            "refreshing": len(self._refreshing),
+            "fresh_for": self.fresh_for,
+            "stale_for": self.stale_for,
+        }
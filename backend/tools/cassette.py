@@ -0,0 +1,211 @@
+"""
+cassette.py — Record/replay of upstream API traffic.
+
+Performance work and regression tests need the backend to run without live
+API keys. `CassetteTransport` is an httpx transport that `UpstreamPools`
+uses in place of the network:
+
+- record: requests go to the real service and every response is written
+  to a cassette file (one JSON file per upstream host);
+- replay: responses are served from the cassettes after a simulated
+  latency, so the whole backend runs offline and deterministically.
+
+Requests are matched on method, host, path and query. Credentials (API key
+and token params, auth headers) are never part of the key or the file, so
+cassettes recorded with one key replay under any other. In replay mode
+with match="path", a request whose exact query was never recorded falls
+back to the first recording for the same path, e.g. to load-test dates
+that were not captured.
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+MODES = ("off", "record", "replay")
+
+# Query params carrying credentials; dropped from keys and cassettes
+SECRET_PARAMS = frozenset({"token", "apikey", "api_key", "key", "marker"})
+
+# Only these response headers are worth replaying
+KEPT_HEADERS = ("content-type",)
+
+RequestKey = Tuple[str, str, str, str]
+
+
+def request_key(request: httpx.Request) -> RequestKey:
+    """Credential-free key identifying an upstream request."""
+    query = sorted(
+        (k, v) for k, v in request.url.params.multi_items() if k not in SECRET_PARAMS
+    )
+    encoded = "&".join(f"{k}={v}" for k, v in query)
+    return request.method, request.url.host, request.url.path, encoded
+
+
+@dataclass
+class CassetteStats:
+    """Counters for recorded and replayed requests."""
+
+    recorded: int = 0
+    replayed: int = 0
+    path_fallbacks: int = 0
+    misses: int = 0
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records upstream responses or replays them."""
+
+    def __init__(
+        self,
+        directory: str,
+        mode: str = "replay",
+        latency: Optional[float] = None,
+        match: str = "exact",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        # Seconds per replayed response; None replays the recorded latency
+        self.latency = latency
+        self.match = match
+        self.stats = CassetteStats()
+        self._transport = transport
+        self._entries: Dict[RequestKey, Dict[str, Any]] = {}
+        self._by_path: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._load()
+
+    @classmethod
+    def from_env(
+        cls, transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> Optional["CassetteTransport"]:
+        """Create the transport from environment variables (None when off)."""
+        mode = os.getenv("UPSTREAM_MODE", "off")
+        if mode not in MODES:
+            raise ValueError(f"UPSTREAM_MODE must be one of {MODES}, got {mode!r}")
+        if mode == "off":
+            return None
+        latency = os.getenv("UPSTREAM_REPLAY_LATENCY_MS", "recorded")
+        return cls(
+            os.getenv("UPSTREAM_CASSETTE_DIR", ".cache/cassettes"),
+            mode=mode,
+            latency=None if latency == "recorded" else float(latency) / 1000,
+            match=os.getenv("UPSTREAM_REPLAY_MATCH", "exact"),
+            transport=transport,
+        )
+
+    def _path(self, host: str) -> str:
+        return os.path.join(self.directory, f"{host}.json")
+
+    def _load(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                for entry in json.load(f).get("interactions", []):
+                    self._add(entry)
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        request = entry["request"]
+        key = (request["method"], request["host"], request["path"], request["query"])
+        self._entries[key] = entry
+        self._by_path.setdefault(key[:3], entry)
+
+    def _save(self, host: str) -> None:
+        interactions: List[Dict[str, Any]] = [
+            entry for key, entry in self._entries.items() if key[1] == host
+        ]
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(host)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"interactions": interactions}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _upstream(self) -> httpx.AsyncBaseTransport:
+        if self._transport is None:
+            self._transport = httpx.AsyncHTTPTransport()
+        return self._transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "record":
+            return await self._record(request)
+        return await self._replay(request)
+
+    async def _record(self, request: httpx.Request) -> httpx.Response:
+        # Ask for an unencoded body so the cassette holds plain text
+        request.headers["Accept-Encoding"] = "identity"
+        started = time.perf_counter()
+        response = await self._upstream().handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        elapsed = time.perf_counter() - started
+
+        method, host, path, query = request_key(request)
+        headers = {
+            h: response.headers[h] for h in KEPT_HEADERS if h in response.headers
+        }
+        entry = {
+            "request": {"method": method, "host": host, "path": path, "query": query},
+            "response": {
+                "status": response.status_code,
+                "headers": headers,
+                "body": body.decode("utf-8", errors="replace"),
+                "elapsed_ms": round(elapsed * 1000, 1),
+            },
+        }
+        # No await between these, so concurrent recordings cannot interleave
+        self._add(entry)
+        self._save(host)
+        self.stats.recorded += 1
+        return httpx.Response(response.status_code, headers=headers, content=body)
+
+    async def _replay(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        entry = self._entries.get(key)
+        if entry is None and self.match == "path":
+            entry = self._by_path.get(key[:3])
+            if entry is not None:
+                self.stats.path_fallbacks += 1
+        if entry is None:
+            self.stats.misses += 1
+            print(f"No cassette entry for {key[0]} {key[1]}{key[2]}?{key[3]}")
+            return httpx.Response(404, json={"error": "no cassette entry"})
+
+        recorded = entry["response"]
+        delay = self.latency
+        if delay is None:
+            delay = recorded.get("elapsed_ms", 0) / 1000
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.stats.replayed += 1
+        return httpx.Response(
+            recorded["status"],
+            headers=recorded.get("headers", {}),
+            content=recorded["body"].encode("utf-8"),
+        )
+
+    async def aclose(self) -> None:
+        # Every pooled client closes the shared transport; a later request
+        # opens a fresh upstream transport
+        transport, self._transport = self._transport, None
+        if transport is not None:
+            await transport.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "directory": self.directory,
+            "entries": len(self._entries),
+            **asdict(self.stats),
+        }
@@ -1,30 +1,110 @@
+import asyncio
 import os
 import sys
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-import requests
+import httpx
 from pydantic import BaseModel, Field
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pydantic_ai import RunContext
 
 from agent_dependencies import TravelDependencies
+from tools import http_client, singleflight
+from tools.airports import get_airport_index, resolve_airport_code
+from tools.cache import StaleWhileRevalidateCache
+from tools.ranking import rank_flights
+from tools.tool_format import flatten_tiers, format_table
 
 AVIASALES_BASE = "https://www.aviasales.com"
 BASE_URL = "https://api.travelpayouts.com/aviasales/v3/prices_for_dates"
 
+# Flexible-date searches: widest allowed ±N window and concurrent requests
+MAX_FLEX_DAYS = 3
+FLEX_SEARCH_CONCURRENCY = int(os.getenv("FLEX_SEARCH_CONCURRENCY", "6"))
+
+# Nearby-airport fan-out: search radius, airports per side (including the
+# requested one) and the cap on origin x destination pairs searched
+NEARBY_RADIUS_KM = float(os.getenv("NEARBY_AIRPORT_RADIUS_KM", "100"))
+NEARBY_MAX_AIRPORTS = int(os.getenv("NEARBY_MAX_AIRPORTS", "3"))
+NEARBY_MAX_PAIRS = int(os.getenv("NEARBY_MAX_PAIRS", "6"))
+
+_fare_cache: Optional[StaleWhileRevalidateCache] = None
+
+
+def get_fare_cache() -> StaleWhileRevalidateCache:
+    """
+    Return the process-wide fare cache. Fares are fresh for
+    FARE_CACHE_FRESH_SECONDS and then served stale (with a background
+    refresh) for another FARE_CACHE_STALE_SECONDS.
+    """
+    global _fare_cache
+    if _fare_cache is None:
+        _fare_cache = StaleWhileRevalidateCache(
+            fresh_for=float(os.getenv("FARE_CACHE_FRESH_SECONDS", "300")),
+            stale_for=float(os.getenv("FARE_CACHE_STALE_SECONDS", "1800")),
+            maxsize=int(os.getenv("FARE_CACHE_SIZE", "1024")),
+            cacheable=fares_succeeded,
+        )
+    return _fare_cache
+
+
+def fares_succeeded(raw: Any) -> bool:
+    """
+    Whether a Travelpayouts response is worth caching. Errors can arrive
+    with HTTP 200 and `"success": false`; a body without the flag counts as
+    successful.
+    """
+    return isinstance(raw, dict) and raw.get("success", True) is not False
 
-def search_flights(
+
+async def search_flights(
     origin: str,
     destination: str,
     departure_date: str,
     return_date: Optional[str] = None,
     currency: str = "USD",
     travelpayouts_token: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
 ) -> Dict[str, Any]:
     if not travelpayouts_token:
         raise ValueError("TRAVELPAYOUTS_TOKEN environment variable is not set.")
 
+    key = (
+        origin.upper(),
+        destination.upper(),
+        departure_date,
+        return_date,
+        currency.upper(),
+    )
+
+    async def fetch() -> Dict[str, Any]:
+        return await _fetch_flights(
+            origin,
+            destination,
+            departure_date,
+            return_date,
+            currency,
+            travelpayouts_token,
+            pools,
+        )
+
+    # Concurrent cache misses for the same route share one upstream call.
+    return await get_fare_cache().get_or_fetch(
+        key, lambda: singleflight.group("flights").do(key, fetch)
+    )
+
+
+async def _fetch_flights(
+    origin: str,
+    destination: str,
+    departure_date: str,
+    return_date: Optional[str],
+    currency: str,
+    travelpayouts_token: str,
+    pools: Optional[http_client.UpstreamPools],
+) -> Dict[str, Any]:
     params = {
         "origin": origin,
         "destination": destination,
@@ -34,13 +114,13 @@ def search_flights(
         "token": travelpayouts_token,
     }
 
-    resp = requests.get(BASE_URL, params=params)
+    resp = await http_client.get(BASE_URL, params=params, pools=pools)
     resp.raise_for_status()
     return resp.json()
 
 
 def summarize_flights(raw: Dict[str, Any], limit: int = 3) -> List[Dict[str, Any]]:
-    flights = raw.get("data", [])
+    flights = raw.get("data") or []
     summaries = []
 
     for f in flights[:limit]:
@@ -52,6 +132,8 @@ def summarize_flights(raw: Dict[str, Any], limit: int = 3) -> List[Dict[str, Any
                 "airline": f.get("airline"),
                 "departure_at": f.get("departure_at"),
                 "return_at": f.get("return_at"),
+                "duration": f.get("duration"),
+                "stops": f.get("transfers"),
             }
         )
     return summaries
@@ -73,11 +155,243 @@ def build_booking_url(partial_link: str, travelpayouts_marker: str = "") -> str:
     return url
 
 
+def validate_flight_dates(
+    departure_date: str, return_date: Optional[str] = None
+) -> bool:
+    """
+    Validate that dates are YYYY-MM-DD and the return is not before departure.
+    Returns True if valid, raises ValueError if invalid.
+    """
+    dates = {"departure": departure_date, "return": return_date}
+    parsed = {}
+    for name, value in dates.items():
+        if value is None:
+            continue
+        try:
+            parsed[name] = datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(
+                f"Invalid {name} date '{value}'. Use YYYY-MM-DD format."
+            ) from None
+    if "return" in parsed and parsed["return"] < parsed["departure"]:
+        raise ValueError(
+            f"Return date {return_date} is before departure date {departure_date}."
+        )
+    return True
+
+
+def _shift(day: str, offset: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=offset)).isoformat()
+
+
+async def _search_many(
+    routes: List[Tuple[str, str, str, Optional[str]]],
+    currency: str,
+    travelpayouts_token: str,
+    pools: Optional[http_client.UpstreamPools],
+    max_concurrency: int,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search several (origin, destination, depart, return) routes concurrently,
+    at most `max_concurrency` at a time. Returns the priced offers for each
+    route; a route whose request fails, times out or returns a malformed
+    body yields no offers instead of failing the batch. A missing or
+    rejected token raises ValueError.
+    """
+    if not travelpayouts_token:
+        raise ValueError("TRAVELPAYOUTS_TOKEN environment variable is not set.")
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def offers(
+        route: Tuple[str, str, str, Optional[str]],
+    ) -> List[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                raw = await search_flights(
+                    *route, currency, travelpayouts_token, pools=pools
+                )
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in (401, 403):
+                    raise ValueError(
+                        "Travelpayouts rejected TRAVELPAYOUTS_TOKEN "
+                        f"(HTTP {e.response.status_code})."
+                    ) from e
+                print(f"Flight search failed for {route}: {e}")
+                return []
+            except (httpx.HTTPError, asyncio.TimeoutError) as e:
+                print(f"Flight search failed for {route}: {e}")
+                return []
+            except ValueError as e:
+                # Non-JSON body (JSONDecodeError is a ValueError)
+                print(f"Flight search returned a malformed body for {route}: {e}")
+                return []
+        return [
+            f
+            for f in summarize_flights(raw, limit=len(raw.get("data") or []))
+            if isinstance(f.get("price"), (int, float))
+        ]
+
+    return await asyncio.gather(*(offers(r) for r in routes))
+
+
+async def search_flight_matrix(
+    origin: str,
+    destination: str,
+    departure_date: str,
+    return_date: Optional[str] = None,
+    flex_days: int = 1,
+    currency: str = "USD",
+    travelpayouts_token: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
+    max_concurrency: int = FLEX_SEARCH_CONCURRENCY,
+) -> Dict[str, Any]:
+    """
+    Fetch the cheapest fare for every departure/return date within ±flex_days.
+
+    All cells are searched concurrently (at most `max_concurrency` requests
+    at once) through `search_flights`, so cached fares are reused. Returns
+    the departure and return date axes, a {(depart, return): cheapest offer}
+    map, and the cheapest price found.
+    """
+    flex_days = max(0, min(flex_days, MAX_FLEX_DAYS))
+    offsets = range(-flex_days, flex_days + 1)
+    departures = [_shift(departure_date, o) for o in offsets]
+    returns: List[Optional[str]] = (
+        [_shift(return_date, o) for o in offsets] if return_date else [None]
+    )
+
+    cells = [(d, r) for d in departures for r in returns if r is None or r > d]
+    results = await _search_many(
+        [(origin, destination, d, r) for d, r in cells],
+        currency,
+        travelpayouts_token,
+        pools,
+        max_concurrency,
+    )
+    grid = {
+        cell: min(offers, key=lambda f: f["price"])
+        for cell, offers in zip(cells, results)
+        if offers
+    }
+    best = min((o["price"] for o in grid.values()), default=None)
+    return {
+        "departures": departures,
+        "returns": returns,
+        "grid": grid,
+        "cheapest_price": best,
+    }
+
+
+def nearby_airports(
+    code: str,
+    radius_km: float = NEARBY_RADIUS_KM,
+    max_airports: int = NEARBY_MAX_AIRPORTS,
+) -> List[str]:
+    """The given code followed by the closest alternatives within radius_km."""
+    others = get_airport_index().nearby(code, radius_km, limit=max_airports - 1)
+    return [code] + [airport.code for airport, _ in others]
+
+
+async def search_nearby_flights(
+    origin: str,
+    destination: str,
+    departure_date: str,
+    return_date: Optional[str] = None,
+    currency: str = "USD",
+    travelpayouts_token: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
+    radius_km: float = NEARBY_RADIUS_KM,
+    max_airports: int = NEARBY_MAX_AIRPORTS,
+    max_pairs: int = NEARBY_MAX_PAIRS,
+    max_concurrency: int = FLEX_SEARCH_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """
+    Search the requested route plus routes from/to nearby airports and merge
+    them into one list of offers sorted by price.
+
+    Origin and destination each expand to at most `max_airports` airports
+    within `radius_km`; pairs are ordered so the requested route and the
+    closest alternatives come first, and only the first `max_pairs` are
+    searched.
+    """
+    origins = nearby_airports(origin, radius_km, max_airports)
+    destinations = nearby_airports(destination, radius_km, max_airports)
+    pairs = sorted(
+        ((o, d) for o in origins for d in destinations if o != d),
+        key=lambda p: origins.index(p[0]) + destinations.index(p[1]),
+    )[: max(1, max_pairs)]
+
+    results = await _search_many(
+        [(o, d, departure_date, return_date) for o, d in pairs],
+        currency,
+        travelpayouts_token,
+        pools,
+        max_concurrency,
+    )
+    merged = [offer for offers in results for offer in offers]
+    merged.sort(key=lambda f: f["price"])
+    return merged
+
+
+def format_price_matrix(matrix: Dict[str, Any], currency: str = "USD") -> str:
+    """
+    Render a price matrix as a compact text grid: rows are departure dates,
+    columns are return dates, '*' marks the cheapest cells and '-' means no
+    fare (or an impossible date pair).
+    """
+    grid = matrix["grid"]
+    best = matrix["cheapest_price"]
+
+    def cell(d: str, r: Optional[str]) -> str:
+        offer = grid.get((d, r))
+        if not offer:
+            return "-"
+        return f"{offer['price']}{'*' if offer['price'] == best else ''}"
+
+    returns = matrix["returns"]
+    if returns == [None]:
+        header = "depart | price"
+    else:
+        header = " | ".join(["depart\\return"] + returns)
+    lines = [f"Cheapest fares ({currency}); * = cheapest", header]
+    for d in matrix["departures"]:
+        lines.append(" | ".join([d] + [cell(d, r) for r in returns]))
+
+    for offer in grid.values():
+        if offer["price"] == best:
+            back = offer.get("return_at") or "one-way"
+            lines.append(
+                f"cheapest: {offer['departure_at']} -> {back}"
+                f" {offer['airline']} {offer['price']}"
+            )
+    return "\n".join(lines)
+
+
+def resolve_route(origin: str, destination: str) -> Union[Tuple[str, str], str]:
+    """
+    Resolve city names to IATA codes using the offline airport index.
+    Returns the (origin, destination) codes, or a message naming the place
+    that could not be resolved.
+    """
+    codes = []
+    for place in (origin, destination):
+        code = resolve_airport_code(place)
+        if code is None:
+            return (
+                f"Could not find an airport for '{place}'. "
+                "Use airport_lookup_tool or an IATA code."
+            )
+        codes.append(code)
+    return codes[0], codes[1]
+
+
 # Pydantic schemas for tools
 class FlightSearchArgs(BaseModel):
-    origin: str = Field(description="IATA code of the origin airport, e.g., 'SFO'")
+    origin: str = Field(
+        description="IATA code or city of the origin, e.g., 'SFO' or 'San Francisco'"
+    )
     destination: str = Field(
-        description="IATA code of the destination airport, e.g., 'JFK'"
+        description="IATA code or city of the destination, e.g., 'JFK' or 'New York'"
     )
     departure_date: str = Field(
         description="Departure date in 'YYYY-MM-DD', e.g., '2025-12-15'"
@@ -88,6 +402,9 @@ class FlightSearchArgs(BaseModel):
     currency: Optional[str] = Field(
         default="USD", description="Currency code, e.g., 'USD'"
     )
+    include_nearby: bool = Field(
+        default=False, description="Also search airports near origin/destination"
+    )
 
 
 class BookingURLArgs(BaseModel):
@@ -96,6 +413,30 @@ class BookingURLArgs(BaseModel):
     )
 
 
+FLIGHT_COLUMNS = (
+    "tier",
+    "origin",
+    "destination",
+    "price",
+    "airline",
+    "departure_at",
+    "return_at",
+    "duration",
+    "stops",
+)
+
+
+def format_ranked_flights(offers: List[Dict[str, Any]], currency: str) -> str:
+    """Rank offers and encode the tier picks as a compact table."""
+    # Only Pareto-optimal options, already split into tiers, reach the LLM
+    ranked = rank_flights(offers)
+    note = (
+        f"{ranked['frontier_size']} of {ranked['count']} offers on the "
+        f"price/duration/stops frontier; prices in {currency}, duration in minutes"
+    )
+    return format_table(flatten_tiers(ranked["tiers"]), FLIGHT_COLUMNS, note)
+
+
 # Standalone tool functions for direct integration with travel_agent
 
 
@@ -106,18 +447,81 @@ async def flight_search_tool(
     departure_date: str,
     return_date: Optional[str] = None,
     currency: str = "USD",
+    include_nearby: bool = False,
+) -> str:
+    """
+    Search for flights between two cities. Origin and destination may be
+    IATA codes or city/airport names. Set include_nearby to also compare
+    neighboring airports (e.g. OAK/SJC for SFO, EWR/LGA for JFK). Returns
+    value/comfort/premium picks from the price-duration-stops frontier as
+    a table with one row per pick.
+    """
+    codes = resolve_route(origin, destination)
+    if isinstance(codes, str):
+        return codes
+    origin, destination = codes
+    if include_nearby:
+        offers = await search_nearby_flights(
+            origin,
+            destination,
+            departure_date,
+            return_date,
+            currency,
+            ctx.deps.travelpayouts_token,
+            pools=ctx.deps.upstream,
+        )
+    else:
+        raw = await search_flights(
+            origin,
+            destination,
+            departure_date,
+            return_date,
+            currency,
+            ctx.deps.travelpayouts_token,
+            pools=ctx.deps.upstream,
+        )
+        offers = summarize_flights(raw, limit=len(raw.get("data") or []))
+    if not any(o.get("price") is not None for o in offers):
+        return f"No flights found for {origin}-{destination} on {departure_date}."
+    return format_ranked_flights(offers, currency)
+
+
+async def flexible_flight_search_tool(
+    ctx: RunContext[TravelDependencies],
+    origin: str,
+    destination: str,
+    departure_date: str,
+    return_date: Optional[str] = None,
+    flex_days: int = 1,
+    currency: str = "USD",
 ) -> str:
-    """Search for flights between two cities."""
-    raw = search_flights(
+    """
+    Compare fares for departure/return dates within ±flex_days (max 3) in one
+    call, e.g. to answer "what if I leave a day earlier?". Returns a price
+    grid with the cheapest cells marked.
+    """
+    try:
+        validate_flight_dates(departure_date, return_date)
+    except ValueError as e:
+        return f"Date validation error: {e}"
+
+    codes = resolve_route(origin, destination)
+    if isinstance(codes, str):
+        return codes
+    origin, destination = codes
+    matrix = await search_flight_matrix(
         origin,
         destination,
         departure_date,
         return_date,
+        flex_days,
         currency,
         ctx.deps.travelpayouts_token,
+        pools=ctx.deps.upstream,
     )
-    flights = summarize_flights(raw, limit=5)
-    return str(flights)
+    if not matrix["grid"]:
+        return f"No fares found for {origin}-{destination} around {departure_date}."
+    return format_price_matrix(matrix, currency)
 
 
 async def build_booking_url_tool(
@@ -129,6 +533,7 @@ async def build_booking_url_tool(
 
 
 if __name__ == "__main__":
+    import asyncio
     import os
 
     from dotenv import load_dotenv
@@ -137,8 +542,10 @@ if __name__ == "__main__":
 
     deps = TravelDependencies.from_env()
     print("Testing Travelpayouts flight search…")
-    raw = search_flights(
-        "SFO", "SAN", "2025-12-15", travelpayouts_token=deps.travelpayouts_token
+    raw = asyncio.run(
+        search_flights(
+            "SFO", "SAN", "2025-12-15", travelpayouts_token=deps.travelpayouts_token
+        )
     )
     flights = raw.get("data", [])
     print("Found", len(flights), "results")
@@ -0,0 +1,340 @@
+"""
+hotel_schema.py — Learned, per-host extractors for hotel search records.
+
+Different Booking.com API versions put the same fields under different keys
+(`name`/`hotelName`, `price.value`/`priceBreakdown.grossPrice.value`, ...).
+Rather than probing every alternative on every record, the shape is
+detected once from a small sample, compiled into an extractor of fixed key
+paths, and cached per RapidAPI host (which carries the API version, e.g.
+booking-com18).
+
+Each response's first records are checked against the cached extractor.
+The shape is re-detected when a required field (name, price) comes back
+empty for most of them, or when an optional field (rating, distance, ...)
+is filled far less often than its learned baseline, the running fill rate
+since its path was learned. Optional fields that are legitimately sparse
+therefore never force a re-detection. A different shape is reported as
+drift and replaces the cached one. Fields the re-detection still finds in
+no sampled record are reported instead of silently yielding `None` for
+every hotel, and a response with no recognizable price field is counted
+separately.
+"""
+
+from dataclasses import asdict, dataclass, fields
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Path = Tuple[str, ...]
+
+_PRICE_CONTAINERS = ("price", "priceBreakdown")
+_PRICE_FIELDS = ("value", "price", "grossPrice", "amountRounded")
+
+NAME_PATHS: List[Path] = [("name",), ("hotelName",)]
+# A price field may hold the number itself or a {"value"/"amount": n} dict
+PRICE_PATHS: List[Path] = [
+    (container, field, *leaf)
+    for container in _PRICE_CONTAINERS
+    for field in _PRICE_FIELDS
+    for leaf in ((), ("value",), ("amount",))
+]
+CURRENCY_PATHS: List[Path] = [
+    (container, field)
+    for container in _PRICE_CONTAINERS
+    for field in ("currency", "currencyCode")
+]
+RATING_PATHS: List[Path] = [("rating",), ("reviewScore",)]
+ADDRESS_PATHS: List[Path] = [("address",), ("location",)]
+LINK_PATHS: List[Path] = [("url",), ("bookingUrl",)]
+DISTANCE_PATHS: List[Path] = [("distance",), ("distanceFromCenter",)]
+
+
+def _get_path(record: Dict[str, Any], path: Path) -> Any:
+    value: Any = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _first_path(
+    sample: List[Dict[str, Any]],
+    paths: List[Path],
+    accept: Callable[[Any], bool] = lambda v: v is not None,
+) -> Optional[Path]:
+    for path in paths:
+        if any(accept(_get_path(record, path)) for record in sample):
+            return path
+    return None
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@dataclass(frozen=True)
+class HotelSchema:
+    """Key paths for each summary field in one response shape."""
+
+    name: Optional[Path] = None
+    price: Optional[Path] = None
+    currency: Optional[Path] = None
+    rating: Optional[Path] = None
+    address: Optional[Path] = None
+    link: Optional[Path] = None
+    distance: Optional[Path] = None
+
+
+def detect_schema(sample: List[Dict[str, Any]]) -> HotelSchema:
+    """Pick, for every field, the first candidate path present in the sample."""
+    return HotelSchema(
+        name=_first_path(sample, NAME_PATHS),
+        price=_first_path(sample, PRICE_PATHS, _is_number),
+        currency=_first_path(sample, CURRENCY_PATHS),
+        rating=_first_path(sample, RATING_PATHS),
+        address=_first_path(sample, ADDRESS_PATHS),
+        link=_first_path(sample, LINK_PATHS),
+        distance=_first_path(sample, DISTANCE_PATHS),
+    )
+
+
+SUMMARY_FIELDS = tuple(f.name for f in fields(HotelSchema))
+# Every usable record has these; any drop in them means a new shape
+REQUIRED_FIELDS = ("name", "price")
+
+
+def _path_getter(path: Optional[Path]) -> Callable[[Dict[str, Any]], Any]:
+    # One closure per field; nested levels are guarded so a record missing
+    # an intermediate object yields None instead of raising.
+    if path is None:
+        return lambda record: None
+    if len(path) == 1:
+        (key,) = path
+        return lambda record: record.get(key)
+    if len(path) == 2:
+        outer, key = path
+
+        def get_nested(record: Dict[str, Any]) -> Any:
+            value = record.get(outer)
+            return value.get(key) if type(value) is dict else None
+
+        return get_nested
+    first, rest = path[0], path[1:]
+
+    def get_deep(record: Dict[str, Any]) -> Any:
+        value = record.get(first)
+        for key in rest:
+            if type(value) is not dict:
+                return None
+            value = value.get(key)
+        return value
+
+    return get_deep
+
+
+def _format_address(address: Any) -> str:
+    if type(address) is dict:
+        parts = (address.get("street"), address.get("city"), address.get("country"))
+        return ", ".join(filter(None, parts))
+    if address is None:
+        return ""
+    return address if type(address) is str else str(address)
+
+
+def compile_extractor(
+    schema: HotelSchema,
+) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build a summary extractor that reads only the schema's key paths.
+
+    Each field's path is bound into a getter closure once, so a record costs
+    a handful of dict lookups instead of probing every alternative key. No
+    code is generated from the (untrusted) response shape.
+    """
+    name, price, currency, rating, address, link, distance = (
+        _path_getter(getattr(schema, field)) for field in SUMMARY_FIELDS
+    )
+
+    def extract(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": name(record),
+            "price": price(record),
+            "currency": currency(record),
+            "rating": rating(record),
+            "address": _format_address(address(record)),
+            "link": link(record),
+            "distance": distance(record),
+        }
+
+    return extract
+
+
+@dataclass
+class SchemaStats:
+    """Counters for one host's learned schema."""
+
+    detections: int = 0
+    drifts: int = 0
+    unpriced_responses: int = 0
+    incomplete_responses: int = 0
+    records: int = 0
+
+
+class _Entry:
+    __slots__ = ("schema", "getters", "extract", "stats", "missing", "fill")
+
+    def __init__(self, schema: HotelSchema, stats: SchemaStats):
+        self.schema = schema
+        # Mapped fields only; unmapped ones have nothing to check
+        self.getters = {
+            f: _path_getter(getattr(schema, f))
+            for f in SUMMARY_FIELDS
+            if getattr(schema, f) is not None
+        }
+        self.extract = compile_extractor(schema)
+        self.stats = stats
+        # Fields last reported missing from every sampled record
+        self.missing: Tuple[str, ...] = ()
+        # Per mapped field: [records filled, records sampled] since learned
+        self.fill: Dict[str, List[int]] = {f: [0, 0] for f in self.getters}
+
+    def baseline(self, field: str) -> float:
+        filled, sampled = self.fill[field]
+        return filled / sampled if sampled else 1.0
+
+    def observe(self, counts: Dict[str, int], n: int) -> None:
+        for field, filled in counts.items():
+            totals = self.fill[field]
+            totals[0] += filled
+            totals[1] += n
+
+
+def _present(field: str, value: Any) -> bool:
+    return _is_number(value) if field == "price" else value is not None
+
+
+class HotelSchemaRegistry:
+    """Cache of compiled extractors keyed by RapidAPI host."""
+
+    def __init__(self, sample_size: int = 5, drift_threshold: float = 0.5):
+        self.sample_size = sample_size
+        self.drift_threshold = drift_threshold
+        self._entries: Dict[str, _Entry] = {}
+
+    @staticmethod
+    def _fill_counts(entry: _Entry, sample: List[Dict[str, Any]]) -> Dict[str, int]:
+        # How many sampled records have each mapped field filled
+        return {
+            field: sum(1 for r in sample if _present(field, get(r)))
+            for field, get in entry.getters.items()
+        }
+
+    def _drifted(self, entry: _Entry, counts: Dict[str, int], n: int) -> bool:
+        for field, filled in counts.items():
+            if field in REQUIRED_FIELDS:
+                floor = 1.0 - self.drift_threshold
+            else:
+                floor = entry.baseline(field) - self.drift_threshold
+            if filled / n < floor:
+                return True
+        return False
+
+    def _learn(self, host: str, sample: List[Dict[str, Any]]) -> _Entry:
+        previous = self._entries.get(host)
+        stats = previous.stats if previous else SchemaStats()
+        schema = detect_schema(sample)
+        if previous is not None:
+            # A sparse field absent from this sample keeps its known path
+            schema = HotelSchema(
+                **{
+                    f: getattr(schema, f) or getattr(previous.schema, f)
+                    for f in SUMMARY_FIELDS
+                }
+            )
+        stats.detections += 1
+        if previous is not None and schema != previous.schema:
+            stats.drifts += 1
+            print(
+                f"Hotel response shape drifted for {host or 'default host'}: "
+                f"{asdict(previous.schema)} -> {asdict(schema)}"
+            )
+        entry = self._entries[host] = _Entry(schema, stats)
+        if previous is not None:
+            entry.missing = previous.missing
+            for field in entry.fill:
+                # A field read from the same path keeps its baseline
+                if getattr(schema, field) == getattr(previous.schema, field):
+                    entry.fill[field] = previous.fill.get(field, [0, 0])
+        return entry
+
+    def extract(
+        self,
+        host: str,
+        records: Iterable[Dict[str, Any]],
+        sample_size: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield summaries for records, learning or re-checking the shape from the
+        first `sample_size` records (callers that only need a few records pass
+        a smaller sample so extraction can still stop early).
+        """
+        records = iter(records)
+        sample_size = min(sample_size or self.sample_size, self.sample_size)
+        sample = list(islice(records, max(sample_size, 1)))
+        if not sample:
+            return
+
+        entry = self._entries.get(host)
+        counts = self._fill_counts(entry, sample) if entry is not None else {}
+        if entry is None or self._drifted(entry, counts, len(sample)):
+            entry = self._learn(host, sample)
+            counts = self._fill_counts(entry, sample)
+            if entry.schema.price is None:
+                entry.stats.unpriced_responses += 1
+                print(
+                    f"No price field found in hotel response from "
+                    f"{host or 'default host'}; record keys: {sorted(sample[0])}"
+                )
+            # Known fields whose key matches no candidate in any record
+            missing = tuple(f for f, filled in counts.items() if not filled)
+            if missing and missing != entry.missing:
+                print(
+                    f"Hotel response from {host or 'default host'} has no "
+                    f"{', '.join(missing)} in any sampled record; "
+                    f"record keys: {sorted(sample[0])}"
+                )
+        else:
+            # Fields already reported stay reported until they come back
+            missing = tuple(f for f in entry.missing if not counts[f])
+        if missing:
+            entry.stats.incomplete_responses += 1
+        entry.missing = missing
+        entry.observe(counts, len(sample))
+
+        extract = entry.extract
+        stats = entry.stats
+        for record in chain(sample, records):
+            stats.records += 1
+            yield extract(record)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        for host, entry in self._entries.items():
+            paths = asdict(entry.schema).items()
+            snapshot[host or "default"] = {
+                **asdict(entry.stats),
+                "schema": {f: ".".join(p) if p else None for f, p in paths},
+                "fill": {f: round(entry.baseline(f), 3) for f in entry.fill},
+            }
+        return snapshot
+
+
+_registry: Optional[HotelSchemaRegistry] = None
+
+
+def get_schema_registry() -> HotelSchemaRegistry:
+    """Return the process-wide hotel schema registry."""
+    global _registry
+    if _registry is None:
+        _registry = HotelSchemaRegistry()
+    return _registry
@@ -1,15 +1,23 @@
+import heapq
 import json
 import os
 import sys
 from datetime import date, datetime
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
 
-import requests
+import httpx
 from pydantic import BaseModel, Field
 from pydantic_ai import RunContext
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tracing
 from agent_dependencies import TravelDependencies
+from tools import http_client, singleflight
+from tools.hotel_schema import get_schema_registry
+from tools.location_cache import get_location_cache, normalize_city
+from tools.ranking import rank_hotels
+from tools.tool_format import flatten_tiers, format_table
 
 
 def validate_dates(checkin_date: str, checkout_date: str) -> bool:
@@ -39,8 +47,11 @@ def validate_dates(checkin_date: str, checkout_date: str) -> bool:
         raise
 
 
-def get_location_id(
-    city: str, hotels_rapidapi_key: str, hotels_rapidapi_host: str
+async def get_location_id(
+    city: str,
+    hotels_rapidapi_key: str,
+    hotels_rapidapi_host: str,
+    pools: Optional[http_client.UpstreamPools] = None,
 ) -> Optional[str]:
     """
     Use Booking.com 'auto-complete' endpoint to resolve a city name to a locationId.
@@ -48,10 +59,39 @@ def get_location_id(
     This takes a free-text city name (e.g., 'New York') and asks the API for
     matching locations. We then pick the first match and use its 'locationId'
     field for the main hotel search endpoint.
+
+    Resolved ids are cached per host (memory + on-disk), so repeated searches
+    for the same city skip the auto-complete round trip, and concurrent
+    lookups for the same city share one request.
     """
     if not hotels_rapidapi_key:
         raise ValueError("HOTELS_RAPIDAPI_KEY environment variable is not set.")
 
+    cache = get_location_cache()
+    cached = await cache.aget(hotels_rapidapi_host, city)
+    if cached is not None:
+        return cached
+
+    async def resolve() -> Optional[str]:
+        location_id = await _fetch_location_id(
+            city, hotels_rapidapi_key, hotels_rapidapi_host, pools
+        )
+        if location_id:
+            await cache.aset(hotels_rapidapi_host, city, location_id)
+        return location_id
+
+    key = (hotels_rapidapi_host, normalize_city(city))
+    with tracing.span("get_location_id", city=city):
+        return await singleflight.group("locations").do(key, resolve)
+
+
+async def _fetch_location_id(
+    city: str,
+    hotels_rapidapi_key: str,
+    hotels_rapidapi_host: str,
+    pools: Optional[http_client.UpstreamPools],
+) -> Optional[str]:
+    """Call /stays/auto-complete and pick the first suggestion's id."""
     headers = {
         "x-rapidapi-key": hotels_rapidapi_key,
         "x-rapidapi-host": hotels_rapidapi_host,
@@ -62,17 +102,18 @@ def get_location_id(
     }
 
     try:
-        resp = requests.get(
+        resp = await http_client.get(
             f"https://{hotels_rapidapi_host}/stays/auto-complete",
             headers=headers,
             params=params,
             timeout=30,
+            pools=pools,
         )
         resp.raise_for_status()
         data = resp.json()
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         print(f"API request failed for auto-complete: {e}")
-        if hasattr(e, "response") and e.response is not None:
+        if isinstance(e, httpx.HTTPStatusError):
             print(f"Response status: {e.response.status_code}")
             print(f"Response text: {e.response.text}")
         return None
@@ -86,37 +127,29 @@ def get_location_id(
     # We assume the first suggestion is the best match
     first = suggestions[0]
 
-    # Use the encoded 'id' field for the search API
-    encoded_id = first.get("id")
-    if encoded_id:
-        return str(encoded_id)
-
-    # Fallback to dest_id if no encoded id
-    dest_id = first.get("dest_id")
-    if dest_id:
-        return str(dest_id)
+    # Use the encoded 'id' field for the search API, falling back to dest_id
+    location_id = first.get("id") or first.get("dest_id")
 
     # If there's no location ID, return None
-    return None
+    return str(location_id) if location_id else None
 
 
-def search_hotels(
+async def _fetch_hotels(
     location_id: str,
     checkin_date: str,
     checkout_date: str,
-    adults: int = 2,
-    rooms: int = 1,
-    min_price: Optional[int] = None,
-    max_price: Optional[int] = None,
-    currency: str = "USD",
-    hotels_rapidapi_key: str = "",
-    hotels_rapidapi_host: str = "",
-) -> Dict[str, Any]:
+    adults: int,
+    rooms: int,
+    min_price: Optional[int],
+    max_price: Optional[int],
+    currency: str,
+    hotels_rapidapi_key: str,
+    hotels_rapidapi_host: str,
+    pools: Optional[http_client.UpstreamPools],
+) -> bytes:
     """
-    Call Booking.com stays/search endpoint with a locationId and date range.
-
-    This returns raw JSON from the API, which can contain hotel listings,
-    prices, ratings, etc.
+    Fetch the raw stays/search response body. Identical concurrent searches
+    share one request.
     """
     if not hotels_rapidapi_key:
         raise ValueError("HOTELS_RAPIDAPI_KEY environment variable is not set.")
@@ -143,21 +176,177 @@ def search_hotels(
     if max_price is not None:
         params["maxPrice"] = str(max_price)
 
-    try:
-        resp = requests.get(
-            f"https://{hotels_rapidapi_host}/stays/search",
-            headers=headers,
-            params=params,
-            timeout=30,
+    async def fetch() -> bytes:
+        try:
+            resp = await http_client.get(
+                f"https://{hotels_rapidapi_host}/stays/search",
+                headers=headers,
+                params=params,
+                timeout=30,
+                pools=pools,
+            )
+            resp.raise_for_status()
+            return resp.content
+        except httpx.HTTPError as e:
+            print(f"API request failed for hotel search: {e}")
+            if isinstance(e, httpx.HTTPStatusError):
+                print(f"Response status: {e.response.status_code}")
+                print(f"Response text: {e.response.text}")
+            raise
+
+    key = (hotels_rapidapi_host, tuple(sorted(params.items())))
+    return await singleflight.group("hotels").do(key, fetch)
+
+
+async def search_hotels(
+    location_id: str,
+    checkin_date: str,
+    checkout_date: str,
+    adults: int = 2,
+    rooms: int = 1,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    currency: str = "USD",
+    hotels_rapidapi_key: str = "",
+    hotels_rapidapi_host: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
+) -> Dict[str, Any]:
+    """
+    Call Booking.com stays/search endpoint with a locationId and date range.
+
+    This returns raw JSON from the API, which can contain hotel listings,
+    prices, ratings, etc. Identical concurrent searches share one request.
+    """
+    body = await _fetch_hotels(
+        location_id,
+        checkin_date,
+        checkout_date,
+        adults,
+        rooms,
+        min_price,
+        max_price,
+        currency,
+        hotels_rapidapi_key,
+        hotels_rapidapi_host,
+        pools,
+    )
+    return json.loads(body)
+
+
+async def search_hotel_summaries(
+    location_id: str,
+    checkin_date: str,
+    checkout_date: str,
+    adults: int = 2,
+    rooms: int = 1,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    currency: str = "USD",
+    hotels_rapidapi_key: str = "",
+    hotels_rapidapi_host: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
+    limit: Optional[int] = 5,
+    key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Like `search_hotels`, but parse the response into the summary records
+    `summarize_hotels` would produce, keeping at most `limit` of them (see
+    `parse_hotels`).
+    """
+    body = await _fetch_hotels(
+        location_id,
+        checkin_date,
+        checkout_date,
+        adults,
+        rooms,
+        min_price,
+        max_price,
+        currency,
+        hotels_rapidapi_key,
+        hotels_rapidapi_host,
+        pools,
+    )
+    return parse_hotels(body, limit=limit, key=key, host=hotels_rapidapi_host)
+
+
+def parse_hotels(
+    body: bytes,
+    limit: Optional[int] = 5,
+    key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    host: str = "",
+) -> List[Dict[str, Any]]:
+    """
+    Turn a stays/search response body into slim hotel summaries.
+
+    The body is decoded with a single `json.loads`. Without `key`, only the
+    first `limit` records are summarized, in response order (the API already
+    sorts by price). With `key`, every record is summarized but only the
+    `limit` smallest by key are kept, in a bounded heap. `limit=None` keeps
+    every summary.
+
+    Fields are read with the extractor learned for `host` (see
+    tools/hotel_schema.py) instead of probing alternate keys per record.
+    """
+    records = _hotel_results(json.loads(body))
+    sample = limit if key is None else None
+    summaries = get_schema_registry().extract(host, records, sample_size=sample)
+    if limit is None:
+        hotels = list(summaries)
+        return sorted(hotels, key=key) if key else hotels
+    if key is None:
+        return list(islice(summaries, limit))
+    return heapq.nsmallest(limit, summaries, key=key)
+
+
+def summarize_hotel(h: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the summary fields from one raw hotel record."""
+    name = h.get("name") or h.get("hotelName")
+    price = None
+    currency = None
+
+    price_info = h.get("price") or h.get("priceBreakdown") or {}
+    # Try common patterns for price fields
+    if isinstance(price_info, dict):
+        price = (
+            price_info.get("value")
+            or price_info.get("price")
+            or price_info.get("grossPrice")
+            or price_info.get("amountRounded")
         )
-        resp.raise_for_status()
-        return resp.json()
-    except requests.exceptions.RequestException as e:
-        print(f"API request failed for hotel search: {e}")
-        if hasattr(e, "response") and e.response is not None:
-            print(f"Response status: {e.response.status_code}")
-            print(f"Response text: {e.response.text}")
-        raise
+        currency = price_info.get("currency") or price_info.get("currencyCode")
+        # Handle case where price is a dict with amount
+        if isinstance(price, dict):
+            price = price.get("value") or price.get("amount")
+
+    rating = h.get("rating") or h.get("reviewScore")
+    address = h.get("address") or h.get("location") or {}
+    address_str = None
+    if isinstance(address, dict):
+        address_str = ", ".join(
+            filter(
+                None,
+                [
+                    address.get("street"),
+                    address.get("city"),
+                    address.get("country"),
+                ],
+            )
+        )
+    else:
+        address_str = str(address)
+
+    link = h.get("url") or h.get("bookingUrl")
+    distance = h.get("distance") or h.get("distanceFromCenter")
+
+    return {
+        "name": name,
+        "price": price,
+        "currency": currency,
+        "rating": rating,
+        "address": address_str,
+        "link": link,
+        "distance": distance,
+    }
 
 
 def summarize_hotels(raw: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
@@ -168,68 +357,20 @@ def summarize_hotels(raw: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]
     this uses common patterns. You may need to tweak the keys after you see
     a real response from your account.
     """
-    hotels: List[Dict[str, Any]] = []
+    return [summarize_hotel(h) for h in _hotel_results(raw)[:limit]]
 
+
+def _hotel_results(raw: Any) -> List[Dict[str, Any]]:
     # The hotels might live under data.hotels, data.stays, or similar.
     # Here we try a few likely places:
+    if isinstance(raw, list):
+        return raw
     data = raw.get("data") or raw
 
     # Handle case where data is already a list
     if isinstance(data, list):
-        results = data
-    else:
-        results = data.get("stays") or data.get("hotels") or data.get("results") or []
-
-    for h in results[:limit]:
-        name = h.get("name") or h.get("hotelName")
-        price = None
-        currency = None
-
-        price_info = h.get("price") or h.get("priceBreakdown") or {}
-        # Try common patterns for price fields
-        if isinstance(price_info, dict):
-            price = (
-                price_info.get("value")
-                or price_info.get("price")
-                or price_info.get("grossPrice")
-                or price_info.get("amountRounded")
-            )
-            currency = price_info.get("currency") or price_info.get("currencyCode")
-            # Handle case where price is a dict with amount
-            if isinstance(price, dict):
-                price = price.get("value") or price.get("amount")
-
-        rating = h.get("rating") or h.get("reviewScore")
-        address = h.get("address") or h.get("location") or {}
-        address_str = None
-        if isinstance(address, dict):
-            address_str = ", ".join(
-                filter(
-                    None,
-                    [
-                        address.get("street"),
-                        address.get("city"),
-                        address.get("country"),
-                    ],
-                )
-            )
-        else:
-            address_str = str(address)
-
-        link = h.get("url") or h.get("bookingUrl")
-
-        hotels.append(
-            {
-                "name": name,
-                "price": price,
-                "currency": currency,
-                "rating": rating,
-                "address": address_str,
-                "link": link,
-            }
-        )
-
-    return hotels
+        return data
+    return data.get("stays") or data.get("hotels") or data.get("results") or []
 
 
 class HotelSearchArgs(BaseModel):
@@ -253,6 +394,25 @@ class HotelSearchArgs(BaseModel):
     )
 
 
+HOTEL_COLUMNS = (
+    "tier",
+    "name",
+    "price",
+    "currency",
+    "rating",
+    "distance",
+    "address",
+    "link",
+)
+
+
+def format_ranked_hotels(hotels: List[Dict[str, Any]], per_tier: int = 2) -> str:
+    """Rank hotel summaries and encode the tier picks as a compact table."""
+    tiers = rank_hotels(hotels, per_tier=per_tier)
+    note = f"best picks of {len(hotels)} hotels"
+    return format_table(flatten_tiers(tiers), HOTEL_COLUMNS, note)
+
+
 # Standalone tool function for direct integration with travel_agent
 
 
@@ -269,7 +429,9 @@ async def hotel_search_tool(
 ) -> str:
     """
     Search for hotels in a given city and date range using the Booking.com
-    RapidAPI (booking-com18). Returns a simplified list of hotel options.
+    RapidAPI (booking-com18). Returns the best options for the value,
+    comfort and premium tiers, picked from all results, as a table with one
+    row per pick.
 
     This is analogous to your flight_search_tool but for stays/hotels.
     """
@@ -279,13 +441,16 @@ async def hotel_search_tool(
     except ValueError as e:
         return f"Date validation error: {e}"
 
-    location_id = get_location_id(
-        city, ctx.deps.hotels_rapidapi_key, ctx.deps.hotels_rapidapi_host
+    location_id = await get_location_id(
+        city,
+        ctx.deps.hotels_rapidapi_key,
+        ctx.deps.hotels_rapidapi_host,
+        pools=ctx.deps.upstream,
     )
     if not location_id:
         return f"No locationId found for city: {city}. Try a different city name."
 
-    raw = search_hotels(
+    hotels = await search_hotel_summaries(
         location_id=location_id,
         checkin_date=checkin_date,
         checkout_date=checkout_date,
@@ -296,17 +461,18 @@ async def hotel_search_tool(
         currency=currency,
         hotels_rapidapi_key=ctx.deps.hotels_rapidapi_key,
         hotels_rapidapi_host=ctx.deps.hotels_rapidapi_host,
+        pools=ctx.deps.upstream,
+        limit=None,
     )
-
-    hotels = summarize_hotels(raw, limit=5)
     if not hotels:
         return f"No hotels found for {city} between {checkin_date} and {checkout_date}."
 
-    # Return as string, like your flight_search_tool
-    return str(hotels)
+    # Every result is scored server-side; the LLM only sees the tier picks.
+    return format_ranked_hotels(hotels)
 
 
 if __name__ == "__main__":
+    import asyncio
     import os
 
     from dotenv import load_dotenv
@@ -320,23 +486,25 @@ if __name__ == "__main__":
     checkin = "2025-12-10"
     checkout = "2025-12-15"
 
-    loc_id = get_location_id(
-        test_city, deps.hotels_rapidapi_key, deps.hotels_rapidapi_host
+    loc_id = asyncio.run(
+        get_location_id(test_city, deps.hotels_rapidapi_key, deps.hotels_rapidapi_host)
     )
     print("LocationId for", test_city, ":", loc_id)
 
     if loc_id:
-        raw = search_hotels(
-            location_id=loc_id,
-            checkin_date=checkin,
-            checkout_date=checkout,
-            adults=2,
-            rooms=1,
-            min_price=0,
-            max_price=300,
-            currency="USD",
-            hotels_rapidapi_key=deps.hotels_rapidapi_key,
-            hotels_rapidapi_host=deps.hotels_rapidapi_host,
+        raw = asyncio.run(
+            search_hotels(
+                location_id=loc_id,
+                checkin_date=checkin,
+                checkout_date=checkout,
+                adults=2,
+                rooms=1,
+                min_price=0,
+                max_price=300,
+                currency="USD",
+                hotels_rapidapi_key=deps.hotels_rapidapi_key,
+                hotels_rapidapi_host=deps.hotels_rapidapi_host,
+            )
         )
 
         hotels = summarize_hotels(raw, limit=5)
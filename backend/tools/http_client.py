@@ -0,0 +1,232 @@
+"""
+http_client.py — Shared async HTTP client for every upstream travel API.
+
+All tools in backend/tools (Travelpayouts, Booking.com via RapidAPI, Yelp,
+Ticketmaster) go through this module instead of calling `requests`
+directly, so upstream I/O is awaited and never stalls the event loop that
+serves the other /chat and /chat/stream clients.
+
+Connections are pooled per upstream host by `UpstreamPools`. The server
+creates one instance in its lifespan hook, warms it up and hands it to the
+tools through `TravelDependencies.upstream`; code running outside the
+server (scripts, tests) falls back to a lazily created module default.
+
+With UPSTREAM_MODE=record or replay the pools talk to a
+`CassetteTransport` (tools/cassette.py) instead of the network, so the
+backend can run offline against recorded responses.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+import tracing
+from metrics import backend_metrics
+from tools.cassette import CassetteTransport
+
+DEFAULT_TIMEOUT = 30.0
+
+TRAVELPAYOUTS_HOST = "api.travelpayouts.com"
+YELP_HOST = "api.yelp.com"
+TICKETMASTER_HOST = "app.ticketmaster.com"
+
+
+@dataclass
+class PoolSettings:
+    """Connection pool limits applied to every upstream host."""
+
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
+    timeout: float = DEFAULT_TIMEOUT
+    warmup: bool = True
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        """Create pool settings from environment variables."""
+        return cls(
+            max_connections=int(os.getenv("UPSTREAM_POOL_SIZE", "20")),
+            max_keepalive_connections=int(os.getenv("UPSTREAM_POOL_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("UPSTREAM_POOL_IDLE_TIMEOUT", "60")),
+            timeout=float(os.getenv("UPSTREAM_TIMEOUT", str(DEFAULT_TIMEOUT))),
+            warmup=os.getenv("UPSTREAM_WARMUP", "1") not in ("0", "false", "False"),
+        )
+
+
+@dataclass
+class HostStats:
+    """Request counters for one upstream host."""
+
+    requests: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    in_flight: int = 0
+
+
+class UpstreamPools:
+    """Per-host keep-alive connection pools for upstream APIs."""
+
+    def __init__(
+        self,
+        hosts: Iterable[str] = (),
+        settings: Optional[PoolSettings] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.settings = settings or PoolSettings()
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, HostStats] = {}
+        for host in hosts:
+            if host:
+                self.client_for_host(host)
+
+    @classmethod
+    def from_env(cls, hosts: Iterable[str] = ()) -> "UpstreamPools":
+        """Create pools for the given hosts using environment settings."""
+        settings = PoolSettings.from_env()
+        transport = CassetteTransport.from_env()
+        if transport is not None:
+            # Warm-up requests would only be recorded or miss the cassette
+            settings.warmup = False
+        return cls(hosts, settings, transport)
+
+    def client_for_host(self, host: str) -> httpx.AsyncClient:
+        """Return the pooled client for a host, creating it on first use."""
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.settings.max_connections,
+                max_keepalive_connections=self.settings.max_keepalive_connections,
+                keepalive_expiry=self.settings.keepalive_expiry,
+            )
+            client = httpx.AsyncClient(
+                limits=limits,
+                timeout=self.settings.timeout,
+                transport=self._transport,
+            )
+            self._clients[host] = client
+            self._stats.setdefault(host, HostStats())
+        return client
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """Issue a GET request on the pool owning the URL's host."""
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        client = self.client_for_host(host)
+        stats = self._stats[host]
+        stats.requests += 1
+        stats.in_flight += 1
+        started = time.perf_counter()
+        # The query is left out of the span: it may carry API keys
+        attributes = {"http.method": "GET", "http.host": host, "http.path": parts.path}
+        with tracing.span(f"GET {host}{parts.path}", "http", **attributes) as span:
+            try:
+                response = await client.get(
+                    url,
+                    params=_clean_params(params),
+                    headers=headers,
+                    timeout=timeout if timeout is not None else self.settings.timeout,
+                )
+            except httpx.HTTPError as e:
+                stats.errors += 1
+                if isinstance(e, httpx.TimeoutException):
+                    stats.timeouts += 1
+                raise
+            finally:
+                stats.in_flight -= 1
+                backend_metrics.upstream.observe(time.perf_counter() - started, host)
+            if span is not None:
+                span.attributes["http.status_code"] = response.status_code
+            return response
+
+    async def warm_up(self, timeout: float = 5.0) -> None:
+        """
+        Pre-open one keep-alive connection per host so the first tool call
+        does not pay for TCP and TLS setup. Failures are ignored.
+        """
+
+        async def touch(host: str, client: httpx.AsyncClient) -> None:
+            try:
+                await client.head(f"https://{host}/", timeout=timeout)
+            except httpx.HTTPError:
+                pass
+
+        await asyncio.gather(
+            *(touch(host, client) for host, client in self._clients.items())
+        )
+
+    async def aclose(self) -> None:
+        """Close every pooled client."""
+        await asyncio.gather(*(c.aclose() for c in self._clients.values()))
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool settings and per-host connection and request counters."""
+        hosts = {}
+        for host, s in self._stats.items():
+            client = self._clients.get(host)
+            hosts[host] = {
+                "requests": s.requests,
+                "errors": s.errors,
+                "timeouts": s.timeouts,
+                "in_flight": s.in_flight,
+                "open_connections": _open_connections(client),
+            }
+        stats = {
+            "max_connections": self.settings.max_connections,
+            "max_keepalive_connections": self.settings.max_keepalive_connections,
+            "keepalive_expiry": self.settings.keepalive_expiry,
+            "hosts": hosts,
+        }
+        if isinstance(self._transport, CassetteTransport):
+            stats["cassette"] = self._transport.snapshot()
+        return stats
+
+
+def _open_connections(client: Optional[httpx.AsyncClient]) -> int:
+    # httpx does not expose pool state publicly; read it defensively.
+    transport = getattr(client, "_transport", None)
+    pool = getattr(transport, "_pool", None)
+    return len(getattr(pool, "connections", []) or [])
+
+
+def _clean_params(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # `requests` silently drops None-valued params; httpx would send "key=".
+    if params is None:
+        return None
+    return {k: v for k, v in params.items() if v is not None}
+
+
+_default_pools: Optional[UpstreamPools] = None
+
+
+def default_pools() -> UpstreamPools:
+    """Return the process-wide pools used when no app-scoped pools are given."""
+    global _default_pools
+    if _default_pools is None:
+        _default_pools = UpstreamPools.from_env()
+    return _default_pools
+
+
+async def get(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    pools: Optional[UpstreamPools] = None,
+) -> httpx.Response:
+    """Issue a non-blocking GET request against an upstream API."""
+    return await (pools or default_pools()).get(
+        url, params=params, headers=headers, timeout=timeout
+    )
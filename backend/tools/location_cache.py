@@ -0,0 +1,209 @@
+"""
+location_cache.py — Persistent city -> Booking.com locationId cache.
+
+Resolving a city through `/stays/auto-complete` costs a full upstream round
+trip before every hotel search. Resolved ids are kept in two tiers:
+
+- an in-memory LRU for the current process, and
+- a local SQLite file (WAL mode) that survives restarts and is shared by
+  every uvicorn worker on the host.
+
+Keys are normalized (case, whitespace, punctuation and common aliases such
+as "NYC" -> "new york") and scoped to the RapidAPI host, since different
+hosts issue different ids.
+
+Async callers use `aget`/`aset`, which answer memory hits inline and run the
+SQLite tier in a worker thread, so a slow disk or a locked WAL never blocks
+the event loop.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from tools.cache import CacheStats, LRUCache
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ".cache",
+    "locations.sqlite3",
+)
+DEFAULT_TTL = 30 * 24 * 3600  # locationIds are stable; refresh monthly
+
+CITY_ALIASES = {
+    "nyc": "new york",
+    "new york city": "new york",
+    "manhattan": "new york",
+    "sf": "san francisco",
+    "san fran": "san francisco",
+    "la": "los angeles",
+    "dc": "washington",
+    "washington dc": "washington",
+    "washington d c": "washington",
+    "vegas": "las vegas",
+    "philly": "philadelphia",
+    "nola": "new orleans",
+    "chi town": "chicago",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_city(city: str) -> str:
+    """Normalize a free-text city name into a stable cache key."""
+    key = _PUNCTUATION.sub(" ", city.casefold())
+    key = _WHITESPACE.sub(" ", key).strip()
+    return CITY_ALIASES.get(key, key)
+
+
+class LocationCache:
+    """Two-tier (memory LRU + SQLite) cache of resolved locationIds."""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_PATH,
+        ttl: float = DEFAULT_TTL,
+        maxsize: int = 2048,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.stats = CacheStats()
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = self._open(path)
+
+    @classmethod
+    def from_env(cls) -> "LocationCache":
+        """Create the cache from environment variables."""
+        path = os.getenv("LOCATION_CACHE_PATH", DEFAULT_PATH)
+        return cls(
+            path=path if path not in ("", ":none:") else None,
+            ttl=float(os.getenv("LOCATION_CACHE_TTL", str(DEFAULT_TTL))),
+            maxsize=int(os.getenv("LOCATION_CACHE_SIZE", "2048")),
+        )
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS location_ids ("
+            " host TEXT NOT NULL,"
+            " city_key TEXT NOT NULL,"
+            " location_id TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (host, city_key))"
+        )
+        return db
+
+    def get(self, host: str, city: str) -> Optional[str]:
+        """Return the cached locationId for a city, or None."""
+        key = (host, normalize_city(city))
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+        row = self._read_disk(key) if self._db is not None else None
+        return self._from_disk(key, row)
+
+    async def aget(self, host: str, city: str) -> Optional[str]:
+        """Like `get`, but reads the SQLite tier in a worker thread."""
+        key = (host, normalize_city(city))
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+        row = None
+        if self._db is not None:
+            row = await asyncio.to_thread(self._read_disk, key)
+        return self._from_disk(key, row)
+
+    def set(self, host: str, city: str, location_id: str) -> None:
+        """Store a resolved locationId in both tiers."""
+        key, expires_at = self._set_memory(host, city, location_id)
+        if self._db is not None:
+            self._write_disk(key, location_id, expires_at)
+
+    async def aset(self, host: str, city: str, location_id: str) -> None:
+        """Like `set`, but writes the SQLite tier in a worker thread."""
+        key, expires_at = self._set_memory(host, city, location_id)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, location_id, expires_at)
+
+    def _from_disk(
+        self, key: Tuple[str, str], row: Optional[Tuple[str, float]]
+    ) -> Optional[str]:
+        # Finish a lookup that missed memory, promoting a live disk row
+        if row is not None:
+            location_id, expires_at = row
+            if expires_at > time.time():
+                self.memory.set(key, location_id, expires_at=expires_at)
+                self.stats.hits += 1
+                self.disk_hits += 1
+                return location_id
+            self.stats.expirations += 1
+        self.stats.misses += 1
+        return None
+
+    def _set_memory(
+        self, host: str, city: str, location_id: str
+    ) -> Tuple[Tuple[str, str], float]:
+        key = (host, normalize_city(city))
+        expires_at = time.time() + self.ttl
+        self.memory.set(key, location_id, expires_at=expires_at)
+        return key, expires_at
+
+    def _read_disk(self, key: Tuple[str, str]) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT location_id, expires_at FROM location_ids"
+                " WHERE host = ? AND city_key = ?",
+                key,
+            ).fetchone()
+
+    def _write_disk(
+        self, key: Tuple[str, str], location_id: str, expires_at: float
+    ) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO location_ids"
+                " (host, city_key, location_id, expires_at) VALUES (?, ?, ?, ?)",
+                (*key, location_id, expires_at),
+            )
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM location_ids")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return hit/miss counters for both tiers."""
+        return {
+            **self.stats.as_dict(),
+            "disk_hits": self.disk_hits,
+            "memory_entries": len(self.memory),
+            "persistent": self._db is not None,
+        }
+
+
+_location_cache: Optional[LocationCache] = None
+
+
+def get_location_cache() -> LocationCache:
+    """Return the process-wide location cache, opening it on first use."""
+    global _location_cache
+    if _location_cache is None:
+        _location_cache = LocationCache.from_env()
+    return _location_cache
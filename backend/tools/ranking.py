@@ -0,0 +1,276 @@
+"""
+ranking.py — Server-side scoring and tiering of search results.
+
+Instead of handing the LLM the first few rows of a price-sorted list and
+letting it invent budget tiers, every returned hotel is scored in one pass
+over columns of price, rating and distance, and the best candidates for
+each of the Value / Comfort / Premium tiers are picked here.
+
+Hotels are split into price thirds; within each third a tier-specific
+weighting of cheapness, rating and proximity decides the picks.
+
+Flights are reduced to the Pareto frontier of (price, duration, stops): an
+option is dropped when another is no worse on all three and better on one.
+Tier picks then come from the frontier only.
+
+Scoring and the frontier are vectorized with NumPy (a declared dependency);
+a plain-Python implementation computing the same results is kept as the
+fallback when NumPy cannot be imported.
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - fallback when not installed
+    np = None
+
+TIERS = ("value", "comfort", "premium")
+
+# (cheapness, rating, proximity) weights per tier
+TIER_WEIGHTS = {
+    "value": (0.5, 0.4, 0.1),
+    "comfort": (0.2, 0.6, 0.2),
+    "premium": (0.0, 0.7, 0.3),
+}
+
+# Booking.com review scores are out of 10
+RATING_SCALE = 10.0
+
+_NUMBER = re.compile(r"[-+]?\d*\.?\d+")
+
+
+def _as_float(value: Any) -> float:
+    """Coerce a number or a string like '1.2 km' to float (NaN if absent)."""
+    if isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match:
+            return float(match.group())
+    return math.nan
+
+
+def _scores_numpy(
+    prices: Sequence[float], ratings: Sequence[float], distances: Sequence[float]
+) -> Dict[str, Any]:
+    price = np.asarray(prices, dtype=float)
+    rating = np.asarray(ratings, dtype=float)
+    distance = np.asarray(distances, dtype=float)
+
+    span = price.max() - price.min()
+    cheapness = 1.0 - (price - price.min()) / span if span > 0 else np.ones_like(price)
+
+    known = ~np.isnan(rating)
+    fill = np.median(rating[known]) if known.any() else RATING_SCALE / 2
+    rating = np.clip(np.where(known, rating, fill) / RATING_SCALE, 0.0, 1.0)
+
+    known = ~np.isnan(distance)
+    if known.any():
+        far = distance[known].max()
+        distance = np.where(known, distance, np.median(distance[known]))
+        proximity = 1.0 - distance / far if far > 0 else np.ones_like(distance)
+    else:
+        proximity = np.full_like(price, 0.5)
+
+    order = np.argsort(price, kind="stable")
+    bands = np.array_split(order, len(TIERS))
+    picks = {}
+    for tier, band in zip(TIERS, bands):
+        w_cheap, w_rating, w_near = TIER_WEIGHTS[tier]
+        score = w_cheap * cheapness + w_rating * rating + w_near * proximity
+        picks[tier] = [
+            (int(i), float(score[i]))
+            for i in band[np.argsort(-score[band], kind="stable")]
+        ]
+    return picks
+
+
+def _scores_python(
+    prices: Sequence[float], ratings: Sequence[float], distances: Sequence[float]
+) -> Dict[str, Any]:
+    def median(values: List[float]) -> float:
+        values = sorted(values)
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+    low, high = min(prices), max(prices)
+    span = high - low
+    cheapness = [1.0 - (p - low) / span if span > 0 else 1.0 for p in prices]
+
+    known = [r for r in ratings if not math.isnan(r)]
+    fill = median(known) if known else RATING_SCALE / 2
+    rating = [
+        min(max((fill if math.isnan(r) else r) / RATING_SCALE, 0.0), 1.0)
+        for r in ratings
+    ]
+
+    known = [d for d in distances if not math.isnan(d)]
+    if known:
+        far, fill = max(known), median(known)
+        proximity = [
+            1.0 - (fill if math.isnan(d) else d) / far if far > 0 else 1.0
+            for d in distances
+        ]
+    else:
+        proximity = [0.5] * len(prices)
+
+    order = sorted(range(len(prices)), key=lambda i: prices[i])
+    # Same split as numpy.array_split: the first bands take the remainder
+    size, extra = divmod(len(order), len(TIERS))
+    picks, start = {}, 0
+    for n, tier in enumerate(TIERS):
+        end = start + size + (1 if n < extra else 0)
+        w_cheap, w_rating, w_near = TIER_WEIGHTS[tier]
+        scored = [
+            (i, w_cheap * cheapness[i] + w_rating * rating[i] + w_near * proximity[i])
+            for i in order[start:end]
+        ]
+        picks[tier] = sorted(scored, key=lambda item: -item[1])
+        start = end
+    return picks
+
+
+def rank_hotels(
+    hotels: List[Dict[str, Any]], per_tier: int = 2
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Score every priced hotel and return the best `per_tier` per tier.
+
+    Each pick is the hotel summary plus its `score` (0-1). Hotels without a
+    numeric price are skipped; tiers may be empty for very short lists.
+    """
+    priced = [h for h in hotels if not math.isnan(_as_float(h.get("price")))]
+    if not priced:
+        return {tier: [] for tier in TIERS}
+
+    prices = [_as_float(h["price"]) for h in priced]
+    ratings = [_as_float(h.get("rating")) for h in priced]
+    distances = [_as_float(h.get("distance")) for h in priced]
+
+    score = _scores_numpy if np is not None else _scores_python
+    picks = score(prices, ratings, distances)
+    return {
+        tier: [{**priced[i], "score": round(s, 3)} for i, s in picks[tier][:per_tier]]
+        for tier in TIERS
+    }
+
+
+def _pareto_numpy(
+    prices: Sequence[float], durations: Sequence[float], stops: Sequence[float]
+) -> List[int]:
+    price = np.asarray(prices, dtype=float)
+    duration = np.asarray(durations, dtype=float)
+    stop = np.asarray(stops, dtype=float)
+
+    # Sorted by price (then duration, stops), every earlier option is at
+    # least as cheap. An option is dominated if some earlier option with no
+    # more stops is at least as fast: one prefix-minimum per stop level.
+    # NaN marks "no earlier option" so an unknown (infinite) duration is
+    # still kept when nothing comes before it.
+    order = np.lexsort((stop, duration, price))
+    duration, stop = duration[order], stop[order]
+    dominated = np.zeros(len(order), dtype=bool)
+    for level in np.unique(stop):
+        eligible = np.where(stop <= level, duration, np.nan)
+        best_before = np.concatenate(([np.nan], np.fmin.accumulate(eligible)[:-1]))
+        dominated |= (stop == level) & (best_before <= duration)
+    return [int(i) for i in order[~dominated]]
+
+
+def _pareto_python(
+    prices: Sequence[float], durations: Sequence[float], stops: Sequence[float]
+) -> List[int]:
+    order = sorted(
+        range(len(prices)), key=lambda i: (prices[i], durations[i], stops[i])
+    )
+    # Fastest duration seen so far among options with at most `level` stops
+    # (NaN until one has been seen)
+    best: Dict[float, float] = {level: math.nan for level in set(stops)}
+    front = []
+    for i in order:
+        if not best[stops[i]] <= durations[i]:
+            front.append(i)
+        for level in best:
+            if level >= stops[i] and not best[level] <= durations[i]:
+                best[level] = durations[i]
+    return front
+
+
+def pareto_front(
+    prices: Sequence[float], durations: Sequence[float], stops: Sequence[float]
+) -> List[int]:
+    """
+    Indices of the options on the (price, duration, stops) Pareto frontier,
+    cheapest first. Unknown durations or stop counts should be passed as
+    infinity so they never beat a known value; exact duplicates keep one.
+    """
+    if not prices:
+        return []
+    front = _pareto_numpy if np is not None else _pareto_python
+    return front(prices, durations, stops)
+
+
+def rank_flights(flights: List[Dict[str, Any]], per_tier: int = 2) -> Dict[str, Any]:
+    """
+    Reduce flight offers to their Pareto frontier and pick per-tier options:
+    value (cheapest), premium (fewest stops, then fastest) and comfort (best
+    balance of the normalized price, duration and stops). Each frontier
+    option appears in at most one tier.
+    """
+    priced = [f for f in flights if not math.isnan(_as_float(f.get("price")))]
+    if not priced:
+        return {"tiers": {tier: [] for tier in TIERS}, "frontier_size": 0, "count": 0}
+
+    def known(value: Any) -> float:
+        number = _as_float(value)
+        return math.inf if math.isnan(number) else number
+
+    prices = [_as_float(f["price"]) for f in priced]
+    durations = [known(f.get("duration")) for f in priced]
+    stops = [known(f.get("stops")) for f in priced]
+    front = pareto_front(prices, durations, stops)
+
+    def normalized(values: List[float]) -> List[float]:
+        # Scale known values to 0-1; unknown ones count as the worst
+        finite = [v for v in values if math.isfinite(v)]
+        low = min(finite, default=0.0)
+        span = max(finite, default=0.0) - low
+        return [
+            ((v - low) / span if span else 0.0) if math.isfinite(v) else 1.0
+            for v in values
+        ]
+
+    balance = [
+        sum(parts)
+        for parts in zip(
+            normalized([prices[i] for i in front]),
+            normalized([durations[i] for i in front]),
+            normalized([stops[i] for i in front]),
+        )
+    ]
+    orderings = {
+        "value": front,
+        "premium": sorted(front, key=lambda i: (stops[i], durations[i], prices[i])),
+        "comfort": [i for _, i in sorted(zip(balance, front))],
+    }
+
+    # Tiers take turns so a small frontier is shared out rather than all
+    # landing in the first tier
+    tiers: Dict[str, List[Dict[str, Any]]] = {tier: [] for tier in TIERS}
+    used = set()
+    for _ in range(per_tier):
+        for tier in ("value", "premium", "comfort"):
+            pick = next((i for i in orderings[tier] if i not in used), None)
+            if pick is not None:
+                used.add(pick)
+                tiers[tier].append(priced[pick])
+    return {
+        "tiers": tiers,
+        "frontier_size": len(front),
+        "count": len(priced),
+    }
@@ -0,0 +1,70 @@
+"""
+singleflight.py — Coalesce identical concurrent upstream requests.
+
+While a call for a key is in flight, later callers with the same key await
+that call's result instead of issuing a duplicate request. Popular routes
+and cities requested by many sessions at once therefore cost one upstream
+call (and one unit of API quota) per burst.
+"""
+
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+@dataclass
+class SingleFlightStats:
+    """Counters for one coalescing group."""
+
+    calls: int = 0
+    executions: int = 0
+    coalesced: int = 0
+    errors: int = 0
+
+
+class SingleFlight:
+    """A group of keyed calls where concurrent duplicates share one execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = SingleFlightStats()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the execution already in flight for it."""
+        self.stats.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # Shield so one cancelled caller does not cancel the shared request.
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**asdict(self.stats), "in_flight": len(self._in_flight)}
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def group(name: str) -> SingleFlight:
+    """Return the process-wide coalescing group with the given name."""
+    flight = _groups.get(name)
+    if flight is None:
+        flight = _groups[name] = SingleFlight(name)
+    return flight
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return counters for every coalescing group."""
+    return {name: flight.snapshot() for name, flight in _groups.items()}
@@ -0,0 +1,65 @@
+"""
+tool_format.py — Compact tabular encoding for tool results.
+
+Tool results are fed back into the model context, so every character is
+paid for in prompt tokens on each following step of the turn. A Python repr
+or JSON list of dicts repeats every key (plus quotes and braces) on every
+row; here records are written as one `|`-separated header line and one line
+per record instead.
+
+Each tool picks the columns the agent actually uses. On top of that,
+columns empty on every row are dropped and a column holding the same value
+on every row (currency, origin, ...) is written once above the table.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+SEPARATOR = "|"
+LIST_SEPARATOR = ";"
+
+
+def format_value(value: Any) -> str:
+    """Render one cell: no quotes, short floats, lists joined with ';'."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else str(round(value, 2))
+    if isinstance(value, (list, tuple)):
+        return LIST_SEPARATOR.join(format_value(v) for v in value)
+    # Keep each record on one line and the separator unambiguous
+    return " ".join(str(value).replace(SEPARATOR, "/").split())
+
+
+def format_table(
+    rows: List[Dict[str, Any]], columns: Sequence[str], note: str = ""
+) -> str:
+    """
+    Encode rows as a header line plus one value line per row, preceded by
+    an optional note and any columns that are constant across rows.
+    """
+    cells = [[format_value(row.get(column)) for column in columns] for row in rows]
+    kept, constants = [], []
+    for j, column in enumerate(columns):
+        values = {line[j] for line in cells}
+        if values <= {""}:
+            continue
+        if len(cells) > 1 and len(values) == 1:
+            constants.append(f"{column}={cells[0][j]}")
+            continue
+        kept.append(j)
+
+    lines = []
+    header = " ".join(filter(None, [note, *constants]))
+    if header:
+        lines.append(header)
+    if kept:
+        lines.append(SEPARATOR.join(columns[j] for j in kept))
+        lines.extend(SEPARATOR.join(line[j] for j in kept) for line in cells)
+    return "\n".join(lines)
+
+
+def flatten_tiers(tiers: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Turn {tier: [rows]} into rows with a leading `tier` field."""
+    return [{"tier": tier, **row} for tier, picks in tiers.items() for row in picks]
@@ -13,7 +13,6 @@ It supports filtering using:
 - budget range
 """
 
-import json
 from typing import List, Optional, Dict
 from pydantic_ai import RunContext
 import sys
@@ -21,21 +20,36 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agent_dependencies import TravelDependencies
-import requests
+from tools import http_client, singleflight
+from tools.tool_format import format_table
 
 
-def _query_yelp(city: str, limit: int = 10, yelp_api_key: str = "") -> List[Dict]:
+async def _query_yelp(
+    city: str,
+    limit: int = 10,
+    yelp_api_key: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
+) -> List[Dict]:
     """Internal helper — hit Yelp API."""
     url = "https://api.yelp.com/v3/businesses/search"
     headers = {"Authorization": f"Bearer {yelp_api_key}"}
     params = {"location": city, "limit": limit, "sort_by": "rating"}
 
-    res = requests.get(url, headers=headers, params=params)
+    async def fetch() -> Optional[Dict]:
+        res = await http_client.get(url, headers=headers, params=params, pools=pools)
+        return res.json() if res.status_code == 200 else None
 
-    if res.status_code != 200:
+    # Concurrent searches for the same city share one request
+    key = (city.strip().casefold(), limit)
+    payload = await singleflight.group("yelp").do(key, fetch)
+    if payload is None:
         return []
+    return clean_restaurants(payload)
+
 
-    data = res.json().get("businesses", [])
+def clean_restaurants(payload: Dict) -> List[Dict]:
+    """Slim Yelp business search results down to the fields we show."""
+    data = payload.get("businesses", [])
     clean_output = []
 
     for r in data:
@@ -54,12 +68,13 @@ def _query_yelp(city: str, limit: int = 10, yelp_api_key: str = "") -> List[Dict
     return clean_output
 
 
-def _query_ticketmaster(
+async def _query_ticketmaster(
     city: str,
     start_date: str,
     end_date: str,
     limit: int = 10,
     ticketmaster_api_key: str = "",
+    pools: Optional[http_client.UpstreamPools] = None,
 ):
     """
     Internal helper — Ticketmaster Discovery search.
@@ -75,11 +90,20 @@ def _query_ticketmaster(
         "endDateTime": f"{end_date}T23:59:59Z",
     }
 
-    res = requests.get(url, params=params)
-    if res.status_code != 200:
+    async def fetch() -> Optional[Dict]:
+        res = await http_client.get(url, params=params, pools=pools)
+        return res.json() if res.status_code == 200 else None
+
+    key = (city.strip().casefold(), start_date, end_date, limit)
+    payload = await singleflight.group("ticketmaster").do(key, fetch)
+    if payload is None:
         return []
+    return clean_events(payload)
+
 
-    events = res.json().get("_embedded", {}).get("events", [])
+def clean_events(payload: Dict) -> List[Dict]:
+    """Slim Ticketmaster Discovery results down to the fields we show."""
+    events = payload.get("_embedded", {}).get("events", [])
 
     clean = []
     for e in events:
@@ -112,6 +136,12 @@ STATIC_ATTRACTIONS = {
 }
 
 
+# Columns each tool returns to the agent (image URLs etc. are dropped)
+RESTAURANT_COLUMNS = ("name", "price", "rating", "categories", "address", "url")
+EVENT_COLUMNS = ("name", "date", "venue", "classification", "url")
+ATTRACTION_COLUMNS = ("name", "price", "indoor")
+
+
 # Standalone tool functions for direct integration with travel_agent
 
 
@@ -128,17 +158,20 @@ async def search_restaurants(
         limit: Max number of results (default 10)
 
     Returns:
-        JSON string list of restaurants with:
+        Table of restaurants with:
         - name
         - price range
         - rating
         - categories
         - address
-        - image
         - url
     """
-    data = _query_yelp(city, limit, ctx.deps.yelp_api_key)
-    return json.dumps(data)
+    data = await _query_yelp(
+        city, limit, ctx.deps.yelp_api_key, pools=ctx.deps.upstream
+    )
+    if not data:
+        return f"No restaurants found for {city}."
+    return format_table(data, RESTAURANT_COLUMNS)
 
 
 async def search_events(
@@ -158,17 +191,26 @@ async def search_events(
         limit: number of max events to return
 
     Returns:
-        JSON string list:
+        Table of events with:
         - name
         - date
         - venue
         - url
         - classification
     """
-    raw = _query_ticketmaster(
-        city, user_start_date, user_end_date, limit, ctx.deps.ticketmaster_api_key
+    raw = await _query_ticketmaster(
+        city,
+        user_start_date,
+        user_end_date,
+        limit,
+        ctx.deps.ticketmaster_api_key,
+        pools=ctx.deps.upstream,
     )
-    return json.dumps(raw)
+    if not raw:
+        return (
+            f"No events found for {city} between {user_start_date} and {user_end_date}."
+        )
+    return format_table(raw, EVENT_COLUMNS)
 
 
 async def search_attractions(
@@ -183,13 +225,13 @@ async def search_attractions(
         city: Name of the city
 
     Returns:
-        JSON of attractions:
+        Table of attractions:
         - name
         - price
         - indoor
     """
     key = city.lower()
     if key not in STATIC_ATTRACTIONS:
-        return json.dumps([])
+        return f"No curated attractions for {city}."
 
-    return json.dumps(STATIC_ATTRACTIONS[key])
+    return format_table(STATIC_ATTRACTIONS[key], ATTRACTION_COLUMNS)
@@ -0,0 +1,401 @@
+"""
+Tracing - Per-request spans for agent, tool and upstream HTTP time.
+
+Every /chat and /chat/stream turn opens a trace. Spans are recorded around
+the agent run, each tool invocation and each upstream HTTP request; they
+nest through context variables (asyncio tasks inherit them), so concurrent
+tool calls and bundle searches land under the right parent. Every span
+carries the chat session id.
+
+Finished traces are exported according to TRACE_EXPORT, off the event
+loop so a slow disk or collector never holds up a response:
+- "json": one JSON line per span appended to TRACE_JSON_PATH ("-" for
+  stdout) from a worker thread;
+- "otlp": posted as OTLP/HTTP JSON to a local collector (Jaeger, Tempo,
+  an OpenTelemetry Collector) at TRACE_OTLP_ENDPOINT;
+- "none" (default): spans are still recorded for the `Server-Timing`
+  header, but not exported.
+
+`Trace.server_timing` breaks a turn down into model, tool and upstream
+time; /chat returns it as a `Server-Timing` header.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from metrics import backend_metrics
+
+EXPORTERS = ("none", "json", "otlp")
+
+SERVICE_NAME = "travel-bot"
+
+# Span kinds; "request" and "http" map to OTLP server and client spans
+OTLP_KINDS = {"request": 2, "http": 3}
+
+# Longest tool argument string kept on a span
+MAX_ARGS_CHARS = 200
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace."""
+
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def _union_ms(intervals: List[Tuple[int, int]]) -> float:
+    # Overlapping spans (concurrent tool calls) are counted once
+    total = 0
+    end = None
+    for start, stop in sorted(intervals):
+        if end is None or start > end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+    return total / 1e6
+
+
+class Trace:
+    """The spans of one chat turn."""
+
+    def __init__(self, name: str, session_id: str = "", **attributes: Any):
+        self.trace_id = secrets.token_hex(16)
+        self.session_id = session_id
+        self.spans: List[Span] = []
+        self.root = self.start_span(name, "request", None, attributes)
+
+    def start_span(
+        self,
+        name: str,
+        kind: str,
+        parent: Optional[Span],
+        attributes: Dict[str, Any],
+    ) -> Span:
+        span = Span(
+            name=name,
+            kind=kind,
+            trace_id=self.trace_id,
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+        self.spans.append(span)
+        return span
+
+    def _intervals(self, kind: str) -> List[Tuple[int, int]]:
+        now = time.time_ns()
+        return [
+            (s.start_ns, s.end_ns if s.end_ns is not None else now)
+            for s in self.spans
+            if s.kind == kind
+        ]
+
+    def timings(self) -> Dict[str, float]:
+        """Milliseconds spent in the model, in tools, upstream and in total."""
+        agent = _union_ms(self._intervals("agent"))
+        tools = _union_ms(self._intervals("tool"))
+        return {
+            # Agent time not spent inside a tool is model time
+            "llm": round(max(agent - tools, 0.0), 1),
+            "tools": round(tools, 1),
+            "upstream": round(_union_ms(self._intervals("http")), 1),
+            "total": round(self.root.duration_ms, 1),
+        }
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value for this trace."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings().items())
+
+    def finished_spans(self) -> List[Span]:
+        """Spans with the session id attached, for export."""
+        for span in self.spans:
+            if self.session_id:
+                span.attributes["session.id"] = self.session_id
+        return [s for s in self.spans if s.end_ns is not None]
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the chat turn being handled, if any."""
+    return _current_trace.get()
+
+
+def _reset(var: ContextVar, token: Any) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # A streaming generator closed from another context
+        var.set(None)
+
+
+@contextmanager
+def span(
+    name: str, kind: str = "internal", **attributes: Any
+) -> Iterator[Optional[Span]]:
+    """
+    Time the enclosed block as a child of the current span. Outside a
+    traced request this does nothing and yields None.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, kind, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _reset(_current_span, token)
+
+
+@contextmanager
+def start_trace(name: str, session_id: str = "", **attributes: Any) -> Iterator[Trace]:
+    """Open a trace for one request and export it when the block exits."""
+    trace = Trace(name, session_id, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _reset(_current_span, span_token)
+        _reset(_current_trace, trace_token)
+        get_tracer().export(trace)
+
+
+def traced(tool: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Wrap a `(ctx, ...)` agent tool so each invocation is recorded as a span
+    and in the tool latency histogram.
+    """
+    name = tool.__name__
+
+    @functools.wraps(tool)
+    async def wrapper(ctx, *args, **kwargs):
+        arguments = json.dumps(kwargs, default=str)[:MAX_ARGS_CHARS]
+        started = time.perf_counter()
+        try:
+            with span(name, "tool", **{"tool.name": name, "tool.args": arguments}) as s:
+                result = await tool(ctx, *args, **kwargs)
+                if s is not None and isinstance(result, str):
+                    s.attributes["tool.result_chars"] = len(result)
+                return result
+        finally:
+            backend_metrics.tools.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    """Encode spans as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    encoded = []
+    for s in spans:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": OTLP_KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)}
+                for k, v in {"span.kind": s.kind, **s.attributes}.items()
+            ],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        encoded.append(item)
+    resource = [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": resource},
+                "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": encoded}],
+            }
+        ]
+    }
+
+
+class Tracer:
+    """Exports finished traces to a JSON log or an OTLP collector."""
+
+    def __init__(
+        self,
+        exporter: str = "none",
+        json_path: str = "-",
+        otlp_endpoint: str = "http://localhost:4318/v1/traces",
+    ):
+        if exporter not in EXPORTERS:
+            raise ValueError(
+                f"TRACE_EXPORT must be one of {EXPORTERS}, got {exporter!r}"
+            )
+        self.exporter = exporter
+        self.json_path = json_path
+        self.otlp_endpoint = otlp_endpoint
+        self.exported = 0
+        self.failures = 0
+        self._pending: set = set()
+        # Keeps each trace's lines together when writes overlap
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Create the tracer from environment variables."""
+        return cls(
+            exporter=os.getenv("TRACE_EXPORT", "none"),
+            json_path=os.getenv("TRACE_JSON_PATH", "-"),
+            otlp_endpoint=os.getenv(
+                "TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+            ),
+        )
+
+    def export(self, trace: Trace) -> None:
+        """Export a finished trace; failures are reported, never raised."""
+        if self.exporter == "none":
+            return
+        spans = trace.finished_spans()
+        try:
+            if self.exporter == "json":
+                self._write_json_later(spans)
+            else:
+                self._post_otlp(spans)
+        except Exception as e:
+            self.failures += 1
+            print(f"Trace export failed: {e}")
+
+    def _write_json(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.as_dict(), default=str) + "\n" for s in spans)
+        with self._write_lock:
+            if self.json_path == "-":
+                sys.stdout.write(lines)
+            else:
+                directory = os.path.dirname(self.json_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.json_path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            self.exported += len(spans)
+
+    def _write_json_later(self, spans: List[Span]) -> None:
+        # Encoding and the file append run in a worker thread; outside an
+        # event loop (scripts, sync tests) there is nothing to block
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_json(spans)
+            return
+
+        async def write() -> None:
+            try:
+                await asyncio.to_thread(self._write_json, spans)
+            except Exception as e:
+                self.failures += 1
+                print(f"Trace export to {self.json_path} failed: {e}")
+
+        self._track(loop.create_task(write()))
+
+    def _track(self, task: "asyncio.Task[None]") -> None:
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _post_otlp(self, spans: List[Span]) -> None:
+        # Sent in the background so the response is not held up by the
+        # collector; a plain client keeps these requests out of the traces
+        async def post() -> None:
+            try:
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    response = await client.post(
+                        self.otlp_endpoint, json=otlp_payload(spans)
+                    )
+                response.raise_for_status()
+                self.exported += len(spans)
+            except httpx.HTTPError as e:
+                self.failures += 1
+                print(f"Trace export to {self.otlp_endpoint} failed: {e}")
+
+        self._track(asyncio.get_running_loop().create_task(post()))
+
+    async def flush(self) -> None:
+        """Wait for background JSON and OTLP exports to finish."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "exporter": self.exporter,
+            "exported_spans": self.exported,
+            "failures": self.failures,
+        }
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, configured from the environment."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer.from_env()
+    return _tracer
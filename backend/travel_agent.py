@@ -3,24 +3,157 @@ Main Travel Agent - Unified travel planning assistant using Pydantic-AI.
 Combines flight, hotel, and activity tools with delegation pattern.
 """
 
+import asyncio
+from typing import Any, Awaitable, Dict, Optional
+
 from pydantic_ai import Agent, RunContext
 
 from agent_dependencies import TravelDependencies
-from tools.flight_scraper import build_booking_url_tool, flight_search_tool
-from tools.hotel_scraper import hotel_search_tool
+from tool_budget import budgeted
+from tools.airports import airport_lookup_tool
+from tools.flight_scraper import (build_booking_url_tool, flight_search_tool,
+                                  flexible_flight_search_tool,
+                                  format_ranked_flights, resolve_route,
+                                  search_flights, summarize_flights)
+from tools.hotel_scraper import (format_ranked_hotels, get_location_id,
+                                 hotel_search_tool, search_hotel_summaries,
+                                 validate_dates)
 from tools.web_scraper import (search_attractions, search_events,
                                search_restaurants)
+from tracing import span, traced
+
+# Per-section time limit for trip_bundle_search; slow sections are reported
+# as timed out instead of holding back the whole bundle
+BUNDLE_SECTION_TIMEOUT = 25.0
+
+async def _bundle_section(name: str, coro: Awaitable[Any]) -> Dict[str, Any]:
+    """Run one bundle section, capturing its error instead of raising."""
+    try:
+        with span(f"trip_bundle_search.{name}"):
+            result = await asyncio.wait_for(coro, BUNDLE_SECTION_TIMEOUT)
+        return {"ok": True, "result": result}
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": "timed out"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+async def trip_bundle_search(
+    ctx: RunContext[TravelDependencies],
+    origin: str,
+    destination: str,
+    destination_city: str,
+    departure_date: str,
+    return_date: Optional[str] = None,
+    adults: int = 2,
+    rooms: int = 1,
+    currency: str = "USD",
+    include_restaurants: bool = True,
+    include_events: bool = True,
+) -> str:
+    """
+    Search flights, hotels, restaurants and events for a whole trip at once.
+
+    Args:
+        origin: IATA code or city of the origin, e.g. 'SFO'
+        destination: IATA code or city of the destination, e.g. 'JFK'
+        destination_city: Destination city name for hotels/activities, e.g. 'New York'
+        departure_date: Departure / check-in date 'YYYY-MM-DD'
+        return_date: Return / check-out date 'YYYY-MM-DD' (needed for hotels)
+        adults: Number of adults
+        rooms: Number of hotel rooms
+        currency: Currency code, e.g. 'USD'
+        include_restaurants: Also search restaurants (Yelp)
+        include_events: Also search live events (Ticketmaster)
+
+    Returns:
+        One `## section` block per search: value/comfort/premium tables for
+        flights and hotels, top restaurants and events, and an error note
+        for any section that failed.
+    """
+    deps = ctx.deps
+
+    async def flights() -> str:
+        codes = resolve_route(origin, destination)
+        if isinstance(codes, str):
+            raise ValueError(codes)
+        raw = await search_flights(
+            codes[0],
+            codes[1],
+            departure_date,
+            return_date,
+            currency,
+            deps.travelpayouts_token,
+            pools=deps.upstream,
+        )
+        options = summarize_flights(raw, limit=len(raw.get("data") or []))
+        return format_ranked_flights(options, currency)
+
+    async def hotels() -> str:
+        if not return_date:
+            raise ValueError("return_date is required to search hotels")
+        validate_dates(departure_date, return_date)
+        location_id = await get_location_id(
+            destination_city,
+            deps.hotels_rapidapi_key,
+            deps.hotels_rapidapi_host,
+            pools=deps.upstream,
+        )
+        if not location_id:
+            raise ValueError(f"No locationId found for city: {destination_city}")
+        options = await search_hotel_summaries(
+            location_id=location_id,
+            checkin_date=departure_date,
+            checkout_date=return_date,
+            adults=adults,
+            rooms=rooms,
+            currency=currency,
+            hotels_rapidapi_key=deps.hotels_rapidapi_key,
+            hotels_rapidapi_host=deps.hotels_rapidapi_host,
+            pools=deps.upstream,
+            limit=None,
+        )
+        return format_ranked_hotels(options)
+
+    sections = {"flights": flights(), "hotels": hotels()}
+    if include_restaurants:
+        sections["restaurants"] = search_restaurants(ctx, destination_city, 5)
+    if include_events:
+        sections["events"] = search_events(
+            ctx, destination_city, departure_date, return_date or departure_date, 5
+        )
+
+    # Every upstream call runs concurrently; wall time is the slowest section
+    results = await asyncio.gather(
+        *(_bundle_section(name, c) for name, c in sections.items())
+    )
+
+    blocks = []
+    for name, outcome in zip(sections, results):
+        if outcome["ok"]:
+            body = outcome["result"] or "none found"
+        else:
+            body = f"error: {outcome['error']}"
+        blocks.append(f"## {name}\n{body}")
+    return "\n".join(blocks)
+
+
 
 # Main travel agent that combines all capabilities
 travel_agent = Agent(
     "openai:gpt-4o",
     deps_type=TravelDependencies,
+    # Every tool result is cut to the per-tool and per-turn token budgets,
+    # and every invocation is traced
     tools=[
-        flight_search_tool,
-        hotel_search_tool,
-        # search_restaurants,
-        # search_events,
-        # search_attractions,
+        budgeted(traced(trip_bundle_search)),
+        budgeted(traced(airport_lookup_tool)),
+        budgeted(traced(flight_search_tool)),
+        budgeted(traced(flexible_flight_search_tool)),
+        budgeted(traced(hotel_search_tool)),
+        # budgeted(traced(search_restaurants)),
+        # budgeted(traced(search_events)),
+        # budgeted(traced(search_attractions)),
     ],
     system_prompt="""You are a helpful travel planning assistant. You plan trips step-by-step: flights → lodging → activities, getting user feedback at each stage. Users can adjust previous choices anytime.
 
@@ -65,8 +198,11 @@ travel_agent = Agent(
 - Acknowledge previous choices and preferences
 
 **Available Tools:**
-- `flight_search_tool` - Flights (needs IATA codes)
-- `hotel_search_tool` - Accommodations
+- `trip_bundle_search` - Flights, hotels, restaurants and events in one call; use it when the user asks to plan a whole trip
+- `airport_lookup_tool` - IATA airport/metro codes for a city or airport name
+- `flight_search_tool` - Flights (IATA codes or city names); `include_nearby=True` also compares neighboring airports
+- `flexible_flight_search_tool` - Price grid for dates ±N days; use it when the user's dates are flexible
+- `hotel_search_tool` - Accommodations, already split into value/comfort/premium picks
 - `search_restaurants` - Dining
 - `search_events` - Local events  
 - `search_attractions` - Attractions
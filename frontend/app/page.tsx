@@ -38,16 +38,10 @@ export default function Page() {
     ]);
 
     try {
-      // Format message history for backend API
-      const messageHistory = messages.map((msg) => ({
-        role: msg.user,
-        content: msg.content,
-      }));
-
-      console.log("Sending request with context:", {
+      // History and itinerary progress are kept server-side per session,
+      // so only the new message is sent.
+      console.log("Sending request:", {
         message: currentInput,
-        message_history: messageHistory,
-        itinerary_progress: itineraryProgress,
         session_id: sessionId,
       });
 
@@ -60,8 +54,7 @@ export default function Page() {
         body: JSON.stringify({
           message: currentInput,
           stream: true,
-          message_history: messageHistory,
-          itinerary_progress: itineraryProgress,
+          stream_mode: "delta",
           session_id: sessionId,
         }),
       });
@@ -73,6 +66,7 @@ export default function Page() {
       const reader = response.body!.getReader();
       const decoder = new TextDecoder();
       let fullContent = ""; // Track the full content to avoid duplication
+      let pending = ""; // Partial SSE line carried over between reads
 
       while (true) {
         const { value, done } = await reader.read();
@@ -80,8 +74,10 @@ export default function Page() {
 
         const chunk = decoder.decode(value, { stream: true });
 
-        // Process each SSE message directly (no buffering needed since Pydantic-AI sends complete messages)
-        const lines = chunk.split("\n");
+        // A network read can end mid-frame; keep the trailing partial line
+        // for the next read so delta frames are never dropped
+        const lines = (pending + chunk).split("\n");
+        pending = lines.pop() ?? "";
 
         for (const line of lines) {
           if (line.startsWith("data: ")) {
@@ -95,11 +91,14 @@ export default function Page() {
                 throw new Error(data.error);
               }
 
-              if (data.content) {
-                // Only append new content (avoid duplication from cumulative chunks)
-                const newContent = data.content.substring(fullContent.length);
+              if (data.delta || data.content) {
+                // Delta frames carry only new text; cumulative frames carry
+                // the whole answer so far (avoid duplicating it)
+                const newContent = data.delta
+                  ? data.delta
+                  : data.content.substring(fullContent.length);
                 if (newContent) {
-                  fullContent = data.content;
+                  fullContent += newContent;
 
                   setMessages((prev) => {
                     const lastMessage = prev[prev.length - 1];
@@ -36,14 +36,18 @@ export type Message = {
 export interface ChatRequest {
   message: string;
   stream: boolean;
-  message_history: Array<{role: string, content: string}>;
-  itinerary_progress: ItineraryProgress;
+  stream_mode?: "cumulative" | "delta";
   session_id: string;
+  // Legacy: omit to use the server-side session history
+  message_history?: Array<{role: string, content: string}>;
+  itinerary_progress?: ItineraryProgress;
 }
 
 export interface StreamingResponse {
   content?: string;
+  delta?: string;
   done?: boolean;
+  session_id?: string;
   itinerary_progress?: ItineraryProgress;
   error?: string;
 }